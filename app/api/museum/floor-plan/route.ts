@@ -4,10 +4,22 @@ import { NextRequest, NextResponse } from 'next/server'
 function addCORSHeaders(response: NextResponse) {
   response.headers.set('Access-Control-Allow-Origin', '*')
   response.headers.set('Access-Control-Allow-Methods', 'GET, OPTIONS')
-  response.headers.set('Access-Control-Allow-Headers', 'Content-Type')
+  response.headers.set('Access-Control-Allow-Headers', 'Content-Type, If-None-Match')
+  response.headers.set('Access-Control-Expose-Headers', 'ETag')
   return response
 }
 
+// Headers de cache du backend (ETag versionné, Cache-Control) recopiés tels quels
+function copyCacheHeaders(from: Response, to: NextResponse) {
+  for (const name of ['etag', 'cache-control', 'vary']) {
+    const value = from.headers.get(name)
+    if (value) {
+      to.headers.set(name, value)
+    }
+  }
+  return to
+}
+
 /**
  * OPTIONS /api/museum/floor-plan
  * Gérer les preflight requests CORS
@@ -19,7 +31,7 @@ export async function OPTIONS() {
       headers: {
         'Access-Control-Allow-Origin': '*',
         'Access-Control-Allow-Methods': 'GET, OPTIONS',
-        'Access-Control-Allow-Headers': 'Content-Type'
+        'Access-Control-Allow-Headers': 'Content-Type, If-None-Match'
       }
     })
   )
@@ -42,13 +54,23 @@ export async function GET(request: NextRequest) {
     
     console.log(`[floor-plan] Fetching from backend: ${backendUrl.toString()}`)
     
+    // Requête conditionnelle: le backend répond 304 si le plan n'a pas changé
+    const headers: Record<string, string> = { 'Content-Type': 'application/json' }
+    const ifNoneMatch = request.headers.get('if-none-match')
+    if (ifNoneMatch) {
+      headers['If-None-Match'] = ifNoneMatch
+    }
+
     const response = await fetch(backendUrl.toString(), {
       method: 'GET',
-      headers: {
-        'Content-Type': 'application/json'
-      }
+      headers,
+      cache: 'no-store'
     })
 
+    if (response.status === 304) {
+      return addCORSHeaders(copyCacheHeaders(response, new NextResponse(null, { status: 304 })))
+    }
+
     const data = await response.json()
     
     if (!response.ok) {
@@ -60,7 +82,7 @@ export async function GET(request: NextRequest) {
     }
 
     console.log('[floor-plan] Successfully retrieved floor plan with', data.rooms?.length, 'rooms')
-    return addCORSHeaders(NextResponse.json(data))
+    return addCORSHeaders(copyCacheHeaders(response, NextResponse.json(data)))
     
   } catch (error: any) {
     console.error('[floor-plan] Error:', error)
@@ -0,0 +1,27 @@
+import { NextRequest, NextResponse } from 'next/server'
+
+const BACKEND_URL = process.env.BACKEND_API_URL || 'http://backend:5000'
+
+/**
+ * État audio d'un parcours généré avec audio_mode: 'async' (polling)
+ */
+export async function GET(
+  request: NextRequest,
+  { params }: { params: Promise<{ parcoursId: string }> }
+) {
+  const { parcoursId } = await params
+
+  try {
+    const response = await fetch(`${BACKEND_URL}/api/parcours/${parcoursId}/audio`, {
+      cache: 'no-store'
+    })
+    const data = await response.json()
+    return NextResponse.json(data, { status: response.status })
+  } catch (error: any) {
+    console.error('Erreur proxy audio parcours:', error)
+    return NextResponse.json(
+      { success: false, error: error.message || 'Erreur serveur' },
+      { status: 500 }
+    )
+  }
+}
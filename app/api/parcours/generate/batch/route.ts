@@ -0,0 +1,36 @@
+import { NextRequest, NextResponse } from 'next/server'
+
+const BACKEND_URL = process.env.BACKEND_API_URL || 'http://backend:5000'
+
+export async function POST(request: NextRequest) {
+  try {
+    const body = await request.json()
+    
+    // Proxy vers le backend Flask
+    const response = await fetch(`${BACKEND_URL}/api/parcours/generate/batch`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify(body)
+    })
+
+    const data = await response.json()
+    
+    if (!response.ok) {
+      return NextResponse.json(
+        { success: false, error: data.error || 'Erreur backend' },
+        { status: response.status }
+      )
+    }
+
+    return NextResponse.json(data)
+    
+  } catch (error: any) {
+    console.error('Erreur proxy lot de parcours:', error)
+    return NextResponse.json(
+      { success: false, error: error.message || 'Erreur serveur' },
+      { status: 500 }
+    )
+  }
+}
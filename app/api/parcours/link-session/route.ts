@@ -48,7 +48,7 @@ export async function POST(request: NextRequest) {
 
     // Lier le parcours à la session
     await queryPostgres(
-      'UPDATE qr_code SET parcours_id = $1 WHERE token = $2',
+      'UPDATE qr_code SET parcours_id = $1, linked_at = NOW() WHERE token = $2',
       [parcours_id, token]
     )
 
@@ -46,6 +46,17 @@ async function cleanupOrphanPdfs(savedOeuvres: any[]) {
   }
 }
 
+/**
+ * Demande au backend de recalculer la table artwork_placements
+ */
+async function refreshArtworkPlacements() {
+  const backendUrl = process.env.BACKEND_API_URL || 'http://backend:5000'
+  const response = await fetch(`${backendUrl}/api/parcours/placements/refresh`, { method: 'POST' })
+  if (!response.ok) {
+    throw new Error(`Backend HTTP ${response.status}`)
+  }
+}
+
 export async function POST(request: NextRequest) {
   let client: PoolClient | null = null
 
@@ -247,6 +258,12 @@ export async function POST(request: NextRequest) {
       cleanupOrphanPdfs(exportData.oeuvres_contenus?.oeuvres || []).catch(err => {
         console.error('❌ Erreur nettoyage PDFs orphelins:', err)
       })
+
+      // Recalcul des placements œuvre → salle en arrière-plan
+      // (sinon fait paresseusement à la prochaine génération de parcours)
+      refreshArtworkPlacements().catch(err => {
+        console.error('❌ Erreur recalcul placements œuvres:', err)
+      })
       
       return NextResponse.json({ 
         success: true,
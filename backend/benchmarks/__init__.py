@@ -0,0 +1 @@
+# Benchmarks génération (mock Ollama)
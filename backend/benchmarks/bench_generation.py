@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Benchmark du pipeline de génération contre le mock Ollama (aucun modèle requis).
+
+Scénarios:
+- system : OllamaMediationSystem.generate_mediation_for_one_work en parallèle
+           (prompt, HTTP, cache write-through)
+- jobs   : route POST /api/generation/async/<all|artwork> via le test_client Flask,
+           GenerationJobManager + pool partagé, jusqu'à la fin du job
+
+Métriques: narrations/s, latence p50/p95, aller-retours DB par narration
+(connexions, requêtes, commits), mémoire (pic tracemalloc + RSS max).
+
+Prérequis: PostgreSQL accessible (variables DB_*) avec des œuvres et des critères.
+Le scénario 'jobs' écrit dans pregenerations: base de test uniquement
+(BENCH_ALLOW_DB_WRITES=1).
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_generation --scenario system --narrations 40 --slots 4
+    python -m benchmarks.bench_generation --scenario jobs --oeuvre-id 1 --json bench.json
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2
+import psycopg2.extensions
+
+from benchmarks.mock_ollama import MockOllamaConfig, MockOllamaServer
+
+
+# ===== COMPTAGE DES ALLER-RETOURS DB =====
+
+class DbRoundTripCounter:
+    """
+    Compte connexions / requêtes / commits en enveloppant psycopg2.connect.
+    Les appels faits par les threads ignorés (polling du benchmark) sont exclus.
+    """
+
+    def __init__(self):
+        self.counts = {'connections': 0, 'queries': 0, 'commits': 0}
+        self._lock = threading.Lock()
+        self._ignored_threads = set()
+        self._original_connect = None
+
+    def incr(self, key: str):
+        if threading.get_ident() in self._ignored_threads:
+            return
+        with self._lock:
+            self.counts[key] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+    @contextlib.contextmanager
+    def ignore_current_thread(self):
+        ident = threading.get_ident()
+        self._ignored_threads.add(ident)
+        try:
+            yield
+        finally:
+            self._ignored_threads.discard(ident)
+
+    def install(self):
+        counter = self
+
+        class _CountingCursor:
+            def __init__(self, cursor):
+                self._cursor = cursor
+
+            def execute(self, *args, **kwargs):
+                counter.incr('queries')
+                return self._cursor.execute(*args, **kwargs)
+
+            def executemany(self, *args, **kwargs):
+                counter.incr('queries')
+                return self._cursor.executemany(*args, **kwargs)
+
+            def __iter__(self):
+                return iter(self._cursor)
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                self._cursor.close()
+
+            def __getattr__(self, name):
+                return getattr(self._cursor, name)
+
+        class _CountingConnection(psycopg2.extensions.connection):
+            def cursor(self, *args, **kwargs):
+                return _CountingCursor(super().cursor(*args, **kwargs))
+
+            def commit(self):
+                counter.incr('commits')
+                return super().commit()
+
+        self._original_connect = psycopg2.connect
+
+        def counting_connect(*args, **kwargs):
+            counter.incr('connections')
+            kwargs['connection_factory'] = _CountingConnection
+            return self._original_connect(*args, **kwargs)
+
+        psycopg2.connect = counting_connect
+
+
+# ===== MESURES =====
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentile au rang le plus proche (valeurs en ms)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def memory_report() -> Dict[str, float]:
+    _, peak = tracemalloc.get_traced_memory()
+    report = {'tracemalloc_peak_mb': round(peak / 1024 / 1024, 2)}
+    try:
+        import resource
+        # ru_maxrss: Ko sous Linux
+        report['max_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    except ImportError:
+        pass
+    return report
+
+
+def summarize(name: str, narrations: int, wall_s: float, latencies_ms: List[float],
+              db_before: Dict[str, int], db_after: Dict[str, int], mock: MockOllamaServer) -> Dict[str, Any]:
+    db = {k: db_after[k] - db_before[k] for k in db_after}
+    per_narration = {k: round(v / narrations, 2) if narrations else None for k, v in db.items()}
+    return {
+        'scenario': name,
+        'narrations': narrations,
+        'wall_seconds': round(wall_s, 3),
+        'narrations_per_sec': round(narrations / wall_s, 3) if wall_s > 0 else None,
+        'latency_ms': {
+            'p50': round(percentile(latencies_ms, 50), 1),
+            'p95': round(percentile(latencies_ms, 95), 1),
+            'max': round(max(latencies_ms), 1) if latencies_ms else 0.0,
+        },
+        'db_round_trips': db,
+        'db_round_trips_per_narration': per_narration,
+        'memory': memory_report(),
+        'mock_ollama': dict(mock.metrics),
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n{'='*60}")
+    print(f"📊 BENCHMARK {report['scenario'].upper()}")
+    print(f"{'='*60}")
+    print(f"  Narrations        : {report['narrations']} en {report['wall_seconds']}s")
+    print(f"  Débit             : {report['narrations_per_sec']} narr/s")
+    lat = report['latency_ms']
+    print(f"  Latence           : p50 {lat['p50']}ms | p95 {lat['p95']}ms | max {lat['max']}ms")
+    print(f"  DB / narration    : {report['db_round_trips_per_narration']}")
+    print(f"  Mémoire           : {report['memory']}")
+    print(f"  Mock Ollama       : {report['mock_ollama']}")
+
+
+# ===== SCÉNARIOS =====
+
+def run_system_scenario(args, counter: DbRoundTripCounter, mock: MockOllamaServer) -> Dict[str, Any]:
+    from rag.core.ollama_generation import OllamaMediationSystem
+    from rag.core.db_postgres import get_all_artworks, get_artwork, get_criteres
+
+    system = OllamaMediationSystem(ollama_url=mock.url, verbose=False)
+    combinaisons = system.generate_combinaisons(get_criteres())
+    artworks = [get_artwork(row['oeuvre_id']) for row in get_all_artworks()[:args.artworks]]
+    tasks = [(a, c) for a in artworks if a for c in combinaisons][:args.narrations]
+    if not tasks:
+        raise SystemExit("❌ Aucune œuvre/critère en base pour le benchmark")
+
+    latencies: List[float] = []
+    lat_lock = threading.Lock()
+
+    def one(task):
+        artwork, combinaison = task
+        start = time.perf_counter()
+        res = system.generate_mediation_for_one_work(
+            artwork=artwork, combinaison=combinaison, model=args.model
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+        if res.get('success'):
+            with lat_lock:
+                latencies.append(elapsed)
+        return res.get('success', False)
+
+    mock.reset_metrics()
+    db_before = counter.snapshot()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.parallel) as pool:
+        ok = sum(1 for success in pool.map(one, tasks) if success)
+    wall = time.perf_counter() - start
+    return summarize('system', ok, wall, latencies, db_before, counter.snapshot(), mock)
+
+
+def run_jobs_scenario(args, counter: DbRoundTripCounter, mock: MockOllamaServer) -> Dict[str, Any]:
+    if os.getenv('BENCH_ALLOW_DB_WRITES') != '1':
+        raise SystemExit("❌ Le scénario 'jobs' écrit dans pregenerations: définir BENCH_ALLOW_DB_WRITES=1 (base de test)")
+
+    from rag.main_postgres import app
+    from rag.core.generation_jobs import _connect_postgres
+
+    client = app.test_client()
+    url = (f"/api/generation/async/artwork/{args.oeuvre_id}" if args.oeuvre_id
+           else "/api/generation/async/all")
+
+    mock.reset_metrics()
+    db_before = counter.snapshot()
+    start = time.perf_counter()
+    with counter.ignore_current_thread():
+        resp = client.post(url, json={'force_regenerate': True})
+        body = resp.get_json() or {}
+        if not body.get('success'):
+            raise SystemExit(f"❌ Lancement du job impossible: {body}")
+        job_id = body['job_id']
+
+        # Polling du statut (exclu du comptage DB)
+        job = {}
+        while True:
+            job = (client.get(f"/api/generation/jobs/{job_id}").get_json() or {}).get('job', {})
+            if job.get('status') in ('completed', 'failed', 'cancelled'):
+                break
+            time.sleep(args.poll_interval)
+    wall = time.perf_counter() - start
+    db_after = counter.snapshot()
+
+    with counter.ignore_current_thread():
+        conn = _connect_postgres()
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT duration_ms FROM generation_time_history
+            WHERE job_id = %s AND operation_type = 'generate'
+        """, (job_id,))
+        latencies = [float(row[0]) for row in cur.fetchall()]
+        cur.close()
+        conn.close()
+
+    report = summarize('jobs', job.get('stats', {}).get('generated', 0), wall, latencies,
+                       db_before, db_after, mock)
+    report['job'] = {'job_id': job_id, 'status': job.get('status'), 'stats': job.get('stats')}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark génération (mock Ollama)")
+    parser.add_argument('--scenario', choices=['system', 'jobs'], default='system')
+    parser.add_argument('--narrations', type=int, default=40, help="(system) nombre de narrations")
+    parser.add_argument('--artworks', type=int, default=10, help="(system) nombre d'œuvres utilisées")
+    parser.add_argument('--parallel', type=int, default=4, help="(system) threads clients")
+    parser.add_argument('--oeuvre-id', type=int, default=None, help="(jobs) job 'artwork' sinon job 'all'")
+    parser.add_argument('--poll-interval', type=float, default=0.2)
+    parser.add_argument('--model', default='ministral-3:3b')
+    parser.add_argument('--slots', type=int, default=4, help="slots parallèles du mock")
+    parser.add_argument('--token-ms', type=float, default=5.0)
+    parser.add_argument('--prompt-eval-ms', type=float, default=100.0)
+    parser.add_argument('--tokens', type=int, default=300)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--json', dest='json_path', default=None, help="écrit le rapport en JSON")
+    args = parser.parse_args()
+
+    mock = MockOllamaServer(MockOllamaConfig(
+        token_ms=args.token_ms, prompt_eval_ms=args.prompt_eval_ms, tokens=args.tokens,
+        slots=args.slots, failure_rate=args.failure_rate,
+    )).start()
+
+    # Configuration lue à l'import des modules rag: à poser AVANT de les importer
+    os.environ['OLLAMA_API_URL'] = mock.url
+    os.environ.setdefault('OLLAMA_PARALLEL_REQUESTS', str(args.slots))
+
+    counter = DbRoundTripCounter()
+    counter.install()
+    tracemalloc.start()
+
+    print(f"🧪 Mock Ollama: {mock.url} ({args.slots} slots, {args.token_ms}ms/token, "
+          f"{args.tokens} tokens, échec {args.failure_rate:.0%})")
+    try:
+        if args.scenario == 'system':
+            report = run_system_scenario(args, counter, mock)
+        else:
+            report = run_jobs_scenario(args, counter, mock)
+    finally:
+        mock.stop()
+
+    report['config'] = vars(args)
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"💾 Rapport écrit: {args.json_path}")
+
+
+if __name__ == '__main__':
+    main()
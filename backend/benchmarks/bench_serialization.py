@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Benchmark sérialisation JSON + compression des réponses API (aucune base requise).
+
+Compare, pour chaque charge utile:
+- encodeur Flask par défaut (stdlib json, clés triées, ASCII échappé)
+- FastJSONProvider (orjson) — rag/core/json_provider.py
+- taille brute / gzip / brotli et temps de compression aux niveaux configurés
+- aller-retour complet via le test_client Flask (jsonify + after_request)
+
+Charges utiles: parcours, plan du musée et critères synthétiques (tailles
+réalistes), ou réponses réelles d'un backend en marche via --url.
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_serialization --artworks 25 --repeat 200
+    python -m benchmarks.bench_serialization --url http://localhost:5000/api/museum/floor-plan --json ser.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify
+from flask.json.provider import DefaultJSONProvider
+
+from rag.core.json_provider import FastJSONProvider, ORJSON_AVAILABLE
+from rag.core.response_compression import (
+    BROTLI_AVAILABLE, compress_body, init_response_compression
+)
+
+_WORDS = (
+    "Regardez", "la", "lumière", "qui", "glisse", "sur", "le", "visage", "du",
+    "personnage", "observez", "les", "plis", "de", "étoffe", "et", "couleur",
+    "profonde", "peintre", "compose", "une", "scène", "calme", "où", "chaque",
+    "détail", "guide", "votre", "regard", "vers", "centre", "tableau",
+)
+
+
+# ===== CHARGES UTILES SYNTHÉTIQUES =====
+
+def _point(rng: random.Random, kind: str, floor: int) -> Dict[str, Any]:
+    return {'type': kind, 'x': round(rng.uniform(0, 2400), 2), 'y': round(rng.uniform(0, 1600), 2),
+            'floor': floor, 'room': rng.randint(1, 40)}
+
+
+def synthetic_parcours(rng: random.Random, artworks: int) -> Dict[str, Any]:
+    """Réponse /api/parcours/generate (forme réelle, contenu aléatoire)"""
+    items, segments, waypoints = [], [], []
+    floor = 0
+    for i in range(artworks):
+        if rng.random() < 0.15:
+            floor = 1 - floor
+        narration = ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(180, 260)))
+        items.append({
+            'order': i + 1, 'oeuvre_id': 100 + i, 'title': f"Œuvre {i}", 'artist': "Artiste",
+            'date': '1850', 'materiaux_technique': 'Huile sur toile', 'artwork_type': 'peinture',
+            'narration': narration, 'narration_word_count': len(narration.split()) * 2,
+            'narration_duration': rng.uniform(60, 140), 'distance_to_next': rng.uniform(0.2, 3),
+            'image_url': f'/uploads/images/{i}.jpg', 'image_link': f'/uploads/images/{i}.jpg',
+            'audio_path': f'/uploads/audio/parcours_1/oeuvre_{100 + i}.wav',
+            'position': {**_point(rng, 'artwork', floor), 'floor_name': f"Étage {floor}"}
+        })
+        previous = items[-1]['position']
+        for _ in range(rng.randint(1, 4)):
+            door = _point(rng, 'door', floor)
+            waypoints.append({'type': 'door', 'position': {k: door[k] for k in ('x', 'y', 'floor', 'room')},
+                              'entity_id': rng.randint(1, 500), 'room_a': door['room'], 'room_b': door['room'] + 1})
+            segments.append({'from': {k: previous[k] for k in ('type', 'x', 'y', 'floor', 'room')}, 'to': door,
+                             'distance': rng.uniform(1, 30), 'floor': floor, 'segment_index': i})
+            previous = door
+    return {
+        'success': True, 'cache': 'miss',
+        'parcours': {
+            'parcours_id': '1_1_2_3', 'profile': {'age': 1, 'thematique': 2, 'style_texte': 3},
+            'artworks': items, 'waypoints': waypoints, 'path_segments': segments,
+            'total_distance': 420.5, 'floors_visited': [0, 1],
+            'metadata': {'total_artworks': artworks, 'floor_distribution': {0: artworks // 2, 1: artworks - artworks // 2},
+                         'unique_parcours_id': 1}
+        },
+        'audio': {'generated': True, 'count': artworks,
+                  'paths': {100 + i: f'/uploads/audio/parcours_1/oeuvre_{100 + i}.wav' for i in range(artworks)}}
+    }
+
+
+def synthetic_floor_plan(rng: random.Random, rooms: int) -> Dict[str, Any]:
+    """Réponse /api/museum/floor-plan (salles en polygones, portes, œuvres)"""
+    entities = []
+    for i in range(rooms):
+        entities.append({
+            'entity_id': i, 'plan_id': i % 3, 'name': f"Salle {i}", 'entity_type': 'ROOM',
+            'points': [{'x': round(rng.uniform(0, 2400), 2), 'y': round(rng.uniform(0, 1600), 2), 'ordre': k}
+                       for k in range(rng.randint(4, 12))]
+        })
+    return {'success': True, 'plans': [{'plan_id': p, 'nom': f"Étage {p}"} for p in range(3)], 'entities': entities}
+
+
+def synthetic_criterias(rng: random.Random, per_type: int) -> Dict[str, Any]:
+    """Réponse /api/criterias/all"""
+    return {'success': True, 'criterias': {
+        t: [{'criteria_id': i, 'name': f"{t}_{i}", 'label': f"Critère {i} ({t})",
+             'description': ' '.join(rng.choice(_WORDS) for _ in range(20)), 'image_link': None, 'ordre': i}
+            for i in range(per_type)]
+        for t in ('age', 'thematique', 'style_texte')
+    }}
+
+
+def fetch_payload(url: str) -> Any:
+    import requests
+    return requests.get(url, timeout=30).json()
+
+
+# ===== MESURES =====
+
+def timed(fn: Callable[[], Any], repeat: int) -> float:
+    """Temps médian d'un appel (ms)"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def bench_payload(name: str, payload: Any, app: Flask, repeat: int) -> Dict[str, Any]:
+    stdlib = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+
+    def stdlib_dumps():
+        # Identique à DefaultJSONProvider.response (mode non-debug)
+        return stdlib.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+    raw_stdlib = stdlib_dumps()
+    raw_fast = fast.dumps_bytes(payload)
+    assert json.loads(raw_stdlib) == json.loads(raw_fast), f"{name}: sorties différentes"
+
+    report = {
+        'payload': name,
+        'stdlib_ms': round(timed(stdlib_dumps, repeat), 3),
+        'fast_ms': round(timed(lambda: fast.dumps_bytes(payload), repeat), 3),
+        'stdlib_bytes': len(raw_stdlib),
+        'fast_bytes': len(raw_fast),
+        'gzip_bytes': len(compress_body(raw_fast, 'gzip')),
+        'gzip_ms': round(timed(lambda: compress_body(raw_fast, 'gzip'), repeat), 3),
+    }
+    if BROTLI_AVAILABLE:
+        report['brotli_bytes'] = len(compress_body(raw_fast, 'br'))
+        report['brotli_ms'] = round(timed(lambda: compress_body(raw_fast, 'br'), repeat), 3)
+    report['speedup'] = round(report['stdlib_ms'] / report['fast_ms'], 1) if report['fast_ms'] else None
+    return report
+
+
+def bench_routes(payloads: Dict[str, Any], repeat: int) -> List[Dict[str, Any]]:
+    """Aller-retour test_client: jsonify + compression, par Accept-Encoding"""
+    results = []
+    for label, use_fast in (('stdlib', False), ('fast', True)):
+        app = Flask('bench_serialization')
+        if use_fast:
+            app.json = FastJSONProvider(app)
+        init_response_compression(app)
+        for name, payload in payloads.items():
+            app.add_url_rule(f'/api/parcours/bench/{name}', f'bench_{name}',
+                             lambda payload=payload: jsonify(payload))
+        client = app.test_client()
+        for name in payloads:
+            for encoding in ('identity', 'gzip', 'br'):
+                if encoding == 'br' and not BROTLI_AVAILABLE:
+                    continue
+                headers = {'Accept-Encoding': encoding}
+                response = client.get(f'/api/parcours/bench/{name}', headers=headers)
+                results.append({
+                    'provider': label, 'payload': name, 'accept_encoding': encoding,
+                    'content_encoding': response.headers.get('Content-Encoding', 'identity'),
+                    'bytes': len(response.get_data()),
+                    'ms': round(timed(lambda: client.get(f'/api/parcours/bench/{name}', headers=headers), repeat), 3)
+                })
+    return results
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n📊 Sérialisation (médiane sur {report['config']['repeat']} appels)")
+    print(f"   {'charge':<14}{'stdlib':>10}{'orjson':>10}{'×':>6}{'brut':>10}{'gzip':>10}{'brotli':>10}")
+    for r in report['payloads']:
+        print(f"   {r['payload']:<14}{r['stdlib_ms']:>8.2f}ms{r['fast_ms']:>8.2f}ms{r['speedup'] or 0:>6}"
+              f"{r['fast_bytes']:>10}{r['gzip_bytes']:>10}{r.get('brotli_bytes', '-'):>10}")
+    print(f"\n🌐 Aller-retour test_client")
+    for r in report['routes']:
+        print(f"   {r['provider']:<7}{r['payload']:<14}{r['accept_encoding']:<9}→ {r['content_encoding']:<9}"
+              f"{r['bytes']:>9} o {r['ms']:>8.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sérialisation JSON + compression API")
+    parser.add_argument('--artworks', type=int, default=25, help="œuvres du parcours synthétique")
+    parser.add_argument('--rooms', type=int, default=120, help="salles du plan synthétique")
+    parser.add_argument('--criterias', type=int, default=12, help="critères par type")
+    parser.add_argument('--url', action='append', default=[], help="réponse réelle à mesurer (répétable)")
+    parser.add_argument('--repeat', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', dest='json_path', default=None, help="écrit le rapport en JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    payloads = {
+        'parcours': synthetic_parcours(rng, args.artworks),
+        'floor_plan': synthetic_floor_plan(rng, args.rooms),
+        'criterias': synthetic_criterias(rng, args.criterias),
+    }
+    for url in args.url:
+        payloads[url.rstrip('/').rsplit('/', 1)[-1]] = fetch_payload(url)
+
+    print(f"🧪 orjson: {'oui' if ORJSON_AVAILABLE else 'non (repli stdlib)'}, "
+          f"brotli: {'oui' if BROTLI_AVAILABLE else 'non (gzip seul)'}")
+    app = Flask('bench_serialization')
+    report = {
+        'payloads': [bench_payload(name, payload, app, args.repeat) for name, payload in payloads.items()],
+        'routes': bench_routes(payloads, max(1, args.repeat // 10)),
+        'config': vars(args),
+    }
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"💾 Rapport écrit: {args.json_path}")
+
+
+if __name__ == '__main__':
+    main()
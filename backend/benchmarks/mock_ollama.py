@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Serveur HTTP local qui imite l'API Ollama (/api/tags, /api/chat).
+Permet de mesurer le pipeline de génération sans modèle, de façon reproductible.
+
+Paramètres émulés:
+- latence par token (et temps d'évaluation du prompt)
+- nombre de slots parallèles (comme OLLAMA_NUM_PARALLEL: au-delà, les requêtes attendent)
+- taux d'échec (HTTP 500)
+- streaming NDJSON ou réponse unique, avec détection de la déconnexion client
+
+Usage autonome:
+    python -m benchmarks.mock_ollama --port 11434 --slots 4 --token-ms 20 --tokens 300
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+_WORDS = (
+    "Regardez", "la", "lumière", "qui", "glisse", "sur", "le", "visage", "du",
+    "personnage", "observez", "les", "plis", "de", "étoffe", "et", "couleur",
+    "profonde", "peintre", "compose", "une", "scène", "calme", "où", "chaque",
+    "détail", "guide", "votre", "regard", "vers", "centre", "tableau",
+)
+
+
+class MockOllamaConfig:
+    def __init__(
+        self,
+        *,
+        token_ms: float = 20.0,
+        prompt_eval_ms: float = 200.0,
+        tokens: int = 300,
+        slots: int = 4,
+        failure_rate: float = 0.0,
+        seed: int = 42,
+    ):
+        self.token_ms = token_ms
+        self.prompt_eval_ms = prompt_eval_ms
+        self.tokens = tokens
+        self.slots = slots
+        self.failure_rate = failure_rate
+        self.seed = seed
+
+
+class MockOllamaServer:
+    """Serveur mock démarrable en thread (pour les benchmarks) ou en CLI"""
+
+    def __init__(self, config: Optional[MockOllamaConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or MockOllamaConfig()
+        self._slots = threading.Semaphore(self.config.slots)
+        self._rng = random.Random(self.config.seed)
+        self._rng_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self.metrics: Dict[str, int] = {
+            "requests": 0, "completed": 0, "failures": 0,
+            "aborted": 0, "active": 0, "max_active": 0,
+        }
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockOllamaServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def reset_metrics(self):
+        with self._metrics_lock:
+            for key in self.metrics:
+                self.metrics[key] = 0
+
+    def _incr(self, key: str, n: int = 1):
+        with self._metrics_lock:
+            self.metrics[key] += n
+            if key == "active":
+                self.metrics["max_active"] = max(self.metrics["max_active"], self.metrics["active"])
+
+    def _should_fail(self) -> bool:
+        with self._rng_lock:
+            return self._rng.random() < self.config.failure_rate
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):  # silencieux
+                pass
+
+            def _send_json(self, status: int, body: Dict):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json(200, {"models": [{"name": "mock:latest"}]})
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                if self.path != "/api/chat":
+                    self._send_json(404, {"error": "not found"})
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                server._incr("requests")
+
+                if server._should_fail():
+                    server._incr("failures")
+                    self._send_json(500, {"error": "mock failure"})
+                    return
+
+                # File d'attente des slots (comme OLLAMA_NUM_PARALLEL)
+                with server._slots:
+                    server._incr("active")
+                    try:
+                        self._generate(payload)
+                    finally:
+                        server._incr("active", -1)
+
+            def _generate(self, payload: Dict):
+                cfg = server.config
+                model = payload.get("model", "mock")
+                time.sleep(cfg.prompt_eval_ms / 1000.0)
+                words = [_WORDS[i % len(_WORDS)] for i in range(cfg.tokens)]
+
+                if not payload.get("stream", True):
+                    time.sleep(cfg.tokens * cfg.token_ms / 1000.0)
+                    self._send_json(200, {
+                        "model": model, "done": True,
+                        "message": {"role": "assistant", "content": " ".join(words)},
+                    })
+                    server._incr("completed")
+                    return
+
+                # Streaming NDJSON (chunked): une ligne par token
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for word in words:
+                        time.sleep(cfg.token_ms / 1000.0)
+                        self._write_chunk({
+                            "model": model, "done": False,
+                            "message": {"role": "assistant", "content": word + " "},
+                        })
+                    self._write_chunk({"model": model, "done": True, "message": {"role": "assistant", "content": ""}})
+                    self.wfile.write(b"0\r\n\r\n")
+                    server._incr("completed")
+                except (BrokenPipeError, ConnectionResetError):
+                    # Client déconnecté (annulation): le slot est libéré immédiatement
+                    server._incr("aborted")
+                    self.close_connection = True
+
+            def _write_chunk(self, obj: Dict):
+                line = (json.dumps(obj) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(line):X}\r\n".encode("ascii") + line + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur Ollama simulé")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--token-ms", type=float, default=20.0)
+    parser.add_argument("--prompt-eval-ms", type=float, default=200.0)
+    parser.add_argument("--tokens", type=int, default=300)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = MockOllamaServer(MockOllamaConfig(
+        token_ms=args.token_ms, prompt_eval_ms=args.prompt_eval_ms, tokens=args.tokens,
+        slots=args.slots, failure_rate=args.failure_rate,
+    ), host=args.host, port=args.port)
+    print(f"🧪 Mock Ollama sur {server.url} ({args.slots} slots, {args.token_ms}ms/token, {args.tokens} tokens)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"📊 {server.metrics}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Durées audio des narrations (mesures Piper + modèle de prédiction)
+- Chaque synthèse Piper enregistre la durée réelle du texte, par voix
+  (clé = md5 du texte: une narration régénérée repart sans mesure)
+- Modèle linéaire par voix: durée ≈ a·caractères + b·mots + c·ponctuation + d,
+  ajusté par moindres carrés sur les mesures et réajusté périodiquement
+- Repli 140 mots/min tant qu'une voix n'a pas assez de mesures
+
+La sélection des œuvres lit la mesure quand elle existe (jointure SQL sur
+md5(pregeneration_text)) et prédit sinon: la durée cible est tenue dès la
+première génération, sans synthèse d'essai.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .db_postgres import _connect_postgres
+
+logger = logging.getLogger(__name__)
+
+# Voix des parcours (fr_FR de PiperTTSService.MODELS)
+DEFAULT_VOICE_MODEL = os.getenv('PARCOURS_VOICE_MODEL', 'fr_FR-siwis-medium')
+
+# Repli historique: Piper ~140 mots/min (plus lent = plus sûr)
+FALLBACK_WORDS_PER_MINUTE = 140
+
+# Mesures minimales avant d'utiliser le modèle ajusté
+_MIN_SAMPLES = 12
+# Réajustement: toutes les N mesures de ce process ou après ce délai
+_REFIT_EVERY_N_RECORDS = 20
+_REFIT_MAX_AGE_SECONDS = 600
+# Mesures les plus récentes utilisées pour l'ajustement
+_FIT_MAX_ROWS = 5000
+
+# Signes qui marquent une pause à l'oral
+_PAUSE_PUNCTUATION = re.compile(r'[.,;:!?…—–()«»"]')
+
+
+def text_md5(text: str) -> str:
+    """Identique à md5(text) côté PostgreSQL (UTF-8)"""
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+
+def text_features(text: str) -> Tuple[int, int, int]:
+    """(caractères, mots, ponctuation de pause) d'une narration"""
+    return len(text), len(text.split()), len(_PAUSE_PUNCTUATION.findall(text))
+
+
+def fallback_duration(text: str) -> float:
+    """Estimation historique à 140 mots/min (secondes)"""
+    return len(text.split()) / FALLBACK_WORDS_PER_MINUTE * 60
+
+
+class AudioDurationModel:
+    """Mesures + prédicteur de durée audio (singleton via get_audio_duration_model)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # voix → (coefficients [a, b, c, d], échantillons, horodatage)
+        self._fits: Dict[str, Tuple[Optional[np.ndarray], int, float]] = {}
+        self._records_since_fit: Dict[str, int] = {}
+        self.default_voice = DEFAULT_VOICE_MODEL
+        self.table_ready = False
+        self._ensure_table_exists()
+
+    def _ensure_table_exists(self):
+        """S'assure que la table existe (migration safe)"""
+        try:
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS audio_durations (
+                    voice_model VARCHAR(100) NOT NULL,
+                    text_md5 CHAR(32) NOT NULL,
+                    char_count INTEGER NOT NULL,
+                    word_count INTEGER NOT NULL,
+                    punctuation_count INTEGER NOT NULL,
+                    duration_seconds DOUBLE PRECISION NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (voice_model, text_md5)
+                )
+            """)
+            conn.commit()
+            cur.close()
+            conn.close()
+            self.table_ready = True
+        except Exception as e:
+            logger.error(f"Erreur création table audio_durations: {e}")
+
+    # ===== MESURES =====
+
+    def record(self, text: str, duration_seconds: float, voice_model: str = DEFAULT_VOICE_MODEL):
+        """Enregistre la durée réelle d'une synthèse"""
+        if not self.table_ready or not text or duration_seconds <= 0:
+            return
+        chars, words, punctuation = text_features(text)
+        try:
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO audio_durations
+                    (voice_model, text_md5, char_count, word_count, punctuation_count, duration_seconds)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON CONFLICT (voice_model, text_md5) DO UPDATE SET
+                    duration_seconds = EXCLUDED.duration_seconds,
+                    updated_at = CURRENT_TIMESTAMP
+            """, (voice_model, text_md5(text), chars, words, punctuation, float(duration_seconds)))
+            conn.commit()
+            cur.close()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Erreur enregistrement durée audio: {e}")
+            return
+        with self._lock:
+            self._records_since_fit[voice_model] = self._records_since_fit.get(voice_model, 0) + 1
+
+    # ===== PRÉDICTION =====
+
+    def fit(self, voice_model: str = DEFAULT_VOICE_MODEL) -> Optional[np.ndarray]:
+        """Ajuste le modèle linéaire de la voix sur les mesures les plus récentes"""
+        coefficients = None
+        samples = 0
+        try:
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT char_count, word_count, punctuation_count, duration_seconds
+                FROM audio_durations
+                WHERE voice_model = %s
+                ORDER BY updated_at DESC
+                LIMIT %s
+            """, (voice_model, _FIT_MAX_ROWS))
+            rows = cur.fetchall()
+            cur.close()
+            conn.close()
+            samples = len(rows)
+            if samples >= _MIN_SAMPLES:
+                data = np.array(
+                    [(r['char_count'], r['word_count'], r['punctuation_count'], r['duration_seconds']) for r in rows],
+                    dtype=np.float64
+                )
+                features = np.column_stack([data[:, :3], np.ones(samples)])
+                coefficients, *_ = np.linalg.lstsq(features, data[:, 3], rcond=None)
+        except Exception as e:
+            logger.error(f"Erreur ajustement modèle durée audio: {e}")
+
+        with self._lock:
+            self._fits[voice_model] = (coefficients, samples, time.time())
+            self._records_since_fit[voice_model] = 0
+        if coefficients is not None:
+            logger.info(f"Modèle durée audio {voice_model}: {samples} mesures, coefficients {np.round(coefficients, 4).tolist()}")
+        return coefficients
+
+    def _coefficients(self, voice_model: str) -> Optional[np.ndarray]:
+        with self._lock:
+            fit = self._fits.get(voice_model)
+            stale = (
+                fit is None
+                or time.time() - fit[2] > _REFIT_MAX_AGE_SECONDS
+                or self._records_since_fit.get(voice_model, 0) >= _REFIT_EVERY_N_RECORDS
+            )
+        if stale and self.table_ready:
+            return self.fit(voice_model)
+        return fit[0] if fit else None
+
+    def predict_many(self, texts: Sequence[str], voice_model: str = DEFAULT_VOICE_MODEL) -> List[float]:
+        """Durées prédites (secondes) pour des textes non encore synthétisés"""
+        if not texts:
+            return []
+        coefficients = self._coefficients(voice_model)
+        if coefficients is None:
+            return [fallback_duration(t) for t in texts]
+        features = np.array([(*text_features(t), 1) for t in texts], dtype=np.float64)
+        predicted = features @ coefficients
+        # Garde-fou: jamais moins que la moitié de l'estimation historique
+        floor = np.array([fallback_duration(t) for t in texts]) * 0.5
+        return np.maximum(predicted, floor).tolist()
+
+    def predict(self, text: str, voice_model: str = DEFAULT_VOICE_MODEL) -> float:
+        return self.predict_many([text], voice_model)[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            fits = {
+                voice: {
+                    'samples': samples,
+                    'coefficients': coefficients.tolist() if coefficients is not None else None,
+                    'fitted_at': fitted_at
+                }
+                for voice, (coefficients, samples, fitted_at) in self._fits.items()
+            }
+        return {'table_ready': self.table_ready, 'min_samples': _MIN_SAMPLES, 'voices': fits}
+
+
+# Singleton global
+_audio_duration_model: Optional[AudioDurationModel] = None
+_audio_duration_model_lock = threading.Lock()
+
+
+def get_audio_duration_model() -> AudioDurationModel:
+    """Retourne le modèle de durée audio singleton"""
+    global _audio_duration_model
+    if _audio_duration_model is None:
+        with _audio_duration_model_lock:
+            if _audio_duration_model is None:
+                _audio_duration_model = AudioDurationModel()
+    return _audio_duration_model
@@ -10,6 +10,8 @@ from datetime import datetime, timedelta
 from pathlib import Path
 import logging
 
+from .parcours_cache import PARCOURS_CACHE_TTL_SECONDS
+
 logger = logging.getLogger(__name__)
 
 class AudioCleanupService:
@@ -19,6 +21,36 @@ class AudioCleanupService:
         self.db_config = db_config
         self.audio_base_dir = Path(audio_base_dir)
         
+    def _referenced_parcours_ids(self, cur):
+        """
+        parcours_id dont le dossier audio sert encore: sessions non expirées,
+        réserve, cache partagé (un parcours en cache est servi à plusieurs visiteurs)
+        """
+        cur.execute("""
+            SELECT parcours_id
+            FROM qr_code
+            WHERE parcours_id IS NOT NULL
+              AND (expires_at IS NULL OR expires_at > NOW())
+        """)
+        referenced = set(row[0] for row in cur.fetchall())
+
+        # Parcours en réserve (pré-construits, pas encore servis)
+        cur.execute("SELECT to_regclass('public.parcours_pool') IS NOT NULL")
+        if cur.fetchone()[0]:
+            cur.execute("SELECT parcours_id FROM parcours_pool WHERE parcours_id IS NOT NULL")
+            referenced.update(row[0] for row in cur.fetchall())
+
+        cur.execute("SELECT to_regclass('public.parcours_cache') IS NOT NULL")
+        if cur.fetchone()[0]:
+            cur.execute("""
+                SELECT DISTINCT (payload->'parcours'->'metadata'->>'unique_parcours_id')::BIGINT
+                FROM parcours_cache
+                WHERE created_at > NOW() - (%s || ' seconds')::INTERVAL
+                  AND payload->'parcours'->'metadata' ? 'unique_parcours_id'
+            """, (PARCOURS_CACHE_TTL_SECONDS,))
+            referenced.update(row[0] for row in cur.fetchall() if row[0] is not None)
+        return referenced
+
     def cleanup_expired_sessions(self):
         """
         Nettoie les fichiers audio des sessions expirées
@@ -40,12 +72,16 @@ class AudioCleanupService:
             """)
             
             expired_sessions = cur.fetchall()
+            # Dossiers partagés avec une autre session active, la réserve ou le cache
+            referenced_ids = self._referenced_parcours_ids(cur) if expired_sessions else set()
             
             for qr_id, token, parcours_id, expires_at in expired_sessions:
-                # Supprimer le dossier audio
+                # Supprimer le dossier audio (sauf s'il sert encore)
                 audio_dir = self.audio_base_dir / f"parcours_{parcours_id}"
                 
-                if audio_dir.exists():
+                if parcours_id in referenced_ids:
+                    logger.info(f"♻️ Dossier audio conservé: parcours_{parcours_id} (encore utilisé)")
+                elif audio_dir.exists():
                     try:
                         shutil.rmtree(audio_dir)
                         logger.info(f"🗑️ Dossier audio supprimé: parcours_{parcours_id} (session {token} expirée)")
@@ -60,6 +96,14 @@ class AudioCleanupService:
                     WHERE qr_code_id = %s
                 """, (qr_id,))
             
+            # Déroulés prévus (affluence) des parcours terminés depuis longtemps
+            cur.execute("SELECT to_regclass('public.parcours_timelines') IS NOT NULL")
+            if cur.fetchone()[0]:
+                cur.execute("""
+                    DELETE FROM parcours_timelines
+                    WHERE updated_at < NOW() - INTERVAL '1 day'
+                """)
+            
             conn.commit()
             
             if cleaned_count > 0:
@@ -84,15 +128,8 @@ class AudioCleanupService:
         try:
             cur = conn.cursor()
             
-            # Récupérer tous les parcours_id actifs (sessions non expirées)
-            cur.execute("""
-                SELECT parcours_id
-                FROM qr_code
-                WHERE parcours_id IS NOT NULL
-                  AND (expires_at IS NULL OR expires_at > NOW())
-            """)
-            
-            active_parcours_ids = set(row[0] for row in cur.fetchall())
+            # parcours_id encore utilisés (sessions actives, réserve, cache)
+            active_parcours_ids = self._referenced_parcours_ids(cur)
             
             # Lister tous les dossiers audio
             if self.audio_base_dir.exists():
@@ -0,0 +1,234 @@
+"""
+Cache des générations Ollama indexé par empreinte de prompt
+- Empreinte = sha256(modèle + options + messages): même prompt → même clé
+- Stockage PostgreSQL (partagé entre workers Gunicorn)
+- Expiration par TTL + éviction LRU au-delà d'un nombre max d'entrées
+- Métriques hit/miss pour monitoring
+
+Écriture systématique (write-through) après chaque génération réussie;
+la réutilisation est opt-in (reuse_cached=True côté admin) car la
+température rend chaque génération unique.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from .db_postgres import _connect_postgres
+
+logger = logging.getLogger(__name__)
+
+GENERATION_CACHE_ENABLED = os.getenv('GENERATION_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+GENERATION_CACHE_TTL_DAYS = int(os.getenv('GENERATION_CACHE_TTL_DAYS', '30'))
+GENERATION_CACHE_MAX_ENTRIES = int(os.getenv('GENERATION_CACHE_MAX_ENTRIES', '20000'))
+
+# Éviction lancée toutes les N écritures (évite un DELETE à chaque génération)
+_EVICT_EVERY_N_PUTS = 100
+
+
+def prompt_fingerprint(model: str, options: Dict[str, Any], messages: List[Dict[str, str]]) -> str:
+    """Empreinte canonique d'un appel /api/chat (ordre des clés normalisé)"""
+    canonical = json.dumps(
+        {'model': model, 'options': options, 'messages': messages},
+        sort_keys=True, ensure_ascii=False, separators=(',', ':')
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class GenerationCache:
+    """Cache PostgreSQL des sorties LLM (singleton via get_generation_cache)"""
+
+    def __init__(self):
+        self.enabled = GENERATION_CACHE_ENABLED
+        self._lock = threading.Lock()
+        self._metrics = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'errors': 0}
+        self._puts_since_evict = 0
+        if self.enabled:
+            self._ensure_table_exists()
+
+    def _ensure_table_exists(self):
+        """S'assure que la table existe (migration safe)"""
+        try:
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS generation_cache (
+                    fingerprint CHAR(64) PRIMARY KEY,
+                    model VARCHAR(100) NOT NULL,
+                    response_text TEXT NOT NULL,
+                    size_bytes INTEGER NOT NULL DEFAULT 0,
+                    hit_count INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    last_hit_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_generation_cache_lru ON generation_cache(last_hit_at)")
+            conn.commit()
+            cur.close()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Erreur création table generation_cache: {e}")
+
+    def _incr(self, metric: str, n: int = 1):
+        with self._lock:
+            self._metrics[metric] += n
+
+    def get(self, fingerprint: str) -> Optional[str]:
+        """Retourne le texte en cache (non expiré) et met à jour son LRU, sinon None"""
+        if not self.enabled:
+            return None
+        try:
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            cur.execute("""
+                UPDATE generation_cache
+                SET hit_count = hit_count + 1, last_hit_at = CURRENT_TIMESTAMP
+                WHERE fingerprint = %s
+                  AND created_at > NOW() - (%s || ' days')::INTERVAL
+                RETURNING response_text
+            """, (fingerprint, GENERATION_CACHE_TTL_DAYS))
+            row = cur.fetchone()
+            conn.commit()
+            cur.close()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Erreur lecture cache génération: {e}")
+            self._incr('errors')
+            return None
+
+        if row:
+            self._incr('hits')
+            return row['response_text']
+        self._incr('misses')
+        return None
+
+    def put(self, fingerprint: str, model: str, response_text: str):
+        """Enregistre (ou rafraîchit) une sortie LLM"""
+        if not self.enabled or not response_text:
+            return
+        try:
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO generation_cache (fingerprint, model, response_text, size_bytes)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (fingerprint) DO UPDATE SET
+                    response_text = EXCLUDED.response_text,
+                    size_bytes = EXCLUDED.size_bytes,
+                    created_at = CURRENT_TIMESTAMP,
+                    last_hit_at = CURRENT_TIMESTAMP
+            """, (fingerprint, model, response_text, len(response_text.encode('utf-8'))))
+            conn.commit()
+            cur.close()
+            conn.close()
+            self._incr('stores')
+        except Exception as e:
+            logger.error(f"Erreur écriture cache génération: {e}")
+            self._incr('errors')
+            return
+
+        with self._lock:
+            self._puts_since_evict += 1
+            should_evict = self._puts_since_evict >= _EVICT_EVERY_N_PUTS
+            if should_evict:
+                self._puts_since_evict = 0
+        if should_evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """Supprime les entrées expirées puis les moins récemment utilisées au-delà du max"""
+        try:
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            cur.execute("""
+                DELETE FROM generation_cache
+                WHERE created_at < NOW() - (%s || ' days')::INTERVAL
+            """, (GENERATION_CACHE_TTL_DAYS,))
+            deleted = cur.rowcount
+            cur.execute("""
+                DELETE FROM generation_cache
+                WHERE fingerprint IN (
+                    SELECT fingerprint FROM generation_cache
+                    ORDER BY last_hit_at DESC
+                    OFFSET %s
+                )
+            """, (GENERATION_CACHE_MAX_ENTRIES,))
+            deleted += cur.rowcount
+            conn.commit()
+            cur.close()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Erreur éviction cache génération: {e}")
+            self._incr('errors')
+            return 0
+
+        if deleted:
+            self._incr('evictions', deleted)
+            logger.info(f"Cache génération: {deleted} entrées évincées")
+        return deleted
+
+    def clear(self) -> int:
+        """Vide entièrement le cache"""
+        conn = _connect_postgres()
+        cur = conn.cursor()
+        try:
+            cur.execute("DELETE FROM generation_cache")
+            deleted = cur.rowcount
+            conn.commit()
+            return deleted
+        finally:
+            cur.close()
+            conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Métriques du process + état de la table"""
+        with self._lock:
+            metrics = dict(self._metrics)
+        lookups = metrics['hits'] + metrics['misses']
+        stats = {
+            'enabled': self.enabled,
+            'ttl_days': GENERATION_CACHE_TTL_DAYS,
+            'max_entries': GENERATION_CACHE_MAX_ENTRIES,
+            'process': metrics,
+            'hit_rate': round(metrics['hits'] / lookups, 3) if lookups else None
+        }
+        if not self.enabled:
+            return stats
+        try:
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT COUNT(*) AS entries,
+                       COALESCE(SUM(size_bytes), 0) AS total_bytes,
+                       COALESCE(SUM(hit_count), 0) AS total_hits
+                FROM generation_cache
+            """)
+            row = cur.fetchone()
+            cur.close()
+            conn.close()
+            stats.update({
+                'entries': row['entries'],
+                'total_bytes': int(row['total_bytes']),
+                'total_hits': int(row['total_hits'])
+            })
+        except Exception as e:
+            logger.error(f"Erreur stats cache génération: {e}")
+        return stats
+
+
+# Singleton global
+_generation_cache: Optional[GenerationCache] = None
+_generation_cache_lock = threading.Lock()
+
+
+def get_generation_cache() -> GenerationCache:
+    """Retourne le cache de génération singleton"""
+    global _generation_cache
+    if _generation_cache is None:
+        with _generation_cache_lock:
+            if _generation_cache is None:
+                _generation_cache = GenerationCache()
+    return _generation_cache
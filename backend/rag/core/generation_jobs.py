@@ -4,6 +4,7 @@ Gestionnaire de jobs de génération asynchrone - VERSION OPTIMISÉE
 - Estimation intelligente du temps restant basée sur historique réel
 - Support pour génération parallèle avec ThreadPoolExecutor
 - Métriques détaillées pour monitoring
+- Reprise après redémarrage: bail (lease) + checkpoint compact par job
 """
 
 import threading
@@ -19,7 +20,10 @@ import psycopg2
 import psycopg2.extras
 import os
 import hashlib
+import bisect
 import multiprocessing
+import socket
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -47,6 +51,77 @@ else:
 logger.info(f"🔧 Generation Jobs: {_CPU_COUNT} CPUs détectés, {MAX_PARALLEL_GENERATIONS} workers parallèles")
 print(f"🔧 Generation Jobs: {_CPU_COUNT} CPUs détectés, {MAX_PARALLEL_GENERATIONS} workers parallèles")
 
+# ===== REPRISE DES JOBS (LEASE) =====
+# Un job pending/running appartient au process qui détient son bail.
+# Le bail est renouvelé en continu; s'il expire (crash, redéploiement),
+# n'importe quel worker peut récupérer le job et le reprendre au checkpoint.
+JOB_LEASE_SECONDS = int(os.getenv('GENERATION_JOB_LEASE_SECONDS', '60'))
+_HEARTBEAT_INTERVAL = max(1.0, JOB_LEASE_SECONDS / 3)
+_WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Fréquence de détection des annulations faites depuis un autre worker
+_CANCEL_POLL_INTERVAL = float(os.getenv('GENERATION_CANCEL_POLL_SECONDS', '2'))
+
+
+class JobCancelledError(Exception):
+    """Levée quand une génération est interrompue par l'annulation de son job"""
+
+
+class CancellationToken:
+    """
+    Jeton d'annulation coopérative d'un job (un par job actif dans ce process).
+    - Les workers le testent avant chaque tâche
+    - Le client Ollama en streaming y attache la fermeture de sa requête HTTP
+    - Le runner y attache l'abandon en bloc des futures en attente
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: float) -> bool:
+        """Attend l'annulation au plus `timeout` secondes (réveil immédiat si annulé)"""
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise JobCancelledError("Job annulé")
+
+    def add_callback(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Enregistre un callback appelé à l'annulation (immédiatement si déjà annulé).
+        Retourne une fonction pour le désenregistrer.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove_callback(callback)
+        callback()
+        return lambda: None
+
+    def _remove_callback(self, callback: Callable[[], None]):
+        with self._lock:
+            try:
+                self._callbacks.remove(callback)
+            except ValueError:
+                pass
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.debug(f"Callback d'annulation en erreur: {e}")
+
 
 class JobStatus(Enum):
     PENDING = "pending"
@@ -87,6 +162,10 @@ class GenerationJob:
     # Erreur éventuelle
     error_message: Optional[str] = None
     
+    # Reprise: checkpoint compact des items terminés + propriétaire du bail
+    checkpoint: Dict[str, Any] = field(default_factory=dict)
+    lease_owner: Optional[str] = None
+    
     def to_dict(self) -> Dict:
         elapsed = self._get_elapsed_seconds()
         remaining = self._estimate_remaining_intelligent()
@@ -117,6 +196,8 @@ class GenerationJob:
             },
             "params": self.params,
             "error": self.error_message,
+            "resumable": bool(self.checkpoint),
+            "lease_owner": self.lease_owner,
             "elapsed_seconds": elapsed,
             "estimated_remaining_seconds": remaining
         }
@@ -187,6 +268,69 @@ class GenerationJob:
         return max(0, remaining)
 
 
+class JobCheckpoint:
+    """
+    Checkpoint compact des items terminés d'un job (stocké en JSONB).
+
+    Format:
+    {
+      "ranges": [[1, 12], [15, 20]],        # œuvres entièrement traitées (plages d'IDs)
+      "partial": {"13": ["a1b2...", ...]}   # œuvres en cours: hash des combinaisons faites
+    }
+
+    Une œuvre passe de "partial" à "ranges" dès que toutes ses combinaisons
+    attendues sont terminées: la taille reste proportionnelle au travail en cours,
+    pas au catalogue.
+    """
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None, expected: Optional[Dict[int, int]] = None):
+        data = data or {}
+        self.ranges: List[List[int]] = sorted([int(a), int(b)] for a, b in data.get('ranges', []))
+        self.partial: Dict[int, set] = {
+            int(oeuvre_id): set(hashes) for oeuvre_id, hashes in (data.get('partial') or {}).items()
+        }
+        # Nombre de combinaisons attendues par œuvre (pour compacter en plage)
+        self.expected: Dict[int, int] = {int(k): v for k, v in (expected or {}).items()}
+
+    def _in_ranges(self, oeuvre_id: int) -> bool:
+        idx = bisect.bisect_right(self.ranges, [oeuvre_id, float('inf')]) - 1
+        return idx >= 0 and self.ranges[idx][0] <= oeuvre_id <= self.ranges[idx][1]
+
+    def _add_to_ranges(self, oeuvre_id: int):
+        if self._in_ranges(oeuvre_id):
+            return
+        idx = bisect.bisect_left(self.ranges, [oeuvre_id, oeuvre_id])
+        self.ranges.insert(idx, [oeuvre_id, oeuvre_id])
+        # Fusion avec les voisins contigus
+        if idx + 1 < len(self.ranges) and self.ranges[idx + 1][0] == oeuvre_id + 1:
+            self.ranges[idx][1] = self.ranges.pop(idx + 1)[1]
+        if idx > 0 and self.ranges[idx - 1][1] == oeuvre_id - 1:
+            self.ranges[idx - 1][1] = self.ranges.pop(idx)[1]
+
+    def is_done(self, oeuvre_id: int, combo_hash: str) -> bool:
+        """True si (oeuvre_id, combo_hash) a déjà été traité par ce job"""
+        oeuvre_id = int(oeuvre_id)
+        return self._in_ranges(oeuvre_id) or combo_hash in self.partial.get(oeuvre_id, ())
+
+    def mark_done(self, oeuvre_id: int, combo_hash: str):
+        """Enregistre un item terminé (succès, skip ou erreur définitive)"""
+        oeuvre_id = int(oeuvre_id)
+        if self._in_ranges(oeuvre_id):
+            return
+        done = self.partial.setdefault(oeuvre_id, set())
+        done.add(combo_hash)
+        expected = self.expected.get(oeuvre_id)
+        if expected is not None and len(done) >= expected:
+            del self.partial[oeuvre_id]
+            self._add_to_ranges(oeuvre_id)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'ranges': self.ranges,
+            'partial': {str(k): sorted(v) for k, v in self.partial.items()}
+        }
+
+
 def _connect_postgres():
     """Connexion PostgreSQL avec pool de connexions"""
     return psycopg2.connect(
@@ -222,8 +366,14 @@ class GenerationJobManager:
         
         self._ensure_tables_exist()
         self._thread_pool = ThreadPoolExecutor(max_workers=MAX_PARALLEL_GENERATIONS)
+        # Runners par job_type (pour reprendre un job récupéré après expiration du bail)
+        self._runners: Dict[str, Callable[[GenerationJob], None]] = {}
+        self._heartbeat_thread: Optional[threading.Thread] = None
+        # Jetons d'annulation des jobs exécutés par ce process
+        self._cancel_tokens: Dict[str, CancellationToken] = {}
+        self._tokens_lock = threading.Lock()
         self._initialized = True
-        logger.info(f"GenerationJobManager initialisé avec {MAX_PARALLEL_GENERATIONS} workers parallèles")
+        logger.info(f"GenerationJobManager initialisé avec {MAX_PARALLEL_GENERATIONS} workers parallèles ({_WORKER_ID})")
     
     def _ensure_tables_exist(self):
         """S'assure que les tables existent (migration safe)"""
@@ -258,7 +408,10 @@ class GenerationJobManager:
             for col, col_type in [
                 ('avg_generation_time_ms', 'INTEGER'),
                 ('avg_skip_time_ms', 'INTEGER'),
-                ('last_generation_time_ms', 'INTEGER')
+                ('last_generation_time_ms', 'INTEGER'),
+                ('lease_owner', 'VARCHAR(128)'),
+                ('lease_expires_at', 'TIMESTAMP'),
+                ('checkpoint', 'JSONB')
             ]:
                 try:
                     cur.execute(f"""
@@ -285,6 +438,7 @@ class GenerationJobManager:
             cur.execute("CREATE INDEX IF NOT EXISTS idx_generation_jobs_status ON generation_jobs(status)")
             cur.execute("CREATE INDEX IF NOT EXISTS idx_generation_jobs_created ON generation_jobs(created_at DESC)")
             cur.execute("CREATE INDEX IF NOT EXISTS idx_gen_time_history_job ON generation_time_history(job_id)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_generation_jobs_lease ON generation_jobs(status, lease_expires_at)")
             
             conn.commit()
             cur.close()
@@ -318,7 +472,9 @@ class GenerationJobManager:
             avg_skip_time_ms=row.get('avg_skip_time_ms'),
             last_generation_time_ms=row.get('last_generation_time_ms'),
             params=row['params'] or {},
-            error_message=row['error_message']
+            error_message=row['error_message'],
+            checkpoint=row.get('checkpoint') or {},
+            lease_owner=row.get('lease_owner')
         )
     
     def create_job(self, job_type: str, params: Dict[str, Any] = None) -> GenerationJob:
@@ -328,10 +484,11 @@ class GenerationJobManager:
         try:
             conn = _connect_postgres()
             cur = conn.cursor()
+            # Le process créateur détient le bail dès la création (job en attente inclus)
             cur.execute("""
-                INSERT INTO generation_jobs (job_id, job_type, params, status)
-                VALUES (%s, %s, %s, 'pending')
-            """, (job_id, job_type, json.dumps(params or {})))
+                INSERT INTO generation_jobs (job_id, job_type, params, status, lease_owner, lease_expires_at)
+                VALUES (%s, %s, %s, 'pending', %s, NOW() + (%s || ' seconds')::INTERVAL)
+            """, (job_id, job_type, json.dumps(params or {}), _WORKER_ID, JOB_LEASE_SECONDS))
             conn.commit()
             cur.close()
             conn.close()
@@ -454,9 +611,14 @@ class GenerationJobManager:
         current_item: str = None,
         generated: int = None,
         skipped: int = None,
-        errors: int = None
+        errors: int = None,
+        checkpoint: Dict[str, Any] = None
     ):
-        """Met à jour la progression d'un job"""
+        """
+        Met à jour la progression d'un job.
+        Le checkpoint est écrit dans le même UPDATE que les compteurs: après un
+        crash, compteurs et items terminés restent cohérents.
+        """
         try:
             updates = []
             values = []
@@ -476,6 +638,9 @@ class GenerationJobManager:
             if errors is not None:
                 updates.append("errors = %s")
                 values.append(errors)
+            if checkpoint is not None:
+                updates.append("checkpoint = %s::jsonb")
+                values.append(json.dumps(checkpoint))
             
             if not updates:
                 return
@@ -496,15 +661,20 @@ class GenerationJobManager:
             logger.error(f"Erreur mise à jour progression: {e}")
     
     def start_job(self, job_id: str, total_items: int):
-        """Marque un job comme démarré"""
+        """
+        Marque un job comme démarré.
+        Pour un job repris, started_at est conservé (le timer ne repart pas de zéro).
+        """
         try:
             conn = _connect_postgres()
             cur = conn.cursor()
             cur.execute("""
                 UPDATE generation_jobs 
-                SET status = 'running', started_at = CURRENT_TIMESTAMP, total_items = %s
+                SET status = 'running', started_at = COALESCE(started_at, CURRENT_TIMESTAMP),
+                    total_items = %s, lease_owner = %s,
+                    lease_expires_at = NOW() + (%s || ' seconds')::INTERVAL
                 WHERE job_id = %s
-            """, (total_items, job_id))
+            """, (total_items, _WORKER_ID, JOB_LEASE_SECONDS, job_id))
             conn.commit()
             cur.close()
             conn.close()
@@ -515,7 +685,8 @@ class GenerationJobManager:
     def can_start_job(self, job_id: str) -> bool:
         """
         Vérifie si un job peut démarrer.
-        Un job ne peut démarrer que s'il n'y a pas d'autre job 'running'.
+        Un job ne peut démarrer que s'il n'y a pas d'autre job 'running'
+        avec un bail vivant (un job orphelin ne bloque pas la file).
         """
         try:
             conn = _connect_postgres()
@@ -524,6 +695,7 @@ class GenerationJobManager:
             cur.execute("""
                 SELECT COUNT(*) FROM generation_jobs 
                 WHERE status = 'running' AND job_id != %s
+                  AND lease_expires_at > NOW()
             """, (job_id,))
             running_count = cur.fetchone()[0]
             cur.close()
@@ -539,8 +711,8 @@ class GenerationJobManager:
         Retourne True si le job peut démarrer, False si annulé ou timeout.
         Le job reste en 'pending' pendant l'attente.
         """
-        import time
         waited = 0
+        token = self._cancel_tokens.get(job_id)
         
         while waited < max_wait:
             # Vérifier si le job a été annulé
@@ -554,8 +726,11 @@ class GenerationJobManager:
                 logger.info(f"Job {job_id} peut maintenant démarrer (attendu {waited}s)")
                 return True
             
-            # Attendre avant de revérifier
-            time.sleep(check_interval)
+            # Attendre avant de revérifier (réveillé immédiatement par une annulation)
+            if token is not None:
+                token.wait(check_interval)
+            else:
+                time.sleep(check_interval)
             waited += check_interval
             
             # Log périodique
@@ -573,8 +748,9 @@ class GenerationJobManager:
             cur = conn.cursor()
             cur.execute("""
                 UPDATE generation_jobs 
-                SET status = %s, completed_at = CURRENT_TIMESTAMP, error_message = %s
-                WHERE job_id = %s
+                SET status = %s, completed_at = CURRENT_TIMESTAMP, error_message = %s,
+                    lease_owner = NULL, lease_expires_at = NULL
+                WHERE job_id = %s AND status <> 'cancelled'
             """, (status, error_message, job_id))
             conn.commit()
             cur.close()
@@ -598,14 +774,16 @@ class GenerationJobManager:
                 cur.execute("""
                     UPDATE generation_jobs 
                     SET status = 'cancelled', completed_at = CURRENT_TIMESTAMP,
-                        error_message = 'Annulé par l''utilisateur (force stop)'
+                        error_message = 'Annulé par l''utilisateur (force stop)',
+                        lease_owner = NULL, lease_expires_at = NULL
                     WHERE job_id = %s AND status IN ('pending', 'running')
                 """, (job_id,))
             else:
                 # Annuler seulement les jobs en attente
                 cur.execute("""
                     UPDATE generation_jobs 
-                    SET status = 'cancelled', completed_at = CURRENT_TIMESTAMP
+                    SET status = 'cancelled', completed_at = CURRENT_TIMESTAMP,
+                        lease_owner = NULL, lease_expires_at = NULL
                     WHERE job_id = %s AND status = 'pending'
                 """, (job_id,))
             
@@ -616,6 +794,9 @@ class GenerationJobManager:
             
             if affected > 0:
                 logger.info(f"Job annulé: {job_id} (force={force})")
+                # Arrêt immédiat si le job tourne dans ce process
+                # (les autres workers le détectent via _heartbeat_loop)
+                self._signal_cancel(job_id)
             return affected > 0
         except Exception as e:
             logger.error(f"Erreur annulation job: {e}")
@@ -629,7 +810,8 @@ class GenerationJobManager:
             cur.execute("""
                 UPDATE generation_jobs 
                 SET status = 'cancelled', completed_at = CURRENT_TIMESTAMP,
-                    error_message = 'Annulé en masse'
+                    error_message = 'Annulé en masse',
+                    lease_owner = NULL, lease_expires_at = NULL
                 WHERE status IN ('pending', 'running')
             """)
             affected = cur.rowcount
@@ -639,6 +821,8 @@ class GenerationJobManager:
             
             if affected > 0:
                 logger.info(f"Jobs annulés en masse: {affected}")
+                for job_id in list(self._cancel_tokens):
+                    self._signal_cancel(job_id)
             return affected
         except Exception as e:
             logger.error(f"Erreur annulation en masse: {e}")
@@ -650,17 +834,164 @@ class GenerationJobManager:
         task_func: Callable[[GenerationJob], None]
     ):
         """Lance une tâche de génération en arrière-plan"""
+        self.get_cancel_token(job.job_id)
+        
         def wrapper():
             try:
                 task_func(job)
+            except JobCancelledError:
+                logger.info(f"Job {job.job_id} interrompu (annulation)")
             except Exception as e:
                 logger.error(f"Erreur job {job.job_id}: {e}")
                 self.complete_job(job.job_id, success=False, error_message=str(e))
+            finally:
+                self.release_cancel_token(job.job_id)
         
         thread = threading.Thread(target=wrapper, daemon=True)
         thread.start()
         logger.info(f"Job {job.job_id} lancé en arrière-plan")
     
+    # ===== ANNULATION COOPÉRATIVE =====
+    
+    def get_cancel_token(self, job_id: str) -> CancellationToken:
+        """Retourne (ou crée) le jeton d'annulation d'un job exécuté par ce process"""
+        with self._tokens_lock:
+            token = self._cancel_tokens.get(job_id)
+            if token is None:
+                token = CancellationToken()
+                self._cancel_tokens[job_id] = token
+            return token
+    
+    def release_cancel_token(self, job_id: str):
+        with self._tokens_lock:
+            self._cancel_tokens.pop(job_id, None)
+    
+    def _signal_cancel(self, job_id: str):
+        token = self._cancel_tokens.get(job_id)
+        if token is not None:
+            token.cancel()
+    
+    def poll_cancellations(self) -> int:
+        """
+        Détecte les annulations faites par un autre worker Gunicorn
+        (une seule requête pour tous les jobs locaux).
+        """
+        job_ids = list(self._cancel_tokens)
+        if not job_ids:
+            return 0
+        try:
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT job_id FROM generation_jobs
+                WHERE job_id = ANY(%s) AND status = 'cancelled'
+            """, (job_ids,))
+            cancelled = [row[0] for row in cur.fetchall()]
+            cur.close()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Erreur détection annulations: {e}")
+            return 0
+        
+        for job_id in cancelled:
+            self._signal_cancel(job_id)
+        return len(cancelled)
+    
+    # ===== REPRISE APRÈS REDÉMARRAGE =====
+    
+    def register_runner(self, job_type: str, runner: Callable[[GenerationJob], None]):
+        """
+        Enregistre la fonction d'exécution d'un type de job.
+        Nécessaire pour reprendre un job récupéré d'un autre process.
+        """
+        self._runners[job_type] = runner
+    
+    def start_heartbeat(self):
+        """
+        Démarre le thread qui renouvelle nos baux, récupère les jobs orphelins
+        et propage les annulations venant des autres workers.
+        """
+        with self._lock:
+            if self._heartbeat_thread and self._heartbeat_thread.is_alive():
+                return
+            self._heartbeat_thread = threading.Thread(
+                target=self._heartbeat_loop, name="generation-jobs-heartbeat", daemon=True
+            )
+            self._heartbeat_thread.start()
+        logger.info(f"Heartbeat jobs démarré (bail {JOB_LEASE_SECONDS}s, owner {_WORKER_ID})")
+    
+    def _heartbeat_loop(self):
+        last_lease_tick = 0.0
+        while True:
+            self.poll_cancellations()
+            if time.time() - last_lease_tick >= _HEARTBEAT_INTERVAL:
+                self.renew_leases()
+                self.reclaim_expired_jobs()
+                last_lease_tick = time.time()
+            time.sleep(_CANCEL_POLL_INTERVAL)
+    
+    def renew_leases(self) -> int:
+        """Prolonge le bail de tous les jobs actifs détenus par ce process"""
+        try:
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            cur.execute("""
+                UPDATE generation_jobs
+                SET lease_expires_at = NOW() + (%s || ' seconds')::INTERVAL
+                WHERE lease_owner = %s AND status IN ('pending', 'running')
+            """, (JOB_LEASE_SECONDS, _WORKER_ID))
+            renewed = cur.rowcount
+            conn.commit()
+            cur.close()
+            conn.close()
+            return renewed
+        except Exception as e:
+            logger.error(f"Erreur renouvellement baux: {e}")
+            return 0
+    
+    def reclaim_expired_jobs(self) -> List[GenerationJob]:
+        """
+        Récupère les jobs pending/running dont le bail a expiré (ou n'a jamais
+        été posé: lignes antérieures à la migration) et les relance depuis leur
+        checkpoint. Le claim est atomique (SKIP LOCKED): un seul worker Gunicorn
+        reprend un job donné.
+        """
+        if not self._runners:
+            return []
+        try:
+            conn = _connect_postgres()
+            cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cur.execute("""
+                UPDATE generation_jobs
+                SET lease_owner = %s,
+                    lease_expires_at = NOW() + (%s || ' seconds')::INTERVAL
+                WHERE job_id IN (
+                    SELECT job_id FROM generation_jobs
+                    WHERE status IN ('pending', 'running')
+                      AND job_type = ANY(%s)
+                      AND (lease_expires_at IS NULL OR lease_expires_at < NOW())
+                    ORDER BY created_at
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING *
+            """, (_WORKER_ID, JOB_LEASE_SECONDS, list(self._runners.keys())))
+            rows = cur.fetchall()
+            conn.commit()
+            cur.close()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Erreur récupération jobs expirés: {e}")
+            return []
+        
+        jobs = [self._row_to_job(row) for row in rows]
+        for job in jobs:
+            logger.warning(
+                f"♻️ Reprise du job {job.job_id} ({job.job_type}, {job.status.value}) "
+                f"à {job.completed_items}/{job.total_items}"
+            )
+            self.run_async(job, self._runners[job.job_type])
+        return jobs
+    
     def get_thread_pool(self) -> ThreadPoolExecutor:
         """Retourne le pool de threads pour génération parallèle"""
         return self._thread_pool
@@ -0,0 +1,81 @@
+"""
+Fournisseur JSON rapide pour Flask (orjson)
+- Remplace l'encodeur stdlib de jsonify / request.get_json
+- Même sortie que le fournisseur par défaut: clés triées, dates HTTP,
+  Decimal en chaîne (seul l'échappement ASCII disparaît: UTF-8 direct)
+- Repli transparent sur le fournisseur par défaut si orjson est absent,
+  en mode debug (indentation) ou sur un type non géré
+"""
+
+import json
+import logging
+import os
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# FAST_JSON=0 force l'encodeur stdlib (comparaison, diagnostic)
+FAST_JSON_ENABLED = os.getenv('FAST_JSON', '1') == '1'
+
+if ORJSON_AVAILABLE:
+    # Clés non-str (ex: floor_distribution par étage), numpy, dates via default (format Flask)
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Fournisseur JSON orjson, compatible DefaultJSONProvider"""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.fast = ORJSON_AVAILABLE and FAST_JSON_ENABLED
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        """Sérialise en UTF-8 (chemin rapide, repli stdlib)"""
+        if self.fast:
+            options = _ORJSON_OPTIONS | orjson.OPT_SORT_KEYS if self.sort_keys else _ORJSON_OPTIONS
+            try:
+                return orjson.dumps(obj, default=self.default, option=options)
+            except TypeError as e:
+                # Type inconnu d'orjson (ex: entier > 64 bits): encodeur stdlib
+                logger.debug(f"orjson → repli stdlib: {e}")
+        return super().dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs or not self.fast:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if self.fast and not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                # NaN/Infinity acceptés par json mais pas par orjson; sinon même erreur
+                pass
+        return json.loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        if not self.fast or (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+
+def init_json_provider(app):
+    """Installe le fournisseur rapide sur l'application"""
+    app.json_provider_class = FastJSONProvider
+    app.json = FastJSONProvider(app)
+    if app.json.fast:
+        print("⚡ JSON: orjson")
+    else:
+        print(f"ℹ️ JSON: encodeur stdlib ({'orjson absent' if not ORJSON_AVAILABLE else 'FAST_JSON=0'})")
+    return app.json
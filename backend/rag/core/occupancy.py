@@ -0,0 +1,260 @@
+"""
+Affluence estimée du musée (parcours actifs)
+- Chaque parcours servi enregistre son déroulé prévu: arrêt par œuvre avec
+  heure d'arrivée et de départ relatives au départ du visiteur
+- Les sessions QR actives (qr_code.linked_at) datent ces déroulés: on en
+  déduit le nombre de visiteurs attendus par œuvre et par salle dans le temps
+- La sélection et l'ordonnancement des nouveaux parcours pénalisent les
+  œuvres et salles chargées, pour répartir les visiteurs simultanés
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .db_postgres import _connect_postgres
+
+logger = logging.getLogger(__name__)
+
+PARCOURS_OCCUPANCY_ENABLED = os.getenv('PARCOURS_OCCUPANCY_ENABLED', '1') == '1'
+# Durée de vie de l'instantané en mémoire (secondes)
+PARCOURS_OCCUPANCY_TTL_SECONDS = float(os.getenv('PARCOURS_OCCUPANCY_TTL_SECONDS', '15'))
+# Sessions plus anciennes ignorées (minutes)
+PARCOURS_OCCUPANCY_MAX_AGE_MIN = int(os.getenv('PARCOURS_OCCUPANCY_MAX_AGE_MIN', '240'))
+
+# Part de l'affluence de la salle ajoutée à celle de l'œuvre
+ROOM_LOAD_WEIGHT = 0.25
+# Temps d'observation par œuvre (minutes), comme l'estimation des parcours
+OBSERVATION_MINUTES = 2.0
+
+
+def parcours_timeline(parcours: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Déroulé prévu d'un parcours: [{oeuvre_id, room, floor, start_min, end_min}]
+    Arrêt = narration + observation, trajet = distance_to_next (déjà en minutes)
+    """
+    stops = []
+    elapsed = 0.0
+    for artwork in parcours.get('artworks', []):
+        dwell = (artwork.get('narration_duration') or 0) / 60 + OBSERVATION_MINUTES
+        position = artwork.get('position') or {}
+        stops.append({
+            'oeuvre_id': artwork['oeuvre_id'],
+            'room': position.get('room'),
+            'floor': position.get('floor'),
+            'start_min': round(elapsed, 2),
+            'end_min': round(elapsed + dwell, 2)
+        })
+        elapsed += dwell + (artwork.get('distance_to_next') or 0)
+    return stops
+
+
+class OccupancyForecast:
+    """
+    Arrêts prévus des visiteurs actifs, en minutes relatives à maintenant
+    (négatif = déjà passé). Sans accès base: partagé entre threads d'un lot.
+    """
+
+    def __init__(self, stops: Sequence[Dict[str, Any]] = (), visitors: int = 0):
+        self.visitors = visitors
+        self.oeuvre_ids = np.array([s['oeuvre_id'] for s in stops], dtype=np.int64)
+        self.rooms = np.array([s['room'] if s['room'] is not None else -1 for s in stops], dtype=np.int64)
+        self.floors = np.array([s['floor'] if s['floor'] is not None else -1 for s in stops], dtype=np.int64)
+        self.starts = np.array([s['start_min'] for s in stops], dtype=np.float64)
+        self.ends = np.array([s['end_min'] for s in stops], dtype=np.float64)
+
+    def __bool__(self):
+        return bool(self.oeuvre_ids.size)
+
+    def _presence(self, mask: np.ndarray, start_min: float, end_min: float) -> float:
+        """Visiteurs présents en moyenne sur [start_min, end_min] parmi les arrêts du masque"""
+        if not mask.any():
+            return 0.0
+        span = max(end_min - start_min, 1e-6)
+        overlap = np.minimum(self.ends[mask], end_min) - np.maximum(self.starts[mask], start_min)
+        return float(np.clip(overlap, 0, None).sum() / span)
+
+    def room_load(self, floor: int, room: int, start_min: float, end_min: float) -> float:
+        return self._presence((self.floors == floor) & (self.rooms == room), start_min, end_min)
+
+    def load(self, oeuvre_id: int, floor: int, room: int, start_min: float, end_min: float) -> float:
+        """Affluence attendue devant une œuvre (+ part de sa salle) sur une fenêtre"""
+        if not self:
+            return 0.0
+        return self._presence(self.oeuvre_ids == oeuvre_id, start_min, end_min) + \
+            ROOM_LOAD_WEIGHT * self.room_load(floor, room, start_min, end_min)
+
+    def artwork_loads(self, artworks: Sequence, horizon_min: float) -> Dict[int, float]:
+        """Charge moyenne par oeuvre_id sur [0, horizon] (pondération de la sélection)"""
+        if not self:
+            return {}
+        loads = {}
+        for artwork in artworks:
+            value = self.load(artwork.oeuvre_id, artwork.position.floor, artwork.position.room, 0.0, horizon_min)
+            if value > 0:
+                loads[artwork.oeuvre_id] = value
+        return loads
+
+    def room_forecast(self, horizon_min: float = 60, step_min: float = 15) -> List[Dict[str, Any]]:
+        """Visiteurs attendus par salle, par tranche de step_min jusqu'à horizon_min"""
+        active = self.ends > 0
+        keys = sorted(set(zip(self.floors[active].tolist(), self.rooms[active].tolist())))
+        windows = np.arange(0, horizon_min, step_min)
+        forecast = []
+        for floor, room in keys:
+            slots = [
+                {'from_min': float(t), 'to_min': float(min(t + step_min, horizon_min)),
+                 'visitors': round(self.room_load(floor, room, t, min(t + step_min, horizon_min)), 2)}
+                for t in windows
+            ]
+            forecast.append({
+                'floor': floor,
+                'room': room,
+                'now': round(self.room_load(floor, room, 0.0, 1.0), 2),
+                'peak': max((s['visitors'] for s in slots), default=0.0),
+                'slots': slots
+            })
+        forecast.sort(key=lambda r: r['peak'], reverse=True)
+        return forecast
+
+
+class OccupancyModel:
+    """Déroulés des parcours + instantané d'affluence (singleton via get_occupancy_model)"""
+
+    def __init__(self):
+        self.enabled = PARCOURS_OCCUPANCY_ENABLED
+        self.table_ready = False
+        self._lock = threading.Lock()
+        self._snapshot: Optional[OccupancyForecast] = None
+        self._snapshot_at = 0.0
+        if self.enabled:
+            self._ensure_table_exists()
+
+    def _ensure_table_exists(self):
+        """S'assure que la table et la colonne existent (migration safe)"""
+        try:
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS parcours_timelines (
+                    parcours_id BIGINT PRIMARY KEY,
+                    total_minutes DOUBLE PRECISION NOT NULL,
+                    stops JSONB NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cur.execute("ALTER TABLE qr_code ADD COLUMN IF NOT EXISTS linked_at TIMESTAMP")
+            conn.commit()
+            cur.close()
+            conn.close()
+            self.table_ready = True
+        except Exception as e:
+            logger.error(f"Erreur création table parcours_timelines: {e}")
+
+    # ===== DÉROULÉS =====
+
+    def record_parcours(self, parcours: Dict[str, Any]):
+        """Enregistre le déroulé prévu d'un parcours servi"""
+        if not self.table_ready:
+            return
+        parcours_id = (parcours.get('metadata') or {}).get('unique_parcours_id')
+        stops = parcours_timeline(parcours)
+        if parcours_id is None or not stops:
+            return
+        try:
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO parcours_timelines (parcours_id, total_minutes, stops)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (parcours_id) DO UPDATE SET
+                    total_minutes = EXCLUDED.total_minutes,
+                    stops = EXCLUDED.stops,
+                    updated_at = CURRENT_TIMESTAMP
+            """, (parcours_id, stops[-1]['end_min'], json.dumps(stops)))
+            conn.commit()
+            cur.close()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Erreur enregistrement déroulé parcours {parcours_id}: {e}")
+
+    # ===== AFFLUENCE =====
+
+    def forecast(self) -> OccupancyForecast:
+        """Instantané des visiteurs actifs (rafraîchi toutes les TTL secondes)"""
+        if not self.table_ready:
+            return OccupancyForecast()
+        with self._lock:
+            if self._snapshot is not None and time.time() - self._snapshot_at < PARCOURS_OCCUPANCY_TTL_SECONDS:
+                return self._snapshot
+
+        stops = []
+        visitors = 0
+        try:
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            # Une ligne par session: un même parcours servi deux fois compte deux visiteurs
+            cur.execute("""
+                SELECT t.stops,
+                       EXTRACT(EPOCH FROM (NOW() - COALESCE(qr.linked_at, qr.used_at))) / 60 AS elapsed_min
+                FROM qr_code qr
+                JOIN parcours_timelines t ON t.parcours_id = qr.parcours_id
+                WHERE qr.is_used = 1
+                  AND (qr.expires_at IS NULL OR qr.expires_at > NOW())
+                  AND COALESCE(qr.linked_at, qr.used_at) > NOW() - %s * INTERVAL '1 minute'
+                  AND EXTRACT(EPOCH FROM (NOW() - COALESCE(qr.linked_at, qr.used_at))) / 60 < t.total_minutes
+            """, (PARCOURS_OCCUPANCY_MAX_AGE_MIN,))
+            for row in cur.fetchall():
+                elapsed = float(row['elapsed_min'])
+                visitors += 1
+                for stop in row['stops']:
+                    stops.append({**stop, 'start_min': stop['start_min'] - elapsed, 'end_min': stop['end_min'] - elapsed})
+            cur.close()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Erreur lecture affluence: {e}")
+
+        snapshot = OccupancyForecast(stops, visitors)
+        with self._lock:
+            self._snapshot = snapshot
+            self._snapshot_at = time.time()
+        return snapshot
+
+    def crowd_epoch(self) -> Optional[int]:
+        """
+        Fenêtre de l'instantané pour les clés de cache des parcours sans seed:
+        None sans visiteur actif (parcours indépendant de l'affluence), sinon
+        un numéro qui change à chaque rafraîchissement (commun aux workers)
+        """
+        if not self.enabled or not self.forecast():
+            return None
+        return int(time.time() // PARCOURS_OCCUPANCY_TTL_SECONDS)
+
+    def get_stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            'enabled': self.enabled,
+            'table_ready': self.table_ready,
+            'active_visitors': snapshot.visitors if snapshot is not None else None,
+            'snapshot_age_seconds': round(time.time() - self._snapshot_at, 1) if snapshot is not None else None
+        }
+
+
+# Singleton global
+_occupancy_model: Optional[OccupancyModel] = None
+_occupancy_model_lock = threading.Lock()
+
+
+def get_occupancy_model() -> OccupancyModel:
+    """Retourne le modèle d'affluence singleton"""
+    global _occupancy_model
+    if _occupancy_model is None:
+        with _occupancy_model_lock:
+            if _occupancy_model is None:
+                _occupancy_model = OccupancyModel()
+    return _occupancy_model
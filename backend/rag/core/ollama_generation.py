@@ -6,8 +6,12 @@ from typing import Dict, Any, List, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 
+import json
+import hashlib
 import requests
 from rag.core.pregeneration_db import add_pregeneration
+from rag.core.generation_jobs import JobCancelledError
+from rag.core.generation_cache import get_generation_cache, prompt_fingerprint
 
 # ===== CONFIGURATION CPU DYNAMIQUE - UTILISATION MAXIMALE =====
 
@@ -70,6 +74,39 @@ print(f"   → {_OLLAMA_PARALLEL_REQUESTS} requêtes parallèles max (sémaphore
 print(f"   → Threads gérés par Ollama serveur (OLLAMA_NUM_THREAD)")
 
 
+# ===== EMPREINTES DE CONTENU (régénération incrémentale) =====
+# Champs de l'œuvre lus par oeuvre_to_prompt_text: doit rester synchronisé avec ce dernier
+ARTWORK_PROMPT_FIELDS = (
+    "title", "artist", "date_oeuvre", "materiaux_technique", "description",
+    "analyse_materielle_technique", "iconographie_symbolique", "contexte_commande",
+)
+# Champs d'un critère lus par formater_parametres_criteres
+CRITERIA_PROMPT_FIELDS = ("name", "description", "ai_indication")
+
+
+def _content_hash(values: Dict[str, Any]) -> str:
+    canonical = json.dumps(values, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def artwork_content_hash(artwork: Dict[str, Any]) -> str:
+    """Empreinte des champs de l'œuvre qui entrent dans le prompt"""
+    return _content_hash({
+        f: OllamaMediationSystem.normalize_str(artwork.get(f)) for f in ARTWORK_PROMPT_FIELDS
+    })
+
+
+def criteria_content_hashes(combinaison: Dict[str, Any]) -> Dict[str, str]:
+    """Empreinte par type de critère des champs qui entrent dans le prompt"""
+    return {
+        type_name: _content_hash({
+            f: OllamaMediationSystem.normalize_str(data.get(f)) for f in CRITERIA_PROMPT_FIELDS
+        })
+        for type_name, data in (combinaison or {}).items()
+        if isinstance(data, dict)
+    }
+
+
 class OllamaMediationSystem:
     """
     Système de génération de médiations avec Ollama (inspiré du style de ton script).
@@ -197,6 +234,52 @@ class OllamaMediationSystem:
                 pass
 
 
+    def _check_fresh(
+        self,
+        oeuvre_id: int,
+        combinaison: Dict[str, Any],
+        artwork_hash: str,
+        criteria_hashes: Dict[str, str],
+    ) -> bool:
+        """
+        True si la pregeneration existe ET a été produite à partir des mêmes
+        contenus (œuvre + critères). Sans empreintes (NULL = obsolète, lignes
+        antérieures au suivi), la narration est régénérée une fois: toutes les
+        écritures enregistrent désormais leurs empreintes.
+        """
+        try:
+            from rag.core.pregeneration_db import _connect_postgres
+
+            criteria_ids = self._criteria_ids_from_combinaison(combinaison)
+            criteria_json = json.dumps(criteria_ids, sort_keys=True)
+
+            conn = _connect_postgres()
+            cur = conn.cursor()
+
+            cur.execute(
+                """
+                SELECT artwork_hash, criteria_hashes
+                FROM pregenerations
+                WHERE oeuvre_id = %s
+                  AND criteria_combination = %s::jsonb
+                LIMIT 1
+                """,
+                (oeuvre_id, criteria_json),
+            )
+            row = cur.fetchone()
+            if row is None or row["artwork_hash"] is None or row["criteria_hashes"] is None:
+                return False
+            return row["artwork_hash"] == artwork_hash and row["criteria_hashes"] == criteria_hashes
+
+        except Exception:
+            return False
+        finally:
+            try:
+                cur.close()
+                conn.close()
+            except Exception:
+                pass
+
     # ---------------------------------------------------------------------
     # Ollama
     # ---------------------------------------------------------------------
@@ -218,8 +301,21 @@ class OllamaMediationSystem:
         temperature: Optional[float] = None,
         stream: bool = False,
         timeout_s: Optional[int] = None,
+        cancel_token: Optional[Any] = None,
+        reuse_cached: bool = False,
     ) -> str:
+        """
+        Appel /api/chat. Avec un cancel_token, la réponse est lue en streaming:
+        l'annulation ferme la connexion HTTP (Ollama libère alors son slot)
+        et lève JobCancelledError.
+
+        Toute réponse est enregistrée dans le cache par empreinte de prompt;
+        avec reuse_cached=True, une réponse déjà produite pour exactement le
+        même prompt (modèle, options, messages) est renvoyée sans appel LLM.
+        """
         url = f"{self.ollama_url}/api/chat"
+        if cancel_token is not None:
+            stream = True
         
         # ===== OPTIONS OPTIMISÉES =====
         # NE PAS spécifier num_thread ici - laisser Ollama serveur gérer
@@ -237,10 +333,52 @@ class OllamaMediationSystem:
                 "num_batch": 256,  # Batch size pour bonne performance CPU
             },
         }
-        r = requests.post(url, json=payload, timeout=(timeout_s or self.timeout_s))
-        r.raise_for_status()
-        data = r.json()
-        return data["message"]["content"]
+        cache = get_generation_cache()
+        fingerprint = prompt_fingerprint(model, payload["options"], messages)
+        if reuse_cached:
+            cached = cache.get(fingerprint)
+            if cached is not None:
+                return cached
+
+        if not stream:
+            r = requests.post(url, json=payload, timeout=(timeout_s or self.timeout_s))
+            r.raise_for_status()
+            data = r.json()
+            content = data["message"]["content"]
+            cache.put(fingerprint, model, content)
+            return content
+
+        # ===== STREAMING (annulable) =====
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        r = requests.post(url, json=payload, timeout=(timeout_s or self.timeout_s), stream=True)
+        # Fermer la réponse depuis le thread d'annulation débloque la lecture en cours
+        unregister = cancel_token.add_callback(r.close) if cancel_token is not None else (lambda: None)
+        chunks: List[str] = []
+        try:
+            r.raise_for_status()
+            for line in r.iter_lines():
+                if cancel_token is not None and cancel_token.is_cancelled():
+                    break
+                if not line:
+                    continue
+                data = json.loads(line)
+                chunks.append(data.get("message", {}).get("content", ""))
+                if data.get("done"):
+                    break
+        except Exception:
+            if cancel_token is not None and cancel_token.is_cancelled():
+                raise JobCancelledError("Génération annulée")
+            raise
+        finally:
+            unregister()
+            r.close()
+
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        content = "".join(chunks)
+        cache.put(fingerprint, model, content)
+        return content
 
     # ---------------------------------------------------------------------
     # Formatting oeuvre → texte prompt (OPTIMISÉ - tokens réduits)
@@ -330,10 +468,13 @@ FORMAT:
         model: Optional[str] = None,
         temperature: Optional[float] = None,
         max_chars: int = 7000,
+        cancel_token: Optional[Any] = None,
+        reuse_cached: bool = False,
     ) -> Dict[str, Any]:
         """
         Génère UNE médiation pour une œuvre + une combinaison de critères.
         Retour: {'success': bool, 'text': str, 'error': str|None}
+        JobCancelledError est propagée (pas convertie en erreur de génération).
         """
         try:
             work_text = self.oeuvre_to_prompt_text(artwork, max_chars=max_chars)
@@ -353,6 +494,8 @@ FORMAT:
                 messages=messages,
                 temperature=temperature,
                 stream=False,
+                cancel_token=cancel_token,
+                reuse_cached=reuse_cached,
             )
 
             if not text or len(text.strip()) < 30:
@@ -360,6 +503,8 @@ FORMAT:
 
             return {"success": True, "text": text, "error": None}
 
+        except JobCancelledError:
+            raise
         except Exception as e:
             return {"success": False, "error": str(e), "text": ""}
 
@@ -397,6 +542,7 @@ FORMAT:
 
         stats = {"generated": 0, "updated": 0, "skipped": 0, "errors": 0}
         results: List[Dict[str, Any]] = []
+        artwork_hash = artwork_content_hash(artwork)
         
         # Filtrer les combinaisons déjà existantes (batch check)
         to_generate = []
@@ -451,7 +597,9 @@ FORMAT:
                         pregen_id = add_pregeneration(
                             oeuvre_id=oeuvre_id,
                             criteria_dict=combinaison,
-                            pregeneration_text=text_clean
+                            pregeneration_text=text_clean,
+                            artwork_hash=artwork_hash,
+                            criteria_hashes=criteria_content_hashes(combinaison)
                         )
                         
                         if pregen_id:
@@ -513,31 +661,58 @@ FORMAT:
         model: Optional[str] = None,
         force_regenerate: bool = False,
         duree_minutes: int = 3,
+        cancel_token: Optional[Any] = None,
+        reuse_cached: bool = False,
+        stale_only: bool = False,
     ) -> Dict[str, Any]:
         """
         Génère une seule narration pour une œuvre + combinaison.
         Utilisé par le système de jobs asynchrones pour un suivi granulaire.
+        Avec stale_only, seule une narration absente ou dont les contenus
+        sources (œuvre, critères) ont changé est régénérée. stale_only et
+        force_regenerate sont exclusifs: les routes refusent la combinaison,
+        et stale_only l'emporte si elle arrive malgré tout (job ancien).
         
         Returns:
             {
                 'generated': bool,  # True si nouvelle génération
                 'skipped': bool,    # True si existait déjà
+                'cancelled': bool,  # True si le job a été annulé avant/pendant l'appel
                 'error': str|None   # Message d'erreur éventuel
             }
         """
+        cancelled = {'generated': False, 'skipped': False, 'cancelled': True, 'error': 'Job annulé'}
         try:
-            # Vérifier si existe déjà
-            if not force_regenerate and self._check_existing(oeuvre_id, combination):
+            if cancel_token is not None and cancel_token.is_cancelled():
+                return cancelled
+            
+            artwork_hash = artwork_content_hash(artwork)
+            criteria_hashes = criteria_content_hashes(combination)
+            
+            # Vérifier si existe déjà (et à jour en mode stale_only)
+            if stale_only:
+                if self._check_fresh(oeuvre_id, combination, artwork_hash, criteria_hashes):
+                    return {'generated': False, 'skipped': True, 'error': None}
+            elif not force_regenerate and self._check_existing(oeuvre_id, combination):
                 return {'generated': False, 'skipped': True, 'error': None}
             
+            # Attente d'un slot Ollama, interrompue par une annulation
+            while not _ollama_semaphore.acquire(timeout=0.5):
+                if cancel_token is not None and cancel_token.is_cancelled():
+                    return cancelled
+            
             # Générer la narration
-            with _ollama_semaphore:
+            try:
                 result = self.generate_mediation_for_one_work(
                     artwork=artwork,
                     combinaison=combination,
                     duree_minutes=duree_minutes,
                     model=model or self.default_model,
+                    cancel_token=cancel_token,
+                    reuse_cached=reuse_cached,
                 )
+            finally:
+                _ollama_semaphore.release()
             
             if not result.get('success'):
                 return {
@@ -551,7 +726,9 @@ FORMAT:
             pregen_id = add_pregeneration(
                 oeuvre_id=oeuvre_id,
                 criteria_dict=combination,
-                pregeneration_text=text_clean
+                pregeneration_text=text_clean,
+                artwork_hash=artwork_hash,
+                criteria_hashes=criteria_hashes
             )
             
             if pregen_id:
@@ -559,5 +736,7 @@ FORMAT:
             else:
                 return {'generated': False, 'skipped': False, 'error': 'Échec sauvegarde DB'}
                 
+        except JobCancelledError:
+            return cancelled
         except Exception as e:
             return {'generated': False, 'skipped': False, 'error': str(e)}
@@ -0,0 +1,454 @@
+"""
+Cache des parcours générés (réponse complète de /api/parcours/generate)
+- Clé = sha256(critères normalisés + tranche de durée + seed + audio + version)
+- Version = empreinte du plan, des œuvres et des prégénérations: toute
+  sauvegarde du plan ou nouvelle narration invalide les entrées existantes
+  (relue au plus toutes les PARCOURS_VERSION_TTL_SECONDS par worker)
+- Mémoire LRU par worker + stockage PostgreSQL partagé optionnel (TTL)
+- Single-flight: les requêtes identiques simultanées attendent le premier
+  calcul au lieu de relancer sélection + synthèse audio
+
+Mode audio asynchrone: la réponse de phase 1 (plan + parcours_id/status_url)
+est mise en cache sous la même clé, les visiteurs suivent alors le même
+manifeste; une réponse complète (audio synchrone) la remplace ensuite.
+
+À chaque hit, le manifeste audio est vérifié: si le nettoyage a supprimé
+un fichier, l'entrée est abandonnée et le parcours régénéré.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .db_postgres import _connect_postgres
+from .versioned_responses import TablesVersion
+
+logger = logging.getLogger(__name__)
+
+PARCOURS_CACHE_ENABLED = os.getenv('PARCOURS_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+PARCOURS_CACHE_SHARED = os.getenv('PARCOURS_CACHE_SHARED', 'true').lower() in ('1', 'true', 'yes')
+PARCOURS_CACHE_TTL_SECONDS = int(os.getenv('PARCOURS_CACHE_TTL_SECONDS', '1800'))
+PARCOURS_CACHE_MAX_ENTRIES = int(os.getenv('PARCOURS_CACHE_MAX_ENTRIES', '256'))
+PARCOURS_CACHE_SHARED_MAX_ENTRIES = int(os.getenv('PARCOURS_CACHE_SHARED_MAX_ENTRIES', '2000'))
+PARCOURS_DURATION_BUCKET_MIN = int(os.getenv('PARCOURS_DURATION_BUCKET_MIN', '5'))
+
+# Attente max d'un calcul identique en cours (synthèse audio comprise)
+_FLIGHT_TIMEOUT_SECONDS = 300
+
+# Racine des chemins audio relatifs (/uploads/audio/... → /app/uploads/audio/...)
+_AUDIO_FILES_ROOT = os.getenv('PARCOURS_AUDIO_ROOT', '/app')
+
+# Éviction partagée lancée toutes les N écritures
+_EVICT_EVERY_N_PUTS = 50
+
+# Tables dont le contenu change le résultat d'un parcours
+_VERSIONED_TABLES = ('plans', 'entities', 'points', 'relations', 'oeuvres', 'pregenerations')
+
+
+def bucket_duration(minutes: Any) -> int:
+    """Arrondit la durée cible à la tranche la plus proche (min. une tranche)"""
+    minutes = float(minutes)
+    if PARCOURS_DURATION_BUCKET_MIN <= 1:
+        return int(round(minutes))
+    bucket = PARCOURS_DURATION_BUCKET_MIN
+    return max(bucket, int(round(minutes / bucket)) * bucket)
+
+
+# Relue au plus toutes les PARCOURS_VERSION_TTL_SECONDS: pas de balayage des tables à chaque requête
+_museum_version = TablesVersion(
+    _VERSIONED_TABLES, ttl=float(os.getenv('PARCOURS_VERSION_TTL_SECONDS', '5'))
+)
+
+
+def museum_version() -> str:
+    """Empreinte du plan + œuvres + prégénérations (nombre de lignes et xmin max)"""
+    return _museum_version.current()
+
+
+def invalidate_museum_version():
+    """Relecture immédiate de la version (après vidage du cache)"""
+    _museum_version.invalidate()
+
+
+def parcours_cache_key(
+    criteria: Dict[str, int], duration_bucket: int, seed: Optional[int],
+    generate_audio: bool, version: str, crowd_epoch: Optional[int] = None
+) -> str:
+    """
+    Empreinte canonique d'une demande de parcours
+    crowd_epoch: fenêtre d'affluence (parcours sans seed orientés par les visiteurs actifs)
+    """
+    request = {
+        'criteria': {str(k): int(v) for k, v in criteria.items()},
+        'duration': duration_bucket,
+        'seed': seed,
+        'audio': bool(generate_audio),
+        'version': version
+    }
+    if crowd_epoch is not None:
+        request['crowd'] = crowd_epoch
+    canonical = json.dumps(request, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def audio_manifest(payload: Dict[str, Any]) -> List[str]:
+    """Chemins audio référencés par une réponse de parcours (manifeste des réponses asynchrones)"""
+    audio = payload.get('audio') or {}
+    paths = set(audio.get('paths', {}).values())
+    if audio.get('mode') == 'async':
+        paths.add(f"/uploads/audio/parcours_{audio['parcours_id']}/manifest.json")
+    for artwork in (payload.get('parcours') or {}).get('artworks', []):
+        if artwork.get('audio_path'):
+            paths.add(artwork['audio_path'])
+    return sorted(paths)
+
+
+def audio_files_available(payload: Dict[str, Any]) -> bool:
+    """True si tous les fichiers audio du manifeste existent encore"""
+    return all(
+        os.path.isfile(os.path.join(_AUDIO_FILES_ROOT, path.lstrip('/')))
+        for path in audio_manifest(payload)
+    )
+
+
+class _Flight:
+    """Calcul en cours pour une clé (les suiveurs attendent done)"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.payload: Optional[Dict[str, Any]] = None
+
+
+class ParcoursCache:
+    """Cache des parcours (singleton via get_parcours_cache)"""
+
+    def __init__(self):
+        self.enabled = PARCOURS_CACHE_ENABLED
+        self.shared = PARCOURS_CACHE_ENABLED and PARCOURS_CACHE_SHARED
+        self._lock = threading.Lock()
+        self._memory: 'OrderedDict[str, Tuple[float, Dict[str, Any]]]' = OrderedDict()
+        self._flights: Dict[str, _Flight] = {}
+        self._metrics = {
+            'hits': 0, 'shared_hits': 0, 'misses': 0, 'coalesced': 0,
+            'stores': 0, 'stale_audio': 0, 'evictions': 0, 'errors': 0
+        }
+        self._puts_since_evict = 0
+        if self.shared:
+            self._ensure_table_exists()
+
+    def _ensure_table_exists(self):
+        """S'assure que la table existe (migration safe)"""
+        try:
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS parcours_cache (
+                    cache_key CHAR(64) PRIMARY KEY,
+                    payload JSONB NOT NULL,
+                    size_bytes INTEGER NOT NULL DEFAULT 0,
+                    hit_count INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    last_hit_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_parcours_cache_lru ON parcours_cache(last_hit_at)")
+            conn.commit()
+            cur.close()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Erreur création table parcours_cache: {e}")
+            self.shared = False
+
+    def _incr(self, metric: str, n: int = 1):
+        with self._lock:
+            self._metrics[metric] += n
+
+    def _memory_get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.monotonic():
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return payload
+
+    def _memory_put(self, key: str, payload: Dict[str, Any]):
+        evicted = 0
+        with self._lock:
+            self._memory[key] = (time.monotonic() + PARCOURS_CACHE_TTL_SECONDS, payload)
+            self._memory.move_to_end(key)
+            while len(self._memory) > PARCOURS_CACHE_MAX_ENTRIES:
+                self._memory.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self._incr('evictions', evicted)
+
+    def _shared_get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            cur.execute("""
+                UPDATE parcours_cache
+                SET hit_count = hit_count + 1, last_hit_at = CURRENT_TIMESTAMP
+                WHERE cache_key = %s
+                  AND created_at > NOW() - (%s || ' seconds')::INTERVAL
+                RETURNING payload
+            """, (key, PARCOURS_CACHE_TTL_SECONDS))
+            row = cur.fetchone()
+            conn.commit()
+            cur.close()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Erreur lecture cache parcours: {e}")
+            self._incr('errors')
+            return None
+        return row['payload'] if row else None
+
+    def _shared_put(self, key: str, payload: Dict[str, Any]):
+        try:
+            body = json.dumps(payload, ensure_ascii=False, default=str)
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO parcours_cache (cache_key, payload, size_bytes)
+                VALUES (%s, %s::jsonb, %s)
+                ON CONFLICT (cache_key) DO UPDATE SET
+                    payload = EXCLUDED.payload,
+                    size_bytes = EXCLUDED.size_bytes,
+                    created_at = CURRENT_TIMESTAMP,
+                    last_hit_at = CURRENT_TIMESTAMP
+            """, (key, body, len(body.encode('utf-8'))))
+            conn.commit()
+            cur.close()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Erreur écriture cache parcours: {e}")
+            self._incr('errors')
+            return
+
+        with self._lock:
+            self._puts_since_evict += 1
+            should_evict = self._puts_since_evict >= _EVICT_EVERY_N_PUTS
+            if should_evict:
+                self._puts_since_evict = 0
+        if should_evict:
+            self.evict()
+
+    def _discard(self, key: str):
+        """Retire une entrée (audio supprimé entre-temps)"""
+        with self._lock:
+            self._memory.pop(key, None)
+        if not self.shared:
+            return
+        try:
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            cur.execute("DELETE FROM parcours_cache WHERE cache_key = %s", (key,))
+            conn.commit()
+            cur.close()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Erreur suppression entrée cache parcours: {e}")
+            self._incr('errors')
+
+    def get(
+        self, key: str,
+        usable: Callable[[Dict[str, Any]], bool] = lambda payload: True
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Retourne (réponse, 'hit' | 'shared_hit') si présente, audio intact et
+        acceptée par usable (ex.: réponse complète exigée), sinon (None, None)
+        """
+        if not self.enabled:
+            return None, None
+        status = 'hit'
+        payload = self._memory_get(key)
+        if payload is None and self.shared:
+            payload = self._shared_get(key)
+            status = 'shared_hit'
+        if payload is None or not usable(payload):
+            return None, None
+
+        if not audio_files_available(payload):
+            self._incr('stale_audio')
+            self._discard(key)
+            return None, None
+
+        if status == 'shared_hit':
+            self._memory_put(key, payload)
+            self._incr('shared_hits')
+        else:
+            self._incr('hits')
+        return payload, status
+
+    def put(self, key: str, payload: Dict[str, Any]):
+        """Enregistre une réponse (mémoire + stockage partagé)"""
+        if not self.enabled:
+            return
+        self._memory_put(key, payload)
+        if self.shared:
+            self._shared_put(key, payload)
+        self._incr('stores')
+
+    def get_or_compute(
+        self, key: str,
+        compute: Callable[[], Tuple[Dict[str, Any], int]],
+        cacheable: Callable[[Dict[str, Any]], bool] = lambda payload: True,
+        usable: Callable[[Dict[str, Any]], bool] = lambda payload: True
+    ) -> Tuple[Dict[str, Any], int, str]:
+        """
+        Retourne (réponse, statut HTTP, statut cache) en ne calculant qu'une
+        fois par clé et par worker. Seules les réponses 200 jugées cacheable
+        sont conservées; un suiveur dont le meneur échoue recalcule lui-même.
+        Une entrée refusée par usable est recalculée puis remplacée.
+        """
+        if not self.enabled:
+            payload, http_status = compute()
+            return payload, http_status, 'disabled'
+
+        payload, status = self.get(key, usable)
+        if payload is not None:
+            return payload, 200, status
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+
+        if not leader:
+            self._incr('coalesced')
+            flight.done.wait(_FLIGHT_TIMEOUT_SECONDS)
+            if flight.payload is not None and usable(flight.payload):
+                return flight.payload, 200, 'coalesced'
+            payload, http_status = compute()
+            return payload, http_status, 'miss'
+
+        try:
+            self._incr('misses')
+            payload, http_status = compute()
+            if http_status == 200 and cacheable(payload):
+                self.put(key, payload)
+                flight.payload = payload
+            return payload, http_status, 'miss'
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def evict(self) -> int:
+        """Supprime les entrées partagées expirées puis les moins récemment utilisées"""
+        if not self.shared:
+            return 0
+        try:
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            cur.execute("""
+                DELETE FROM parcours_cache
+                WHERE created_at < NOW() - (%s || ' seconds')::INTERVAL
+            """, (PARCOURS_CACHE_TTL_SECONDS,))
+            deleted = cur.rowcount
+            cur.execute("""
+                DELETE FROM parcours_cache
+                WHERE cache_key IN (
+                    SELECT cache_key FROM parcours_cache
+                    ORDER BY last_hit_at DESC
+                    OFFSET %s
+                )
+            """, (PARCOURS_CACHE_SHARED_MAX_ENTRIES,))
+            deleted += cur.rowcount
+            conn.commit()
+            cur.close()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Erreur éviction cache parcours: {e}")
+            self._incr('errors')
+            return 0
+
+        if deleted:
+            self._incr('evictions', deleted)
+            logger.info(f"Cache parcours: {deleted} entrées évincées")
+        return deleted
+
+    def clear(self) -> int:
+        """Vide le cache mémoire de ce worker et le stockage partagé"""
+        with self._lock:
+            deleted = len(self._memory)
+            self._memory.clear()
+        if not self.shared:
+            return deleted
+        conn = _connect_postgres()
+        cur = conn.cursor()
+        try:
+            cur.execute("DELETE FROM parcours_cache")
+            deleted += cur.rowcount
+            conn.commit()
+            return deleted
+        finally:
+            cur.close()
+            conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Métriques du process + état du stockage partagé"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            memory_entries = len(self._memory)
+            in_flight = len(self._flights)
+        lookups = metrics['hits'] + metrics['shared_hits'] + metrics['misses']
+        stats = {
+            'enabled': self.enabled,
+            'shared': self.shared,
+            'ttl_seconds': PARCOURS_CACHE_TTL_SECONDS,
+            'max_entries': PARCOURS_CACHE_MAX_ENTRIES,
+            'duration_bucket_min': PARCOURS_DURATION_BUCKET_MIN,
+            'memory_entries': memory_entries,
+            'in_flight': in_flight,
+            'process': metrics,
+            'hit_rate': round((metrics['hits'] + metrics['shared_hits']) / lookups, 3) if lookups else None
+        }
+        if not self.shared:
+            return stats
+        try:
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT COUNT(*) AS entries,
+                       COALESCE(SUM(size_bytes), 0) AS total_bytes,
+                       COALESCE(SUM(hit_count), 0) AS total_hits
+                FROM parcours_cache
+            """)
+            row = cur.fetchone()
+            cur.close()
+            conn.close()
+            stats.update({
+                'shared_entries': row['entries'],
+                'total_bytes': int(row['total_bytes']),
+                'total_hits': int(row['total_hits'])
+            })
+        except Exception as e:
+            logger.error(f"Erreur stats cache parcours: {e}")
+        return stats
+
+
+# Singleton global
+_parcours_cache: Optional[ParcoursCache] = None
+_parcours_cache_lock = threading.Lock()
+
+
+def get_parcours_cache() -> ParcoursCache:
+    """Retourne le cache de parcours singleton"""
+    global _parcours_cache
+    if _parcours_cache is None:
+        with _parcours_cache_lock:
+            if _parcours_cache is None:
+                _parcours_cache = ParcoursCache()
+    return _parcours_cache
@@ -0,0 +1,423 @@
+"""
+Réserve de parcours pré-construits (warm pool) par profil populaire
+- Profils cibles: historique des demandes (parcours_requests), complété par
+  les combinaisons de critères déjà prégénérées × durées courantes
+- K parcours complets (audio compris) prêts par (profil, durée), stockés
+  dans PostgreSQL: tous les workers Gunicorn puisent dans la même file
+- Retrait atomique (FOR UPDATE SKIP LOCKED): un parcours n'est servi qu'une fois
+- Un seul worker remplit la réserve à la fois (verrou consultatif)
+
+Version d'une entrée = plan et œuvres + narrations de SON profil: une
+génération admin pour d'autres profils ne vide pas la réserve. Un profil
+dont les narrations ont été écrites il y a moins de
+PARCOURS_POOL_SETTLE_SECONDS n'est ni vidé ni reconstruit (génération en
+cours): la synthèse reprend une fois les narrations stables. Les entrées
+obsolètes sont supprimées au remplissage suivant; leur audio redevient
+orphelin et part au nettoyage habituel.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .db_postgres import _connect_postgres
+from .parcours_cache import audio_files_available
+from .versioned_responses import TablesVersion
+
+logger = logging.getLogger(__name__)
+
+PARCOURS_POOL_ENABLED = os.getenv('PARCOURS_POOL_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+PARCOURS_POOL_SIZE = int(os.getenv('PARCOURS_POOL_SIZE', '3'))
+PARCOURS_POOL_PROFILES = int(os.getenv('PARCOURS_POOL_PROFILES', '6'))
+PARCOURS_POOL_DURATIONS = [
+    int(d) for d in os.getenv('PARCOURS_POOL_DURATIONS', '30,60,90').split(',') if d.strip()
+]
+PARCOURS_POOL_HISTORY_DAYS = int(os.getenv('PARCOURS_POOL_HISTORY_DAYS', '30'))
+# Narrations d'un profil inchangées depuis ce délai avant de reconstruire sa réserve
+PARCOURS_POOL_SETTLE_SECONDS = int(os.getenv('PARCOURS_POOL_SETTLE_SECONDS', '300'))
+
+# Plan et œuvres (les narrations sont suivies par profil, voir profile_version)
+_STRUCTURE_TABLES = ('plans', 'entities', 'points', 'relations', 'oeuvres')
+_structure_version = TablesVersion(
+    _STRUCTURE_TABLES, ttl=float(os.getenv('PARCOURS_VERSION_TTL_SECONDS', '5'))
+)
+
+# Entrées plus anciennes supprimées (profils sortis des cibles)
+_MAX_ENTRY_AGE_HOURS = 24
+
+# Remplissage périodique (en plus du réveil après chaque retrait)
+_REFILL_INTERVAL_SECONDS = 120
+
+# Clé du verrou consultatif (un seul remplisseur entre workers)
+_POOL_LOCK_KEY = 720042
+
+# Entrées dont l'audio a disparu avant de renoncer pour cette requête
+_MAX_POP_ATTEMPTS = 3
+
+# (critères, durée, seed, audio) → (corps JSON, statut HTTP)
+ParcoursBuilder = Callable[[Dict[str, int], int, int, bool], Tuple[Dict[str, Any], int]]
+
+
+def profile_key(criteria: Dict[str, int]) -> str:
+    """Forme canonique d'un profil {type: criteria_id}"""
+    return json.dumps({str(k): int(v) for k, v in criteria.items()}, sort_keys=True, separators=(',', ':'))
+
+
+def profile_version(cur, criteria: Dict[str, int]) -> Tuple[str, Optional[float]]:
+    """
+    (version, secondes depuis la dernière écriture de narration) d'un profil:
+    plan et œuvres + nombre et xmin max des prégénérations de CE profil
+    """
+    key = profile_key(criteria)
+    # @> dans les deux sens = égalité, servie par l'index GIN de criteria_combination
+    cur.execute("""
+        SELECT COUNT(*) AS narrations,
+               COALESCE(MAX(xmin::text::bigint), 0) AS last_xmin,
+               EXTRACT(EPOCH FROM (NOW() - MAX(updated_at))) AS idle_seconds
+        FROM pregenerations
+        WHERE criteria_combination @> %s::jsonb AND criteria_combination <@ %s::jsonb
+    """, (key, key))
+    row = cur.fetchone()
+    canonical = f"{_structure_version.current()}:{int(row['narrations'])}:{int(row['last_xmin'])}"
+    idle = float(row['idle_seconds']) if row['idle_seconds'] is not None else None
+    return hashlib.md5(canonical.encode('utf-8')).hexdigest(), idle
+
+
+class ParcoursWarmPool:
+    """Réserve partagée de parcours prêts (singleton via get_parcours_pool)"""
+
+    def __init__(self):
+        self.enabled = PARCOURS_POOL_ENABLED
+        self._lock = threading.Lock()
+        self._builder: Optional[ParcoursBuilder] = None
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._metrics = {'served': 0, 'empty': 0, 'built': 0, 'build_failures': 0, 'stale_dropped': 0, 'errors': 0}
+        if self.enabled:
+            self._ensure_tables_exist()
+
+    def _ensure_tables_exist(self):
+        """S'assure que les tables existent (migration safe)"""
+        try:
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS parcours_pool (
+                    pool_id SERIAL PRIMARY KEY,
+                    profile_key TEXT NOT NULL,
+                    duration_min INTEGER NOT NULL,
+                    museum_version CHAR(32) NOT NULL,
+                    parcours_id BIGINT,
+                    payload JSONB NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_parcours_pool_lookup
+                ON parcours_pool(profile_key, duration_min, museum_version)
+            """)
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS parcours_requests (
+                    request_id SERIAL PRIMARY KEY,
+                    profile_key TEXT NOT NULL,
+                    duration_min INTEGER NOT NULL,
+                    served_from VARCHAR(20),
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_parcours_requests_created ON parcours_requests(created_at)")
+            conn.commit()
+            cur.close()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Erreur création tables parcours_pool: {e}")
+            self.enabled = False
+
+    def _incr(self, metric: str, n: int = 1):
+        with self._lock:
+            self._metrics[metric] += n
+
+    # ===== CHEMIN DE REQUÊTE =====
+
+    def pop(self, criteria: Dict[str, int], duration_min: int) -> Optional[Dict[str, Any]]:
+        """Retire un parcours prêt pour ce profil (None si la réserve est vide)"""
+        if not self.enabled:
+            return None
+        key = profile_key(criteria)
+        try:
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            version, _ = profile_version(cur, criteria)
+            payload = None
+            for _ in range(_MAX_POP_ATTEMPTS):
+                cur.execute("""
+                    DELETE FROM parcours_pool
+                    WHERE pool_id = (
+                        SELECT pool_id FROM parcours_pool
+                        WHERE profile_key = %s AND duration_min = %s AND museum_version = %s
+                        ORDER BY created_at
+                        LIMIT 1
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING payload
+                """, (key, duration_min, version))
+                row = cur.fetchone()
+                conn.commit()
+                if row is None or audio_files_available(row['payload']):
+                    payload = row['payload'] if row else None
+                    break
+            cur.close()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Erreur retrait réserve parcours: {e}")
+            self._incr('errors')
+            return None
+
+        self._incr('served' if payload else 'empty')
+        # Le remplisseur complète la file (ce worker ou un autre au prochain tour)
+        self._wake.set()
+        return payload
+
+    def record_request(self, criteria: Dict[str, int], duration_min: int, served_from: str):
+        """Historise une demande (popularité des profils)"""
+        if not self.enabled:
+            return
+        try:
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO parcours_requests (profile_key, duration_min, served_from)
+                VALUES (%s, %s, %s)
+            """, (profile_key(criteria), duration_min, served_from))
+            conn.commit()
+            cur.close()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Erreur historisation demande parcours: {e}")
+            self._incr('errors')
+
+    # ===== REMPLISSAGE =====
+
+    def register_builder(self, builder: ParcoursBuilder):
+        """Enregistre la fonction de génération complète (parcours + audio)"""
+        self._builder = builder
+
+    def start(self):
+        """Démarre le thread de remplissage"""
+        if not self.enabled or self._builder is None:
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._refill_loop, name="parcours-warm-pool", daemon=True)
+            self._thread.start()
+        logger.info(f"Réserve parcours démarrée ({PARCOURS_POOL_SIZE} par profil, durées {PARCOURS_POOL_DURATIONS})")
+
+    def _refill_loop(self):
+        while True:
+            try:
+                self.refill()
+            except Exception as e:
+                logger.error(f"Erreur remplissage réserve parcours: {e}")
+                self._incr('errors')
+            self._wake.wait(_REFILL_INTERVAL_SECONDS)
+            self._wake.clear()
+
+    def target_profiles(self) -> List[Tuple[Dict[str, int], int]]:
+        """
+        (profil, durée) à maintenir: d'abord les plus demandés sur la période,
+        puis les combinaisons prégénérées couvrant le plus d'œuvres.
+        """
+        from .criteria_service import criteria_service
+
+        conn = _connect_postgres()
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                SELECT profile_key, duration_min, COUNT(*) AS requests
+                FROM parcours_requests
+                WHERE created_at > NOW() - (%s || ' days')::INTERVAL
+                GROUP BY profile_key, duration_min
+                ORDER BY requests DESC
+                LIMIT %s
+            """, (PARCOURS_POOL_HISTORY_DAYS, PARCOURS_POOL_PROFILES))
+            popular = [(json.loads(row['profile_key']), row['duration_min']) for row in cur.fetchall()]
+
+            cur.execute("""
+                SELECT criteria_combination, COUNT(DISTINCT oeuvre_id) AS artworks
+                FROM pregenerations
+                GROUP BY criteria_combination
+                ORDER BY artworks DESC
+                LIMIT %s
+            """, (PARCOURS_POOL_PROFILES,))
+            combinations = [row['criteria_combination'] for row in cur.fetchall()]
+        finally:
+            cur.close()
+            conn.close()
+
+        targets = []
+        seen = set()
+        candidates = popular + [(combo, d) for combo in combinations for d in PARCOURS_POOL_DURATIONS]
+        for criteria, duration in candidates:
+            if len(targets) >= PARCOURS_POOL_PROFILES:
+                break
+            criteria = {k: int(v) for k, v in criteria.items()}
+            target = (profile_key(criteria), duration)
+            if target in seen or not criteria_service.validate_all_criteria(criteria)[0]:
+                continue
+            seen.add(target)
+            targets.append((criteria, duration))
+        return targets
+
+    def refill(self) -> int:
+        """Complète chaque (profil, durée) cible jusqu'à K parcours. Retourne le nombre construit."""
+        if not self.enabled or self._builder is None:
+            return 0
+
+        lock_conn = _connect_postgres()
+        try:
+            lock_cur = lock_conn.cursor()
+            lock_cur.execute("SELECT pg_try_advisory_lock(%s) AS locked", (_POOL_LOCK_KEY,))
+            if not lock_cur.fetchone()['locked']:
+                return 0
+            try:
+                return self._refill_locked()
+            finally:
+                lock_cur.execute("SELECT pg_advisory_unlock(%s)", (_POOL_LOCK_KEY,))
+        finally:
+            lock_conn.close()
+
+    def _refill_locked(self) -> int:
+        built = 0
+        rng = random.SystemRandom()
+        for criteria, duration in self.target_profiles():
+            key = profile_key(criteria)
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            try:
+                version, idle = profile_version(cur, criteria)
+                if idle is not None and idle < PARCOURS_POOL_SETTLE_SECONDS:
+                    # Narrations de ce profil en cours d'écriture: ni purge ni synthèse
+                    logger.info(f"Réserve parcours: {key} en attente (narrations modifiées il y a {idle:.0f}s)")
+                    continue
+                cur.execute("""
+                    DELETE FROM parcours_pool
+                    WHERE profile_key = %s AND duration_min = %s AND museum_version <> %s
+                """, (key, duration, version))
+                if cur.rowcount:
+                    self._incr('stale_dropped', cur.rowcount)
+                    logger.info(f"Réserve parcours: {cur.rowcount} entrées obsolètes supprimées ({key} {duration}min)")
+                cur.execute("""
+                    SELECT COUNT(*) AS ready FROM parcours_pool
+                    WHERE profile_key = %s AND duration_min = %s
+                """, (key, duration))
+                ready = cur.fetchone()['ready']
+                conn.commit()
+            finally:
+                cur.close()
+                conn.close()
+
+            for _ in range(max(0, PARCOURS_POOL_SIZE - ready)):
+                seed = rng.randrange(2 ** 31)
+                started = time.time()
+                try:
+                    payload, status = self._builder(criteria, duration, seed, True)
+                except Exception as e:
+                    logger.error(f"Réserve parcours: échec {key} {duration}min: {e}")
+                    payload, status = None, 500
+                # Profil sans parcours complet possible: on passe au suivant
+                if status != 200 or payload['audio'].get('error') or not payload['audio'].get('generated'):
+                    self._incr('build_failures')
+                    break
+                self._store(criteria, duration, version, payload)
+                built += 1
+                logger.info(f"Réserve parcours: {key} {duration}min prêt ({time.time() - started:.1f}s)")
+
+        self._drop_expired()
+        if built:
+            self._incr('built', built)
+        return built
+
+    def _drop_expired(self):
+        """Supprime les entrées trop anciennes (profils qui ne sont plus ciblés)"""
+        conn = _connect_postgres()
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                DELETE FROM parcours_pool
+                WHERE created_at < NOW() - %s * INTERVAL '1 hour'
+            """, (_MAX_ENTRY_AGE_HOURS,))
+            if cur.rowcount:
+                self._incr('stale_dropped', cur.rowcount)
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+
+    def _store(self, criteria: Dict[str, int], duration_min: int, version: str, payload: Dict[str, Any]):
+        parcours_id = payload['parcours'].get('metadata', {}).get('unique_parcours_id')
+        body = json.dumps(payload, ensure_ascii=False, default=str)
+        conn = _connect_postgres()
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                INSERT INTO parcours_pool (profile_key, duration_min, museum_version, parcours_id, payload)
+                VALUES (%s, %s, %s, %s, %s::jsonb)
+            """, (profile_key(criteria), duration_min, version, parcours_id, body))
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Métriques du process + contenu de la réserve"""
+        with self._lock:
+            metrics = dict(self._metrics)
+        stats = {
+            'enabled': self.enabled,
+            'size_per_profile': PARCOURS_POOL_SIZE,
+            'profiles': PARCOURS_POOL_PROFILES,
+            'durations': PARCOURS_POOL_DURATIONS,
+            'settle_seconds': PARCOURS_POOL_SETTLE_SECONDS,
+            'process': metrics
+        }
+        if not self.enabled:
+            return stats
+        try:
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT profile_key, duration_min, COUNT(*) AS ready
+                FROM parcours_pool
+                GROUP BY profile_key, duration_min
+                ORDER BY profile_key, duration_min
+            """)
+            stats['ready'] = [
+                {'profile': json.loads(row['profile_key']), 'duration_min': row['duration_min'], 'ready': row['ready']}
+                for row in cur.fetchall()
+            ]
+            cur.close()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Erreur stats réserve parcours: {e}")
+        return stats
+
+
+# Singleton global
+_parcours_pool: Optional[ParcoursWarmPool] = None
+_parcours_pool_lock = threading.Lock()
+
+
+def get_parcours_pool() -> ParcoursWarmPool:
+    """Retourne la réserve de parcours singleton"""
+    global _parcours_pool
+    if _parcours_pool is None:
+        with _parcours_pool_lock:
+            if _parcours_pool is None:
+                _parcours_pool = ParcoursWarmPool()
+    return _parcours_pool
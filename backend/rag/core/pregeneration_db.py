@@ -62,7 +62,9 @@ def _normalize_criteria_dict(criteria_dict: Dict[str, Any]) -> Dict[str, int]:
 
 def add_pregeneration(oeuvre_id: int, criteria_dict: Dict[str, int],
                      pregeneration_text: str,
-                     voice_link: Optional[str] = None) -> int:
+                     voice_link: Optional[str] = None,
+                     artwork_hash: Optional[str] = None,
+                     criteria_hashes: Optional[Dict[str, str]] = None) -> int:
     """Ajoute une prégénération avec N critères DYNAMIQUES
     
     Args:
@@ -70,6 +72,8 @@ def add_pregeneration(oeuvre_id: int, criteria_dict: Dict[str, int],
         criteria_dict: Dict de criteria_ids par type, ex: {"age": 1, "thematique": 4, "style_texte": 7}
         pregeneration_text: Texte prégénéré
         voice_link: Lien audio optionnel
+        artwork_hash: Empreinte des champs de l'œuvre utilisés dans le prompt
+        criteria_hashes: Empreintes par type des champs de critères utilisés
         
     Returns:
         ID de la prégénération créée/mise à jour
@@ -87,16 +91,20 @@ def add_pregeneration(oeuvre_id: int, criteria_dict: Dict[str, int],
         # Insert or update (ON CONFLICT sur la combinaison unique)
         cur.execute("""
             INSERT INTO pregenerations (
-                oeuvre_id, criteria_combination, pregeneration_text, voice_link
+                oeuvre_id, criteria_combination, pregeneration_text, voice_link,
+                artwork_hash, criteria_hashes
             )
-            VALUES (%s, %s::jsonb, %s, %s)
+            VALUES (%s, %s::jsonb, %s, %s, %s, %s::jsonb)
             ON CONFLICT (oeuvre_id, criteria_combination)
             DO UPDATE SET
                 pregeneration_text = EXCLUDED.pregeneration_text,
                 voice_link = EXCLUDED.voice_link,
+                artwork_hash = EXCLUDED.artwork_hash,
+                criteria_hashes = EXCLUDED.criteria_hashes,
                 updated_at = CURRENT_TIMESTAMP
             RETURNING pregeneration_id
-        """, (oeuvre_id, criteria_json, pregeneration_text, voice_link))
+        """, (oeuvre_id, criteria_json, pregeneration_text, voice_link,
+              artwork_hash, json.dumps(criteria_hashes) if criteria_hashes is not None else None))
         
         pregeneration_id = cur.fetchone()['pregeneration_id']
         
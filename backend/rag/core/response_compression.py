@@ -0,0 +1,123 @@
+"""
+Compression des réponses API (gzip / brotli)
+- Routes volumineuses uniquement (parcours, plan du musée, critères, œuvres)
+- Seuil de taille: les petites réponses partent telles quelles
+- brotli si le client l'accepte et si le module est installé, sinon gzip
+- Jamais sur les flux (SSE) ni les fichiers servis en passthrough
+"""
+
+import gzip
+import os
+from typing import Optional
+
+from flask import request
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+API_COMPRESSION_ENABLED = os.getenv('API_COMPRESSION', '1') == '1'
+API_COMPRESSION_MIN_BYTES = int(os.getenv('API_COMPRESSION_MIN_BYTES', '1024'))
+# Niveaux adaptés au contenu dynamique (compromis taille / CPU par requête)
+API_GZIP_LEVEL = int(os.getenv('API_GZIP_LEVEL', '5'))
+API_BROTLI_QUALITY = int(os.getenv('API_BROTLI_QUALITY', '4'))
+
+# Préfixes de chemins compressés
+COMPRESSED_PATH_PREFIXES = (
+    '/api/parcours',
+    '/api/museum/floor-plan',
+    '/api/criterias/all',
+    '/api/artworks',
+)
+
+_COMPRESSIBLE_MIMETYPES = ('application/json', 'text/plain', 'text/html')
+
+
+def _accepted_encodings(header: str) -> dict:
+    """Accept-Encoding → {encodage: qualité}"""
+    accepted = {}
+    for part in header.split(','):
+        fields = part.strip().split(';')
+        name = fields[0].strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in fields[1:]:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Encodage retenu pour un en-tête Accept-Encoding ('br', 'gzip' ou None)"""
+    accepted = _accepted_encodings(accept_encoding or '')
+    wildcard = accepted.get('*', 0.0)
+    if BROTLI_AVAILABLE and accepted.get('br', wildcard) > 0:
+        return 'br'
+    if accepted.get('gzip', wildcard) > 0:
+        return 'gzip'
+    return None
+
+
+def compress_body(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=API_BROTLI_QUALITY, mode=brotli.MODE_TEXT)
+    return gzip.compress(data, compresslevel=API_GZIP_LEVEL, mtime=0)
+
+
+def _should_compress(response) -> bool:
+    if not request.path.startswith(COMPRESSED_PATH_PREFIXES):
+        return False
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    return response.mimetype in _COMPRESSIBLE_MIMETYPES
+
+
+def compress_response(response):
+    """after_request: compresse la réponse si route, taille et client s'y prêtent"""
+    if not _should_compress(response):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < API_COMPRESSION_MIN_BYTES:
+        return response
+
+    encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+    if encoding is None:
+        return response
+
+    compressed = compress_body(data, encoding)
+    if len(compressed) >= len(data):
+        return response
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    response.headers['Content-Length'] = str(len(compressed))
+    # Un ETag fort désigne des octets précis: il devient faible une fois compressé
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_response_compression(app):
+    """Enregistre la compression sur l'application"""
+    if not API_COMPRESSION_ENABLED:
+        print("ℹ️ Compression API désactivée (API_COMPRESSION=0)")
+        return
+    app.after_request(compress_response)
+    encodings = 'brotli + gzip' if BROTLI_AVAILABLE else 'gzip'
+    print(f"🗜️ Compression API: {encodings} (seuil {API_COMPRESSION_MIN_BYTES} octets)")
@@ -0,0 +1,188 @@
+"""
+Service des fichiers /uploads (audio, images, PDFs)
+- Requêtes Range (une plage: lecture/avance dans l'audio), If-Range, 416
+- Zéro copie: fichier positionné sur la plage puis confié à wsgi.file_wrapper
+  (sendfile() côté Gunicorn), lecture bornée en repli
+- Délégation optionnelle au serveur frontal: X-Accel-Redirect (nginx)
+  ou X-Sendfile (Apache/lighttpd), le worker Python n'envoie plus d'octets
+- ETag calculé depuis stat() (format nginx: mtime-taille en hexa), sans lire
+  le fichier: mêmes validateurs quel que soit le serveur qui a répondu
+- Cache immuable pour les noms uniques (UUID, horodatage, empreinte),
+  revalidation courte pour les fichiers réécrits en place (audio de parcours)
+"""
+
+import mimetypes
+import os
+import re
+import stat
+from typing import Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from flask import current_app, jsonify, request
+from werkzeug.http import http_date, parse_date
+from werkzeug.security import safe_join
+
+UPLOADS_DIR = os.getenv('UPLOADS_DIR', '/app/uploads')
+# '' (Flask + sendfile), 'x-accel' (nginx) ou 'x-sendfile' (Apache/lighttpd)
+UPLOADS_OFFLOAD = os.getenv('UPLOADS_OFFLOAD', '').lower()
+# Location nginx interne qui pointe sur le même volume (voir client-frontend/nginx.conf)
+UPLOADS_ACCEL_PREFIX = os.getenv('UPLOADS_ACCEL_PREFIX', '/_uploads_internal/')
+UPLOADS_MAX_AGE = int(os.getenv('UPLOADS_MAX_AGE', '300'))
+UPLOADS_IMMUTABLE_MAX_AGE = int(os.getenv('UPLOADS_IMMUTABLE_MAX_AGE', '31536000'))
+
+_CHUNK_SIZE = 64 * 1024
+
+# Noms jamais réécrits: UUID (thèmes), horodatage ms (œuvres, critères, musée), empreinte hexa
+_IMMUTABLE_NAME = re.compile(
+    r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
+    r'|(?<![0-9a-f])[0-9a-f]{32,64}(?![0-9a-f])'
+    r'|(?<!\d)\d{13}(?!\d)',
+    re.IGNORECASE
+)
+
+# Mêmes types que la location /uploads/ de nginx
+_MIMETYPES = {
+    '.wav': 'audio/wav',
+    '.mp3': 'audio/mpeg',
+    '.pdf': 'application/pdf',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.webp': 'image/webp',
+    '.gif': 'image/gif',
+}
+
+
+def _mimetype(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    return _MIMETYPES.get(ext) or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+def file_etag(st: os.stat_result) -> str:
+    """ETag d'un fichier depuis son stat (identique à celui de nginx)"""
+    return f"{int(st.st_mtime):x}-{st.st_size:x}"
+
+
+def is_immutable(filepath: str) -> bool:
+    return bool(_IMMUTABLE_NAME.search(os.path.basename(filepath)))
+
+
+def cache_control(filepath: str) -> str:
+    if is_immutable(filepath):
+        return f"public, max-age={UPLOADS_IMMUTABLE_MAX_AGE}, immutable"
+    return f"public, max-age={UPLOADS_MAX_AGE}, must-revalidate"
+
+
+def _not_modified(etag: str, mtime: int) -> bool:
+    """If-None-Match prioritaire, sinon If-Modified-Since"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since:
+        return int(request.if_modified_since.timestamp()) >= mtime
+    return False
+
+
+def _range_applies(etag: str, mtime: int) -> bool:
+    """If-Range: la plage ne vaut que si le fichier n'a pas changé"""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == f'"{etag}"'
+    date = parse_date(if_range)
+    return date is not None and int(date.timestamp()) == mtime
+
+
+def _byte_range(size: int, etag: str, mtime: int) -> Tuple[Optional[Tuple[int, int]], bool]:
+    """(début, fin exclue) demandés, et False si la plage est insatisfiable"""
+    requested = request.range
+    if requested is None or requested.units != 'bytes' or len(requested.ranges) != 1:
+        # Plages multiples: réponse complète (autorisé par la RFC 9110)
+        return None, True
+    if not _range_applies(etag, mtime):
+        return None, True
+    bounds = requested.range_for_length(size)
+    if bounds is None:
+        return None, False
+    return bounds, True
+
+
+def _read_range(f, length: int) -> Iterator[bytes]:
+    """Lecture bornée (serveurs sans wsgi.file_wrapper)"""
+    try:
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def _headers(filepath: str, st: os.stat_result, etag: str) -> dict:
+    return {
+        'ETag': f'"{etag}"',
+        'Last-Modified': http_date(st.st_mtime),
+        'Cache-Control': cache_control(filepath),
+        'Accept-Ranges': 'bytes',
+    }
+
+
+def serve_upload(filepath: str):
+    """Réponse pour /uploads/<filepath>"""
+    path = safe_join(UPLOADS_DIR, filepath)
+    if path is None:
+        return jsonify({'error': 'File not found'}), 404
+    try:
+        st = os.stat(path)
+    except OSError:
+        return jsonify({'error': 'File not found'}), 404
+    if not stat.S_ISREG(st.st_mode):
+        return jsonify({'error': 'File not found'}), 404
+
+    etag = file_etag(st)
+    mtime = int(st.st_mtime)
+    headers = _headers(filepath, st, etag)
+    response_class = current_app.response_class
+
+    if _not_modified(etag, mtime):
+        return response_class(status=304, headers=headers)
+
+    mimetype = _mimetype(path)
+    if UPLOADS_OFFLOAD == 'x-accel':
+        # nginx relit le fichier (Range, sendfile); Cache-Control et Content-Type conservés
+        headers['X-Accel-Redirect'] = UPLOADS_ACCEL_PREFIX.rstrip('/') + '/' + quote(filepath.lstrip('/'))
+        return response_class(mimetype=mimetype, headers=headers)
+    if UPLOADS_OFFLOAD == 'x-sendfile':
+        headers['X-Sendfile'] = path
+        return response_class(mimetype=mimetype, headers=headers)
+
+    size = st.st_size
+    bounds, satisfiable = _byte_range(size, etag, mtime)
+    if not satisfiable:
+        headers['Content-Range'] = f"bytes */{size}"
+        return response_class(status=416, headers=headers)
+
+    start, stop = bounds or (0, size)
+    length = stop - start
+    f = open(path, 'rb')
+    if start:
+        f.seek(start)
+
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    # Gunicorn envoie par sendfile() depuis la position courante, borné par Content-Length;
+    # les autres serveurs lisent jusqu'à la fin du fichier
+    bounded = request.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn')
+    if file_wrapper is not None and (stop == size or bounded):
+        body = file_wrapper(f, _CHUNK_SIZE)
+    else:
+        body = _read_range(f, length)
+
+    response = response_class(body, status=206 if bounds else 200, mimetype=mimetype,
+                              headers=headers, direct_passthrough=True)
+    response.content_length = length
+    if bounds:
+        response.headers['Content-Range'] = f"bytes {start}-{stop - 1}/{size}"
+    return response
@@ -0,0 +1,179 @@
+"""
+Réponses GET précalculées et versionnées (plan du musée, critères)
+- Version = empreinte des tables sources (nombre de lignes + xmin max):
+  toute écriture dans l'une d'elles change la version
+- ETag fort dérivé de la version: If-None-Match → 304 sans reconstruire
+  ni resérialiser la réponse, identique sur tous les workers
+- Corps JSON sérialisé une fois par version, variantes gzip/brotli
+  compressées à la première demande
+- Vérification de version limitée à une requête SQL toutes les
+  STATIC_API_VERSION_TTL secondes par worker
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from flask import current_app, jsonify, request
+
+from .db_postgres import _connect_postgres
+from .response_compression import (
+    API_COMPRESSION_ENABLED, API_COMPRESSION_MIN_BYTES, choose_encoding, compress_body
+)
+
+logger = logging.getLogger(__name__)
+
+STATIC_API_VERSION_TTL = float(os.getenv('STATIC_API_VERSION_TTL', '2'))
+STATIC_API_MAX_AGE = int(os.getenv('STATIC_API_MAX_AGE', '60'))
+STATIC_API_STALE_WHILE_REVALIDATE = int(os.getenv('STATIC_API_STALE_WHILE_REVALIDATE', '300'))
+
+# Variantes (paramètres de requête) gardées par endpoint
+_MAX_VARIANTS = 32
+
+_ENCODED_SUFFIXES = ('', '-gzip', '-br')
+
+
+def tables_version(tables: Sequence[str]) -> str:
+    """Empreinte de tables (nombre de lignes et xmin max de chacune)"""
+    selects = ',\n'.join(
+        f"(SELECT COUNT(*) FROM {t}) AS {t}_count, "
+        f"(SELECT COALESCE(MAX(xmin::text::bigint), 0) FROM {t}) AS {t}_xmin"
+        for t in tables
+    )
+    conn = _connect_postgres()
+    try:
+        cur = conn.cursor()
+        cur.execute(f"SELECT {selects}")
+        row = cur.fetchone()
+        cur.close()
+    finally:
+        conn.close()
+    canonical = json.dumps({k: int(v) for k, v in row.items()}, sort_keys=True)
+    return hashlib.md5(canonical.encode('utf-8')).hexdigest()
+
+
+class TablesVersion:
+    """Version de tables relue au plus toutes les ttl secondes (par worker)"""
+
+    def __init__(self, tables: Sequence[str], ttl: float = STATIC_API_VERSION_TTL):
+        self.tables = tuple(tables)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._checked_at = 0.0
+
+    def current(self) -> str:
+        with self._lock:
+            if self._version and time.time() - self._checked_at < self.ttl:
+                return self._version
+        version = tables_version(self.tables)
+        with self._lock:
+            self._version = version
+            self._checked_at = time.time()
+        return version
+
+    @property
+    def last_known(self) -> Optional[str]:
+        return self._version
+
+    def invalidate(self):
+        """Force la relecture à la prochaine demande"""
+        with self._lock:
+            self._checked_at = 0.0
+
+
+class VersionedResponse:
+    """Réponse JSON d'un endpoint GET, reconstruite seulement quand ses tables changent"""
+
+    def __init__(self, name: str, tables: Sequence[str], max_age: int = STATIC_API_MAX_AGE):
+        self.name = name
+        self.tables = tuple(tables)
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._version = TablesVersion(self.tables)
+        # variante → {'version', 'etag', 'bodies': {encodage: octets}}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self.stats = {'not_modified': 0, 'hits': 0, 'builds': 0}
+
+    def current_version(self) -> str:
+        return self._version.current()
+
+    def invalidate(self):
+        """Force la relecture de la version à la prochaine requête"""
+        self._version.invalidate()
+
+    def _etag(self, version: str, variant: str) -> str:
+        return hashlib.sha256(f"{self.name}:{variant}:{version}".encode('utf-8')).hexdigest()[:32]
+
+    def _cache_control(self) -> str:
+        return f"public, max-age={self.max_age}, stale-while-revalidate={STATIC_API_STALE_WHILE_REVALIDATE}"
+
+    def _entry(self, variant: str, version: str, etag: str, build: Callable[[], Any]) -> Dict[str, Any]:
+        with self._lock:
+            entry = self._entries.get(variant)
+        if entry is not None and entry['version'] == version:
+            self.stats['hits'] += 1
+            return entry
+
+        payload = build()
+        json_provider = current_app.json
+        if hasattr(json_provider, 'dumps_bytes'):
+            body = json_provider.dumps_bytes(payload)
+        else:
+            body = json_provider.dumps(payload, separators=(',', ':')).encode('utf-8')
+        entry = {'version': version, 'etag': etag, 'bodies': {'identity': body}}
+        with self._lock:
+            if variant not in self._entries and len(self._entries) >= _MAX_VARIANTS:
+                self._entries.clear()
+            self._entries[variant] = entry
+        self.stats['builds'] += 1
+        return entry
+
+    def respond(self, build: Callable[[], Any], variant: str = ''):
+        """Réponse 200 (précalculée) ou 304 selon If-None-Match"""
+        try:
+            version = self.current_version()
+        except Exception as e:
+            # Version illisible: réponse classique, sans cache
+            logger.error(f"Version {self.name} indisponible: {e}")
+            return jsonify(build())
+
+        etag = self._etag(version, variant)
+        if any(request.if_none_match.contains(etag + suffix) for suffix in _ENCODED_SUFFIXES):
+            self.stats['not_modified'] += 1
+            response = current_app.response_class(status=304)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = self._cache_control()
+            response.vary.add('Accept-Encoding')
+            return response
+
+        entry = self._entry(variant, version, etag, build)
+        body = entry['bodies']['identity']
+        encoding = None
+        if API_COMPRESSION_ENABLED and len(body) >= API_COMPRESSION_MIN_BYTES:
+            encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding:
+            encoded = entry['bodies'].get(encoding)
+            if encoded is None:
+                encoded = compress_body(body, encoding)
+                entry['bodies'][encoding] = encoded
+            body = encoded
+
+        response = current_app.response_class(body, mimetype='application/json')
+        # ETag fort par représentation (le corps compressé a ses propres octets)
+        response.set_etag(etag + (f'-{encoding}' if encoding else ''))
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Cache-Control'] = self._cache_control()
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            variants = len(self._entries)
+        return {'name': self.name, 'tables': list(self.tables), 'version': self._version.last_known,
+                'variants': variants, **self.stats}
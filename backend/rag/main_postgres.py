@@ -2,11 +2,12 @@
 Museum Voice Backend API - Flask + PostgreSQL + Ollama + Piper TTS
 """
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import sys
 import os
 import logging
+import threading
 from pathlib import Path
 from typing import Dict, List
 import psycopg2
@@ -16,7 +17,7 @@ import requests
 # Configuration du logger
 logger = logging.getLogger(__name__)
 
-from .core.ollama_generation import OllamaMediationSystem
+from .core.ollama_generation import OllamaMediationSystem, artwork_content_hash, criteria_content_hashes
 from .core.generation_queue import get_endpoint_rate_limiter
 
 from .core.db_postgres import (
@@ -34,10 +35,18 @@ from .core.pregeneration_db import (
 
 from .model_pdf_processor import ModelCompliantPDFProcessor
 from .tts.routes import tts_bp
+from .core.json_provider import init_json_provider
+from .core.response_compression import init_response_compression
+from .core.versioned_responses import VersionedResponse
+from .core.upload_files import serve_upload
 
 app = Flask(__name__)
 CORS(app)
 
+# JSON orjson + compression gzip/brotli des grosses réponses API
+init_json_provider(app)
+init_response_compression(app)
+
 app.register_blueprint(tts_bp)
 
 # Rate limiter pour endpoints de génération
@@ -118,10 +127,7 @@ def generation_stats():
 
 @app.route('/uploads/<path:filepath>')
 def serve_uploads(filepath):
-    try:
-        return send_from_directory('/app/uploads', filepath)
-    except FileNotFoundError:
-        return jsonify({'error': 'File not found'}), 404
+    return serve_upload(filepath)
 
 
 # ===== API CRITÈRES =====
@@ -185,28 +191,39 @@ def get_criterias_by_type(type_name):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+# Réponses précalculées, invalidées par les écritures dans leurs tables (ETag + 304)
+_criterias_all_response = VersionedResponse('criterias_all', ('criteria_types', 'criterias'))
+_floor_plan_response = VersionedResponse('floor_plan', ('plans', 'entities', 'points', 'museum_entrances'))
+
+
 @app.route('/api/criterias/all', methods=['GET'])
 def get_all_criterias():
     try:
         from .core.criteria_service import criteria_service
-        criteria_types = criteria_service.get_criteria_types()
-        result = []
-        for ctype in criteria_types:
-            criterias = criteria_service.get_criteria_by_type(ctype['type'])
-            result.append({
-                'type_id': ctype['type_id'],
-                'type': ctype['type'],
-                'label': ctype['label'],
-                'description': ctype['description'],
-                'ordre': ctype['ordre'],
-                'options': criterias
-            })
-        return jsonify({
-            'success': True,
-            'criteria_groups': result,
-            'total_types': len(result),
-            'total_criterias': sum(len(g['options']) for g in result)
-        })
+
+        def build():
+            # Reconstruction = nouvelle version: ignorer le cache TTL du service
+            criteria_service.clear_cache()
+            criteria_types = criteria_service.get_criteria_types()
+            result = []
+            for ctype in criteria_types:
+                criterias = criteria_service.get_criteria_by_type(ctype['type'])
+                result.append({
+                    'type_id': ctype['type_id'],
+                    'type': ctype['type'],
+                    'label': ctype['label'],
+                    'description': ctype['description'],
+                    'ordre': ctype['ordre'],
+                    'options': criterias
+                })
+            return {
+                'success': True,
+                'criteria_groups': result,
+                'total_types': len(result),
+                'total_criterias': sum(len(g['options']) for g in result)
+            }
+
+        return _criterias_all_response.respond(build)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -216,6 +233,7 @@ def clear_criteria_cache():
     try:
         from .core.criteria_service import criteria_service
         criteria_service.clear_cache()
+        _criterias_all_response.invalidate()
         return jsonify({'success': True, 'message': 'Cache invalidé'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -331,11 +349,22 @@ def create_pregeneration():
         if not criteria_service.validate_criteria_combination(criteria_dict):
             return jsonify({'success': False, 'error': 'Combinaison de critères invalide'}), 400
         
+        artwork = get_artwork(data['oeuvre_id'])
+        if not artwork:
+            return jsonify({'success': False, 'error': f"Œuvre {data['oeuvre_id']} non trouvée"}), 404
+        try:
+            combinaison = _enrich_criteria_combination(criteria_dict, get_criteres())
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        # Texte écrit pour les contenus actuels: mêmes empreintes que la génération (stale_only)
         pregeneration_id = add_pregeneration(
             oeuvre_id=data['oeuvre_id'],
             criteria_dict=criteria_dict,
             pregeneration_text=data['pregeneration_text'],
-            voice_link=data.get('voice_link')
+            voice_link=data.get('voice_link'),
+            artwork_hash=artwork_content_hash(artwork),
+            criteria_hashes=criteria_content_hashes(combinaison)
         )
         return jsonify({'success': True, 'pregeneration_id': pregeneration_id}), 201
     except Exception as e:
@@ -403,8 +432,9 @@ def extract_pdf_metadata():
 # ===== API PRÉGÉNÉRATION OLLAMA =====
 
 # Import du gestionnaire de jobs
-from .core.generation_jobs import get_job_manager, JobStatus, get_combination_hash
+from .core.generation_jobs import get_job_manager, JobStatus, JobCheckpoint, get_combination_hash
 import time as time_module
+from collections import Counter
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 @app.route('/api/pregenerate-artwork/<int:oeuvre_id>', methods=['POST'])
@@ -590,12 +620,237 @@ def cancel_all_generation_jobs():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def _enrich_criteria_combination(criteria_combination: Dict, all_criteres: Dict[str, List]) -> Dict:
+    """
+    Convertit {type: criteria_id} en {type: critère complet} (name/description/ai_indication).
+    Lève ValueError si un critère n'existe pas.
+    """
+    combinaison_enrichie = {}
+    for crit_type, crit_id in criteria_combination.items():
+        critere = next((c for c in all_criteres.get(crit_type, []) if c['criteria_id'] == crit_id), None)
+        if not critere:
+            raise ValueError(f'Critère invalide: {crit_type}={crit_id}')
+        combinaison_enrichie[crit_type] = critere
+    return combinaison_enrichie
+
+
+def _build_generation_tasks(job) -> List[Dict]:
+    """
+    Construit la liste des items (œuvre × combinaison) d'un job selon son type.
+    Les œuvres ne sont pas chargées ici: seules celles qui restent à traiter
+    après filtrage par le checkpoint le seront.
+    """
+    params = job.params or {}
+    all_criteres = get_criteres()
+    
+    if job.job_type in ('artwork', 'single'):
+        oeuvres = [{'oeuvre_id': params['oeuvre_id'], 'title': params.get('title')}]
+    else:
+        conn = _connect_postgres()
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute("SELECT oeuvre_id, title FROM oeuvres ORDER BY oeuvre_id")
+        oeuvres = cur.fetchall()
+        cur.close()
+        conn.close()
+    
+    if job.job_type in ('profile', 'single'):
+        # Combinaison ENRICHIE (avec name/description) à partir des IDs stockés
+        combinaisons = [_enrich_criteria_combination(params['criteria_combination'], all_criteres)]
+    else:
+        combinaisons = OllamaMediationSystem.generate_combinaisons(all_criteres)
+    
+    # Hash sur les IDs seulement: stable d'un redémarrage à l'autre
+    keyed_combos = [
+        (get_combination_hash(OllamaMediationSystem._criteria_ids_from_combinaison(combo)), combo)
+        for combo in combinaisons
+    ]
+    
+    tasks = []
+    for oeuvre_row in oeuvres:
+        oeuvre_id = oeuvre_row['oeuvre_id']
+        title = oeuvre_row.get('title') or f'Œuvre {oeuvre_id}'
+        for combo_hash, combo in keyed_combos:
+            tasks.append({
+                'oeuvre_id': oeuvre_id,
+                'title': title,
+                'combination': combo,
+                'combo_hash': combo_hash
+            })
+    return tasks
+
+
+def _run_generation_job(job):
+    """
+    Exécution commune des jobs async (all / artwork / profile / single), parallélisée.
+    Un job déjà 'running' est un job repris après expiration de son bail:
+    on saute la file d'attente et on repart du checkpoint.
+    L'annulation est coopérative: tâches en attente abandonnées en bloc,
+    requêtes Ollama en cours interrompues.
+    """
+    import threading
+    
+    job_manager = get_job_manager()
+    cancel_token = job_manager.get_cancel_token(job.job_id)
+    force_regenerate = (job.params or {}).get('force_regenerate', False)
+    # Opt-in admin: réutiliser une sortie déjà produite pour un prompt identique
+    reuse_cached = (job.params or {}).get('reuse_cached', False)
+    # Mode "stale only": régénère uniquement si l'œuvre ou les critères ont changé
+    stale_only = (job.params or {}).get('stale_only', False)
+    resumed = job.status == JobStatus.RUNNING
+    
+    try:
+        # ===== ATTENDRE SON TOUR DANS LA QUEUE =====
+        # Le job reste "pending" tant qu'un autre job est "running"
+        if not resumed and not job_manager.wait_for_turn(job.job_id):
+            # Job annulé ou timeout pendant l'attente
+            job_manager.complete_job(job.job_id, success=False, error_message="Job annulé ou timeout pendant l'attente")
+            return
+        
+        tasks = _build_generation_tasks(job)
+        if not tasks:
+            job_manager.complete_job(job.job_id, success=False, error_message="Aucune œuvre trouvée")
+            return
+        
+        # ===== FILTRAGE PAR CHECKPOINT (reprise) =====
+        expected = Counter(task['oeuvre_id'] for task in tasks)
+        checkpoint = JobCheckpoint(job.checkpoint if resumed else None, expected)
+        remaining = [t for t in tasks if not checkpoint.is_done(t['oeuvre_id'], t['combo_hash'])]
+        total_tasks = len(tasks)
+        
+        # ===== MAINTENANT on peut démarrer (timer conservé si reprise) =====
+        job_manager.start_job(job.job_id, total_tasks)
+        
+        # Compteurs thread-safe (restaurés depuis la ligne du job si reprise)
+        stats_lock = threading.Lock()
+        stats = {
+            'completed': total_tasks - len(remaining),
+            'generated': job.generated if resumed else 0,
+            'skipped': job.skipped if resumed else 0,
+            'errors': job.errors if resumed else 0
+        }
+        if resumed:
+            logger.info(f"♻️ Job {job.job_id} repris: {stats['completed']}/{total_tasks} déjà traités")
+        
+        # Charger uniquement les œuvres qui ont encore du travail
+        artworks = {oeuvre_id: get_artwork(oeuvre_id)
+                    for oeuvre_id in dict.fromkeys(t['oeuvre_id'] for t in remaining)}
+        system = OllamaMediationSystem()
+        
+        def process_single_task(task):
+            """Traite une seule combinaison"""
+            if cancel_token.is_cancelled():
+                return 'cancelled'
+            start_time = time_module.time()
+            result_type = 'error'
+            
+            try:
+                artwork = artworks.get(task['oeuvre_id'])
+                if artwork:
+                    result = system.pregenerate_single_combination(
+                        oeuvre_id=task['oeuvre_id'],
+                        artwork=artwork,
+                        combination=task['combination'],
+                        model="ministral-3:3b",
+                        force_regenerate=force_regenerate,
+                        cancel_token=cancel_token,
+                        reuse_cached=reuse_cached,
+                        stale_only=stale_only
+                    )
+                    
+                    if result.get('cancelled'):
+                        return 'cancelled'
+                    if result.get('generated'):
+                        result_type = 'generate'
+                    elif result.get('skipped'):
+                        result_type = 'skip'
+            except Exception as e:
+                logger.error(f"Erreur génération œuvre {task['oeuvre_id']}: {e}")
+            
+            duration_ms = int((time_module.time() - start_time) * 1000)
+            
+            # Enregistrer le timing - ESSENTIEL pour l'estimation du temps
+            try:
+                job_manager.record_timing(
+                    job.job_id, result_type, duration_ms,
+                    task['oeuvre_id'], task['combo_hash']
+                )
+                logger.debug(f"Timing enregistré: {result_type} - {duration_ms}ms")
+            except Exception as timing_error:
+                logger.error(f"Erreur enregistrement timing: {timing_error}")
+            
+            return result_type
+        
+        # Utiliser ThreadPoolExecutor pour paralléliser
+        pool = job_manager.get_thread_pool()
+        futures = {pool.submit(process_single_task, task): task for task in remaining}
+        # À l'annulation: abandon en bloc des tâches pas encore démarrées
+        cancel_token.add_callback(lambda: [f.cancel() for f in futures])
+        
+        for future in as_completed(futures):
+            if cancel_token.is_cancelled():
+                break
+            task = futures[future]
+            try:
+                result_type = future.result()
+            except Exception:
+                result_type = 'error'
+            if result_type == 'cancelled':
+                continue
+            
+            with stats_lock:
+                stats['completed'] += 1
+                if result_type == 'generate':
+                    stats['generated'] += 1
+                elif result_type == 'skip':
+                    stats['skipped'] += 1
+                else:
+                    stats['errors'] += 1
+                checkpoint.mark_done(task['oeuvre_id'], task['combo_hash'])
+                
+                # Progression + checkpoint dans le même UPDATE
+                job_manager.update_job_progress(
+                    job.job_id,
+                    completed_items=stats['completed'],
+                    current_item=f"{task['title']} ({stats['completed']}/{total_tasks})",
+                    generated=stats['generated'],
+                    skipped=stats['skipped'],
+                    errors=stats['errors'],
+                    checkpoint=checkpoint.to_dict()
+                )
+        
+        if cancel_token.is_cancelled():
+            logger.info(f"🛑 Job {job.job_id} annulé à {stats['completed']}/{total_tasks}")
+            return
+        job_manager.complete_job(job.job_id, success=True)
+        
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        job_manager.complete_job(job.job_id, success=False, error_message=str(e))
+
+
+def _generation_flags(data: Dict, default_force: bool = False):
+    """
+    (force_regenerate, reuse_cached, stale_only, erreur) d'une requête de génération.
+    stale_only et force_regenerate sont exclusifs: forcer régénère tout,
+    stale_only ne régénère que ce qui a changé.
+    """
+    stale_only = bool(data.get('stale_only', False))
+    # Sans valeur explicite, stale_only désactive le forçage par défaut de la route
+    force_regenerate = bool(data.get('force_regenerate', default_force and not stale_only))
+    if force_regenerate and stale_only:
+        return None, None, None, 'force_regenerate et stale_only sont incompatibles'
+    return force_regenerate, bool(data.get('reuse_cached', False)), stale_only, None
+
+
 @app.route('/api/generation/async/all', methods=['POST'])
 def start_async_pregenerate_all():
     """Lance la prégénération de toutes les œuvres en arrière-plan avec parallélisation"""
     try:
         data = request.get_json() or {}
-        force_regenerate = data.get('force_regenerate', False)
+        force_regenerate, reuse_cached, stale_only, flags_error = _generation_flags(data)
+        if flags_error:
+            return jsonify({'success': False, 'error': flags_error}), 400
         
         job_manager = get_job_manager()
         
@@ -607,136 +862,13 @@ def start_async_pregenerate_all():
                 'error': 'Une génération globale est déjà en cours'
             }), 409
         
-        # Créer le job
-        job = job_manager.create_job('all', {'force_regenerate': force_regenerate})
-        
-        # Définir la tâche de génération avec parallélisation
-        def run_generation(job):
-            import threading
-            
-            try:
-                # ===== ATTENDRE SON TOUR DANS LA QUEUE =====
-                # Le job reste "pending" tant qu'un autre job est "running"
-                if not job_manager.wait_for_turn(job.job_id):
-                    # Job annulé ou timeout pendant l'attente
-                    job_manager.complete_job(job.job_id, success=False, error_message="Job annulé ou timeout pendant l'attente")
-                    return
-                
-                conn = _connect_postgres()
-                cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-                cur.execute("SELECT oeuvre_id, title FROM oeuvres ORDER BY oeuvre_id")
-                oeuvres = cur.fetchall()
-                cur.close()
-                conn.close()
-                
-                if not oeuvres:
-                    job_manager.complete_job(job.job_id, success=False, error_message="Aucune œuvre trouvée")
-                    return
-                
-                system = OllamaMediationSystem()
-                all_criteres = get_criteres()
-                combinaisons = system.generate_combinaisons(all_criteres)
-                
-                # Créer la liste de toutes les tâches à effectuer
-                tasks = []
-                for oeuvre_row in oeuvres:
-                    oeuvre_id = oeuvre_row['oeuvre_id']
-                    title = oeuvre_row.get('title', f'Œuvre {oeuvre_id}')
-                    artwork = get_artwork(oeuvre_id)
-                    if artwork:
-                        for combo in combinaisons:
-                            tasks.append({
-                                'oeuvre_id': oeuvre_id,
-                                'title': title,
-                                'artwork': artwork,
-                                'combination': combo
-                            })
-                
-                total_tasks = len(tasks)
-                # ===== MAINTENANT on peut démarrer (timer commence ici) =====
-                job_manager.start_job(job.job_id, total_tasks)
-                
-                # Compteurs thread-safe
-                stats_lock = threading.Lock()
-                stats = {'completed': 0, 'generated': 0, 'skipped': 0, 'errors': 0}
-                
-                def process_single_task(task):
-                    """Traite une seule combinaison"""
-                    start_time = time_module.time()
-                    result_type = 'error'
-                    
-                    try:
-                        result = system.pregenerate_single_combination(
-                            oeuvre_id=task['oeuvre_id'],
-                            artwork=task['artwork'],
-                            combination=task['combination'],
-                            model="ministral-3:3b",
-                            force_regenerate=force_regenerate
-                        )
-                        
-                        if result.get('generated'):
-                            result_type = 'generate'
-                        elif result.get('skipped'):
-                            result_type = 'skip'
-                    except Exception as e:
-                        logger.error(f"Erreur génération: {e}")
-                    
-                    duration_ms = int((time_module.time() - start_time) * 1000)
-                    
-                    # Enregistrer le timing
-                    try:
-                        combo_hash = get_combination_hash(task['combination'])
-                        job_manager.record_timing(
-                            job.job_id, result_type, duration_ms,
-                            task['oeuvre_id'], combo_hash
-                        )
-                        logger.debug(f"Timing enregistré: {result_type} - {duration_ms}ms")
-                    except Exception as timing_error:
-                        logger.error(f"Erreur enregistrement timing: {timing_error}")
-                    
-                    return result_type, task['title']
-                
-                # Utiliser ThreadPoolExecutor pour paralléliser
-                pool = job_manager.get_thread_pool()
-                futures = {pool.submit(process_single_task, task): task for task in tasks}
-                
-                for future in as_completed(futures):
-                    task = futures[future]
-                    try:
-                        result_type, title = future.result()
-                        
-                        with stats_lock:
-                            stats['completed'] += 1
-                            if result_type == 'generate':
-                                stats['generated'] += 1
-                            elif result_type == 'skip':
-                                stats['skipped'] += 1
-                            else:
-                                stats['errors'] += 1
-                            
-                            # Mettre à jour la progression
-                            job_manager.update_job_progress(
-                                job.job_id,
-                                completed_items=stats['completed'],
-                                current_item=f"{title} ({stats['completed']}/{total_tasks})",
-                                generated=stats['generated'],
-                                skipped=stats['skipped'],
-                                errors=stats['errors']
-                            )
-                    except Exception:
-                        with stats_lock:
-                            stats['completed'] += 1
-                            stats['errors'] += 1
-                
-                job_manager.complete_job(job.job_id, success=True)
-                
-            except Exception as e:
-                import traceback
-                traceback.print_exc()
-                job_manager.complete_job(job.job_id, success=False, error_message=str(e))
-        
-        # Lancer en arrière-plan
-        job_manager.run_async(job, run_generation)
+        # Créer le job et le lancer en arrière-plan
+        job = job_manager.create_job('all', {
+            'force_regenerate': force_regenerate,
+            'reuse_cached': reuse_cached,
+            'stale_only': stale_only
+        })
+        job_manager.run_async(job, _run_generation_job)
         
         return jsonify({
             'success': True,
@@ -755,7 +887,9 @@ def start_async_pregenerate_artwork(oeuvre_id):
     """Lance la prégénération d'une œuvre en arrière-plan avec métriques de temps"""
     try:
         data = request.get_json() or {}
-        force_regenerate = data.get('force_regenerate', False)
+        force_regenerate, reuse_cached, stale_only, flags_error = _generation_flags(data)
+        if flags_error:
+            return jsonify({'success': False, 'error': flags_error}), 400
         
         job_manager = get_job_manager()
         
@@ -768,104 +902,11 @@ def start_async_pregenerate_artwork(oeuvre_id):
         job = job_manager.create_job('artwork', {
             'oeuvre_id': oeuvre_id,
             'title': artwork.get('title', f'Œuvre {oeuvre_id}'),
-            'force_regenerate': force_regenerate
+            'force_regenerate': force_regenerate,
+            'reuse_cached': reuse_cached,
+            'stale_only': stale_only
         })
-        
-        def run_generation(job):
-            import threading
-            
-            try:
-                # ===== ATTENDRE SON TOUR DANS LA QUEUE =====
-                if not job_manager.wait_for_turn(job.job_id):
-                    job_manager.complete_job(job.job_id, success=False, error_message="Job annulé ou timeout pendant l'attente")
-                    return
-                
-                system = OllamaMediationSystem()
-                all_criteres = get_criteres()
-                combinaisons = system.generate_combinaisons(all_criteres)
-                
-                # ===== MAINTENANT on peut démarrer =====
-                job_manager.start_job(job.job_id, len(combinaisons))
-                
-                # Compteurs thread-safe
-                stats_lock = threading.Lock()
-                stats = {'completed': 0, 'generated': 0, 'skipped': 0, 'errors': 0}
-                
-                def process_single_combo(combo, idx):
-                    """Traite une seule combinaison"""
-                    start_time = time_module.time()
-                    result_type = 'error'
-                    
-                    try:
-                        result = system.pregenerate_single_combination(
-                            oeuvre_id=oeuvre_id,
-                            artwork=artwork,
-                            combination=combo,
-                            model="ministral-3:3b",
-                            force_regenerate=force_regenerate
-                        )
-                        
-                        if result.get('generated'):
-                            result_type = 'generate'
-                        elif result.get('skipped'):
-                            result_type = 'skip'
-                    except Exception as e:
-                        logger.error(f"Erreur génération combo {idx}: {e}")
-                    
-                    duration_ms = int((time_module.time() - start_time) * 1000)
-                    
-                    # Enregistrer le timing
-                    try:
-                        combo_hash = get_combination_hash(combo)
-                        job_manager.record_timing(
-                            job.job_id, result_type, duration_ms,
-                            oeuvre_id, combo_hash
-                        )
-                        logger.debug(f"Timing enregistré: {result_type} - {duration_ms}ms")
-                    except Exception as timing_error:
-                        logger.error(f"Erreur enregistrement timing: {timing_error}")
-                    
-                    return result_type, idx
-                
-                # Utiliser ThreadPoolExecutor pour paralléliser
-                pool = job_manager.get_thread_pool()
-                futures = {pool.submit(process_single_combo, combo, idx): idx 
-                          for idx, combo in enumerate(combinaisons)}
-                
-                total = len(combinaisons)
-                for future in as_completed(futures):
-                    idx = futures[future]
-                    try:
-                        result_type, _ = future.result()
-                        
-                        with stats_lock:
-                            stats['completed'] += 1
-                            if result_type == 'generate':
-                                stats['generated'] += 1
-                            elif result_type == 'skip':
-                                stats['skipped'] += 1
-                            else:
-                                stats['errors'] += 1
-                            
-                            job_manager.update_job_progress(
-                                job.job_id,
-                                completed_items=stats['completed'],
-                                current_item=f"Combinaison {stats['completed']}/{total}",
-                                generated=stats['generated'],
-                                skipped=stats['skipped'],
-                                errors=stats['errors']
-                            )
-                    except Exception:
-                        with stats_lock:
-                            stats['completed'] += 1
-                            stats['errors'] += 1
-                
-                job_manager.complete_job(job.job_id, success=True)
-                
-            except Exception as e:
-                job_manager.complete_job(job.job_id, success=False, error_message=str(e))
-        
-        job_manager.run_async(job, run_generation)
+        job_manager.run_async(job, _run_generation_job)
         
         return jsonify({
             'success': True,
@@ -883,141 +924,29 @@ def start_async_pregenerate_profile():
     try:
         data = request.get_json() or {}
         criteria_combination = data.get('criteria_combination')
-        force_regenerate = data.get('force_regenerate', False)
+        force_regenerate, reuse_cached, stale_only, flags_error = _generation_flags(data)
+        if flags_error:
+            return jsonify({'success': False, 'error': flags_error}), 400
         
         if not criteria_combination:
             return jsonify({'success': False, 'error': 'criteria_combination requis'}), 400
         
-        # ENRICHIR les critères: convertir IDs en objets complets avec name/description
-        all_criteres = get_criteres()
-        combinaison_enrichie = {}
-        for crit_type, crit_id in criteria_combination.items():
-            critere = next((c for c in all_criteres.get(crit_type, []) if c['criteria_id'] == crit_id), None)
-            if critere:
-                combinaison_enrichie[crit_type] = critere
-            else:
-                return jsonify({'success': False, 'error': f'Critère invalide: {crit_type}={crit_id}'}), 400
+        # Valider les critères (l'enrichissement est refait par le job, y compris à la reprise)
+        try:
+            _enrich_criteria_combination(criteria_combination, get_criteres())
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
         job_manager = get_job_manager()
         
         # Créer le job avec les IDs pour le stockage
         job = job_manager.create_job('profile', {
             'criteria_combination': criteria_combination,  # IDs pour stockage
-            'force_regenerate': force_regenerate
+            'force_regenerate': force_regenerate,
+            'reuse_cached': reuse_cached,
+            'stale_only': stale_only
         })
-        
-        def run_generation(job):
-            import threading
-            
-            try:
-                # ===== ATTENDRE SON TOUR DANS LA QUEUE =====
-                if not job_manager.wait_for_turn(job.job_id):
-                    job_manager.complete_job(job.job_id, success=False, error_message="Job annulé ou timeout pendant l'attente")
-                    return
-                
-                conn = _connect_postgres()
-                cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-                cur.execute("SELECT oeuvre_id, title FROM oeuvres ORDER BY oeuvre_id")
-                oeuvres = cur.fetchall()
-                cur.close()
-                conn.close()
-                
-                if not oeuvres:
-                    job_manager.complete_job(job.job_id, success=False, error_message="Aucune œuvre")
-                    return
-                
-                system = OllamaMediationSystem()
-                total_oeuvres = len(oeuvres)
-                # ===== MAINTENANT on peut démarrer =====
-                job_manager.start_job(job.job_id, total_oeuvres)
-                
-                # Compteurs thread-safe
-                stats_lock = threading.Lock()
-                stats = {'completed': 0, 'generated': 0, 'skipped': 0, 'errors': 0}
-                
-                def process_single_oeuvre(oeuvre_row):
-                    """Traite une seule œuvre pour ce profil"""
-                    oeuvre_id = oeuvre_row['oeuvre_id']
-                    title = oeuvre_row.get('title', f'Œuvre {oeuvre_id}')
-                    
-                    start_time = time_module.time()
-                    result_type = 'error'
-                    
-                    try:
-                        artwork = get_artwork(oeuvre_id)
-                        if not artwork:
-                            return 'error', title
-                        
-                        # Utiliser la combinaison ENRICHIE (avec name/description)
-                        result = system.pregenerate_single_combination(
-                            oeuvre_id=oeuvre_id,
-                            artwork=artwork,
-                            combination=combinaison_enrichie,  # Enrichie avec name/description
-                            model="ministral-3:3b",
-                            force_regenerate=force_regenerate
-                        )
-                        
-                        if result.get('generated'):
-                            result_type = 'generate'
-                        elif result.get('skipped'):
-                            result_type = 'skip'
-                    except Exception as e:
-                        logger.error(f"Erreur génération profil pour œuvre {oeuvre_id}: {e}")
-                    
-                    duration_ms = int((time_module.time() - start_time) * 1000)
-                    
-                    # Enregistrer le timing - ESSENTIEL pour l'estimation du temps
-                    try:
-                        combo_hash = get_combination_hash(combinaison_enrichie)
-                        job_manager.record_timing(
-                            job.job_id, result_type, duration_ms,
-                            oeuvre_id, combo_hash
-                        )
-                        logger.debug(f"[Profile] Timing enregistré: {result_type} - {duration_ms}ms pour {title}")
-                    except Exception as timing_error:
-                        logger.error(f"Erreur enregistrement timing: {timing_error}")
-                    
-                    return result_type, title
-                
-                # Utiliser ThreadPoolExecutor pour paralléliser (comme les autres routes)
-                pool = job_manager.get_thread_pool()
-                futures = {pool.submit(process_single_oeuvre, oeuvre_row): oeuvre_row for oeuvre_row in oeuvres}
-                
-                for future in as_completed(futures):
-                    oeuvre_row = futures[future]
-                    try:
-                        result_type, title = future.result()
-                        
-                        with stats_lock:
-                            stats['completed'] += 1
-                            if result_type == 'generate':
-                                stats['generated'] += 1
-                            elif result_type == 'skip':
-                                stats['skipped'] += 1
-                            else:
-                                stats['errors'] += 1
-                            
-                            job_manager.update_job_progress(
-                                job.job_id,
-                                completed_items=stats['completed'],
-                                current_item=f"{title} ({stats['completed']}/{total_oeuvres})",
-                                generated=stats['generated'],
-                                skipped=stats['skipped'],
-                                errors=stats['errors']
-                            )
-                    except Exception:
-                        with stats_lock:
-                            stats['completed'] += 1
-                            stats['errors'] += 1
-                
-                job_manager.complete_job(job.job_id, success=True)
-                
-            except Exception as e:
-                import traceback
-                traceback.print_exc()
-                job_manager.complete_job(job.job_id, success=False, error_message=str(e))
-        
-        job_manager.run_async(job, run_generation)
+        job_manager.run_async(job, _run_generation_job)
         
         return jsonify({
             'success': True,
@@ -1039,7 +968,10 @@ def start_async_pregenerate_single():
         data = request.get_json() or {}
         oeuvre_id = data.get('oeuvre_id')
         criteria_combination = data.get('criteria_combination')
-        force_regenerate = data.get('force_regenerate', True)  # Par défaut on force pour régénérer
+        # Par défaut on force pour régénérer (sauf demande stale_only)
+        force_regenerate, reuse_cached, stale_only, flags_error = _generation_flags(data, default_force=True)
+        if flags_error:
+            return jsonify({'success': False, 'error': flags_error}), 400
         
         if not oeuvre_id or not criteria_combination:
             return jsonify({'success': False, 'error': 'oeuvre_id et criteria_combination requis'}), 400
@@ -1049,15 +981,10 @@ def start_async_pregenerate_single():
         if not artwork:
             return jsonify({'success': False, 'error': 'Œuvre non trouvée'}), 404
         
-        # ENRICHIR les critères: convertir IDs en objets complets avec name/description
-        all_criteres = get_criteres()
-        combinaison_enrichie = {}
-        for crit_type, crit_id in criteria_combination.items():
-            critere = next((c for c in all_criteres.get(crit_type, []) if c['criteria_id'] == crit_id), None)
-            if critere:
-                combinaison_enrichie[crit_type] = critere
-            else:
-                return jsonify({'success': False, 'error': f'Critère invalide: {crit_type}={crit_id}'}), 400
+        try:
+            _enrich_criteria_combination(criteria_combination, get_criteres())
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
         job_manager = get_job_manager()
         
@@ -1066,66 +993,11 @@ def start_async_pregenerate_single():
             'oeuvre_id': oeuvre_id,
             'title': artwork.get('title', f'Œuvre {oeuvre_id}'),
             'criteria_combination': criteria_combination,  # IDs pour stockage
-            'force_regenerate': force_regenerate
+            'force_regenerate': force_regenerate,
+            'reuse_cached': reuse_cached,
+            'stale_only': stale_only
         })
-        
-        def run_generation(job):
-            try:
-                # ===== ATTENDRE SON TOUR DANS LA QUEUE =====
-                if not job_manager.wait_for_turn(job.job_id):
-                    job_manager.complete_job(job.job_id, success=False, error_message="Job annulé ou timeout pendant l'attente")
-                    return
-                
-                system = OllamaMediationSystem()
-                # ===== MAINTENANT on peut démarrer =====
-                job_manager.start_job(job.job_id, 1)  # 1 seul item
-                
-                job_manager.update_job_progress(
-                    job.job_id, 
-                    current_item=f"{artwork.get('title', 'Œuvre')} (1/1)"
-                )
-                
-                start_time = time_module.time()
-                
-                # Utiliser la combinaison ENRICHIE
-                result = system.pregenerate_single_combination(
-                    oeuvre_id=oeuvre_id,
-                    artwork=artwork,
-                    combination=combinaison_enrichie,
-                    model="ministral-3:3b",
-                    force_regenerate=force_regenerate
-                )
-                
-                duration_ms = int((time_module.time() - start_time) * 1000)
-                
-                generated = 0
-                skipped = 0
-                errors = 0
-                
-                if result.get('generated'):
-                    generated = 1
-                    job_manager.record_timing(job.job_id, 'generate', duration_ms, oeuvre_id)
-                elif result.get('skipped'):
-                    skipped = 1
-                    job_manager.record_timing(job.job_id, 'skip', duration_ms, oeuvre_id)
-                else:
-                    errors = 1
-                
-                job_manager.update_job_progress(
-                    job.job_id,
-                    completed_items=1,
-                    generated=generated,
-                    skipped=skipped,
-                    errors=errors
-                )
-                
-                job_manager.complete_job(job.job_id, success=True)
-                
-            except Exception as e:
-                logger.error(f"Erreur génération single: {e}")
-                job_manager.complete_job(job.job_id, success=False, error_message=str(e))
-        
-        job_manager.run_async(job, run_generation)
+        job_manager.run_async(job, _run_generation_job)
         
         return jsonify({
             'success': True,
@@ -1137,152 +1009,556 @@ def start_async_pregenerate_single():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-# ===== API PARCOURS =====
+@app.route('/api/generation/cache/stats', methods=['GET'])
+def generation_cache_stats():
+    """Statistiques du cache de générations (empreinte de prompt)"""
+    from .core.generation_cache import get_generation_cache
+    try:
+        return jsonify({'success': True, 'cache': get_generation_cache().get_stats()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/generation/cache/clear', methods=['POST'])
+def generation_cache_clear():
+    """Vide le cache de générations"""
+    from .core.generation_cache import get_generation_cache
+    try:
+        deleted = get_generation_cache().clear()
+        return jsonify({'success': True, 'deleted': deleted})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+# ===== REPRISE DES JOBS APRÈS REDÉMARRAGE =====
+# Chaque worker enregistre le runner commun puis démarre le heartbeat:
+# les jobs dont le bail a expiré (process mort) sont repris depuis leur checkpoint.
+try:
+    _startup_job_manager = get_job_manager()
+    for _job_type in ('all', 'artwork', 'profile', 'single'):
+        _startup_job_manager.register_runner(_job_type, _run_generation_job)
+    _startup_job_manager.start_heartbeat()
+except Exception as e:
+    print(f"⚠️ Reprise des jobs indisponible: {e}")
+
+
+_NO_ARTWORK_ERROR = (
+    'Aucune œuvre avec narration pré-générée trouvée pour ce profil. '
+    'Veuillez d\'abord générer les narrations dans le dashboard admin.'
+)
+
+
+def _generate_parcours_response(criteria_dict: Dict, target_duration: int, variation_seed, generate_audio: bool):
+    """Génère parcours + audio. Retourne (corps JSON, statut HTTP)."""
+    from .parcours.intelligent_parcours_v3 import generate_parcours_v3
+    from .tts import get_piper_service
+    import time
+
+    print(f"🎯 [PARCOURS] Génération pour profil: {criteria_dict}, durée: {target_duration}min, audio: {generate_audio}")
+
+    parcours_json = generate_parcours_v3(
+        profile=criteria_dict,
+        target_duration_min=target_duration,
+        seed=variation_seed
+    )
+
+    # Vérifier si le parcours a des œuvres
+    if not parcours_json.get('artworks'):
+        print("⚠️ [PARCOURS] Aucune œuvre trouvée pour ce profil!")
+        return {'success': False, 'error': _NO_ARTWORK_ERROR}, 404
+
+    print(f"✅ [PARCOURS] {len(parcours_json['artworks'])} œuvres sélectionnées")
+
+    audio_result = {'generated': False, 'count': 0, 'paths': {}}
+
+    if generate_audio:
+        try:
+            parcours_id = parcours_json.get('metadata', {}).get('unique_parcours_id', variation_seed or int(time.time() * 1000))
+
+            piper = get_piper_service('fr_FR')
+
+            # === BOUCLE D'AJUSTEMENT : Générer audio et ajuster si temps dépasse la cible ===
+            MAX_ADJUSTMENT_ITERATIONS = 5  # Éviter boucle infinie
+            TOLERANCE_PERCENT = 0.15  # 15% de marge au-dessus de la cible
+
+            for iteration in range(MAX_ADJUSTMENT_ITERATIONS):
+                artworks = parcours_json.get('artworks', [])
+                narrations = [{'oeuvre_id': a['oeuvre_id'], 'narration_text': a['narration']} for a in artworks]
+
+                print(f"🎵 [PARCOURS] Génération audio pour {len(narrations)} narrations (itération {iteration + 1})...")
+
+                audio_results = piper.generate_parcours_audio(
+                    parcours_id=parcours_id,
+                    narrations=narrations,
+                    language='fr_FR'
+                )
+
+                # Mettre à jour les durées réelles
+                for artwork in artworks:
+                    oeuvre_id = artwork['oeuvre_id']
+                    if oeuvre_id in audio_results:
+                        audio_data = audio_results[oeuvre_id]
+                        artwork['audio_path'] = audio_data['path']
+                        artwork['narration_duration'] = audio_data['duration_seconds']
+
+                # Calculer temps total réel
+                total_narration_min = sum(a.get('narration_duration', 0) for a in artworks) / 60
+                observation_min = len(artworks) * 2.0  # 2 min par œuvre
+                walk_min = parcours_json.get('walk_time', len(artworks) * 0.5)  # ou estimation
+                total_duration_min = total_narration_min + observation_min + walk_min
+
+                max_allowed = target_duration * (1 + TOLERANCE_PERCENT)
+
+                print(f"   ⏱️ Durée réelle: {total_duration_min:.1f}min (cible: {target_duration}min, max: {max_allowed:.1f}min)")
+
+                # Vérifier si on est dans les limites
+                if total_duration_min <= max_allowed:
+                    print(f"   ✅ Durée OK - dans les limites")
+                    break
+
+                # Si on dépasse ET qu'on peut retirer une œuvre (min 3)
+                if len(artworks) <= 3:
+                    print(f"   ⚠️ Durée dépassée mais minimum 3 œuvres atteint")
+                    break
+
+                # Retirer la dernière œuvre (la moins prioritaire dans le tri)
+                removed_artwork = artworks.pop()
+                print(f"   🔄 Durée {total_duration_min:.1f}min > {max_allowed:.1f}min → Retrait de '{removed_artwork['title']}'")
+
+                # Mettre à jour les métadonnées
+                parcours_json['artworks'] = artworks
+                parcours_json['metadata']['total_artworks'] = len(artworks)
+
+                # Supprimer l'audio de l'œuvre retirée (optionnel, nettoyage)
+                if removed_artwork['oeuvre_id'] in audio_results:
+                    del audio_results[removed_artwork['oeuvre_id']]
+
+                # Recalculer l'ordre des œuvres
+                for idx, artwork in enumerate(artworks):
+                    artwork['order'] = idx + 1
+
+            # Mise à jour finale des durées
+            total_narration = sum(a.get('narration_duration', 0) for a in parcours_json['artworks']) / 60
+            breakdown = parcours_json['metadata']['duration_breakdown']
+            breakdown['narration_minutes'] = total_narration
+            breakdown['observation_minutes'] = len(parcours_json['artworks']) * 2.0
+            breakdown['total_minutes'] = total_narration + breakdown['walking_minutes'] + breakdown['observation_minutes']
+            parcours_json['estimated_duration_min'] = breakdown['total_minutes']
+            parcours_json['duration_estimated'] = breakdown['total_minutes']
+
+            audio_result = {
+                'generated': True,
+                'count': len(audio_results),
+                'paths': {k: v['path'] for k, v in audio_results.items()},
+                'durations': {k: v['duration_seconds'] for k, v in audio_results.items()},
+                'adjustments_made': iteration  # Nombre de réajustements effectués
+            }
+            print(f"✅ [PARCOURS] Audio généré: {len(audio_results)} fichiers, durée finale: {breakdown['total_minutes']:.1f}min")
+        except Exception as audio_error:
+            print(f"⚠️ [PARCOURS] Erreur audio (parcours retourné sans audio): {audio_error}")
+            audio_result['error'] = str(audio_error)
+            # On retourne quand même le parcours sans audio
+
+    return {'success': True, 'parcours': parcours_json, 'audio': audio_result}, 200
+
+
+def _submit_parcours_audio(parcours_json: Dict) -> Dict:
+    """Met en file la synthèse audio d'un parcours. Retourne le bloc 'audio' de la réponse."""
+    from .tts import get_parcours_audio_jobs
+
+    parcours_id = parcours_json['metadata']['unique_parcours_id']
+    manifest = get_parcours_audio_jobs().submit(
+        parcours_id,
+        [{'oeuvre_id': a['oeuvre_id'], 'narration_text': a['narration']} for a in parcours_json['artworks']],
+        language='fr_FR'
+    )
+    return {
+        'generated': False,
+        'mode': 'async',
+        'status': manifest['status'],
+        'parcours_id': parcours_id,
+        'status_url': f"/api/parcours/{parcours_id}/audio",
+        'events_url': f"/api/parcours/{parcours_id}/audio/events"
+    }
+
+
+def _record_parcours_timeline(parcours_json: Dict):
+    """Enregistre le déroulé prévu d'un parcours servi (estimation d'affluence)"""
+    from .core.occupancy import get_occupancy_model
+
+    try:
+        get_occupancy_model().record_parcours(parcours_json)
+    except Exception as e:
+        print(f"⚠️ [PARCOURS] Déroulé non enregistré: {e}")
+
+
+def _shape_parcours_body(body: Dict, route_format) -> Dict:
+    """Réponse parcours au format demandé: 'compact' remplace path_segments/waypoints par 'route'"""
+    if route_format != 'compact' or not body.get('parcours'):
+        return body
+    from .parcours.services import compact_parcours
+    return {**body, 'parcours': compact_parcours(body['parcours'])}
+
+
+def _resolve_criteria(criteria_names):
+    """Noms de critères {type: name} → ids {type: criteria_id}. Retourne (critères, erreur)."""
+    from .core.criteria_service import criteria_service
+
+    if not criteria_names or not isinstance(criteria_names, dict):
+        return None, 'criteria requis (objet {type: name})'
+
+    criteria_dict = {}
+    for type_name, criteria_name in criteria_names.items():
+        criteria = criteria_service.get_criteria_by_name(type_name, criteria_name)
+        if not criteria:
+            return None, f'Critère invalide: {type_name}={criteria_name}'
+        criteria_dict[type_name] = criteria['criteria_id']
+
+    is_valid, missing = criteria_service.validate_all_criteria(criteria_dict)
+    if not is_valid:
+        return None, f'Critères manquants: {", ".join(missing)}'
+    return criteria_dict, None
+
+
+def _start_parcours_async(criteria_dict: Dict, target_duration: int, variation_seed):
+    """
+    Phase 1 seulement: plan ordonné + segments renvoyés tout de suite,
+    synthèse audio mise en file (1re œuvre prioritaire).
+    Pas d'ajustement sur la durée audio réelle: la durée reste l'estimation.
+    """
+    from .parcours.intelligent_parcours_v3 import generate_parcours_v3
+
+    print(f"🎯 [PARCOURS] Génération (audio asynchrone) pour profil: {criteria_dict}, durée: {target_duration}min")
+
+    parcours_json = generate_parcours_v3(
+        profile=criteria_dict,
+        target_duration_min=target_duration,
+        seed=variation_seed
+    )
+    if not parcours_json.get('artworks'):
+        print("⚠️ [PARCOURS] Aucune œuvre trouvée pour ce profil!")
+        return {'success': False, 'error': _NO_ARTWORK_ERROR}, 404
+
+    audio_result = _submit_parcours_audio(parcours_json)
+    parcours_id = audio_result['parcours_id']
+    print(f"✅ [PARCOURS] {len(parcours_json['artworks'])} œuvres, audio en arrière-plan (parcours {parcours_id})")
+    return {'success': True, 'parcours': parcours_json, 'audio': audio_result}, 200
+
 
 @app.route('/api/parcours/generate', methods=['POST'])
 def generate_intelligent_parcours():
     try:
-        from .parcours.intelligent_parcours_v3 import generate_parcours_v3
-        from .core.criteria_service import criteria_service
-        from .tts import get_piper_service
-        import time
+        from .core.parcours_cache import get_parcours_cache, parcours_cache_key, bucket_duration, museum_version
+        from .core.parcours_pool import get_parcours_pool
+        from .core.occupancy import get_occupancy_model
         
         data = request.get_json()
-        criteria_names = data.get('criteria')
-        
-        if not criteria_names or not isinstance(criteria_names, dict):
-            return jsonify({'success': False, 'error': 'criteria requis (objet {type: name})'}), 400
+        criteria_dict, criteria_error = _resolve_criteria(data.get('criteria'))
+        if criteria_error:
+            return jsonify({'success': False, 'error': criteria_error}), 400
         
-        criteria_dict = {}
-        for type_name, criteria_name in criteria_names.items():
-            criteria = criteria_service.get_criteria_by_name(type_name, criteria_name)
-            if not criteria:
-                return jsonify({'success': False, 'error': f'Critère invalide: {type_name}={criteria_name}'}), 400
-            criteria_dict[type_name] = criteria['criteria_id']
-        
-        is_valid, missing = criteria_service.validate_all_criteria(criteria_dict)
-        if not is_valid:
-            return jsonify({'success': False, 'error': f'Critères manquants: {", ".join(missing)}'}), 400
-        
-        target_duration = data.get('target_duration_minutes', 60)
+        target_duration = bucket_duration(data.get('target_duration_minutes', 60))
         variation_seed = data.get('variation_seed')
         generate_audio = data.get('generate_audio', True)
-        
-        print(f"🎯 [PARCOURS] Génération pour profil: {criteria_dict}, durée: {target_duration}min, audio: {generate_audio}")
-        
-        parcours_json = generate_parcours_v3(
-            profile=criteria_dict,
-            target_duration_min=target_duration,
-            seed=variation_seed
-        )
-        
-        # Vérifier si le parcours a des œuvres
-        if not parcours_json.get('artworks'):
-            print("⚠️ [PARCOURS] Aucune œuvre trouvée pour ce profil!")
-            return jsonify({
-                'success': False, 
-                'error': 'Aucune œuvre avec narration pré-générée trouvée pour ce profil. Veuillez d\'abord générer les narrations dans le dashboard admin.'
-            }), 404
-        
-        print(f"✅ [PARCOURS] {len(parcours_json['artworks'])} œuvres sélectionnées")
-        
-        audio_result = {'generated': False, 'count': 0, 'paths': {}}
-        
-        if generate_audio:
+        # 'compact': chemins encodés (table de points + polylines), voir parcours/services/route_codec.py
+        route_format = data.get('route_format')
+        # 'async': plan renvoyé immédiatement, audio suivi via /api/parcours/<id>/audio
+        async_audio = generate_audio and data.get('audio_mode') == 'async'
+        
+        cache = get_parcours_cache()
+        pool = get_parcours_pool()
+        version = None
+        if cache.enabled:
             try:
-                parcours_id = parcours_json.get('metadata', {}).get('unique_parcours_id', variation_seed or int(time.time() * 1000))
-                
-                piper = get_piper_service('fr_FR')
-                
-                # === BOUCLE D'AJUSTEMENT : Générer audio et ajuster si temps dépasse la cible ===
-                MAX_ADJUSTMENT_ITERATIONS = 5  # Éviter boucle infinie
-                TOLERANCE_PERCENT = 0.15  # 15% de marge au-dessus de la cible
-                
-                for iteration in range(MAX_ADJUSTMENT_ITERATIONS):
-                    artworks = parcours_json.get('artworks', [])
-                    narrations = [{'oeuvre_id': a['oeuvre_id'], 'narration_text': a['narration']} for a in artworks]
-                    
-                    print(f"🎵 [PARCOURS] Génération audio pour {len(narrations)} narrations (itération {iteration + 1})...")
-                    
-                    audio_results = piper.generate_parcours_audio(
-                        parcours_id=parcours_id,
-                        narrations=narrations,
-                        language='fr_FR'
-                    )
-                    
-                    # Mettre à jour les durées réelles
-                    for artwork in artworks:
-                        oeuvre_id = artwork['oeuvre_id']
-                        if oeuvre_id in audio_results:
-                            audio_data = audio_results[oeuvre_id]
-                            artwork['audio_path'] = audio_data['path']
-                            artwork['narration_duration'] = audio_data['duration_seconds']
-                    
-                    # Calculer temps total réel
-                    total_narration_min = sum(a.get('narration_duration', 0) for a in artworks) / 60
-                    observation_min = len(artworks) * 2.0  # 2 min par œuvre
-                    walk_min = parcours_json.get('walk_time', len(artworks) * 0.5)  # ou estimation
-                    total_duration_min = total_narration_min + observation_min + walk_min
-                    
-                    max_allowed = target_duration * (1 + TOLERANCE_PERCENT)
-                    
-                    print(f"   ⏱️ Durée réelle: {total_duration_min:.1f}min (cible: {target_duration}min, max: {max_allowed:.1f}min)")
-                    
-                    # Vérifier si on est dans les limites
-                    if total_duration_min <= max_allowed:
-                        print(f"   ✅ Durée OK - dans les limites")
-                        break
-                    
-                    # Si on dépasse ET qu'on peut retirer une œuvre (min 3)
-                    if len(artworks) <= 3:
-                        print(f"   ⚠️ Durée dépassée mais minimum 3 œuvres atteint")
-                        break
-                    
-                    # Retirer la dernière œuvre (la moins prioritaire dans le tri)
-                    removed_artwork = artworks.pop()
-                    print(f"   🔄 Durée {total_duration_min:.1f}min > {max_allowed:.1f}min → Retrait de '{removed_artwork['title']}'")
-                    
-                    # Mettre à jour les métadonnées
-                    parcours_json['artworks'] = artworks
-                    parcours_json['metadata']['total_artworks'] = len(artworks)
-                    
-                    # Supprimer l'audio de l'œuvre retirée (optionnel, nettoyage)
-                    if removed_artwork['oeuvre_id'] in audio_results:
-                        del audio_results[removed_artwork['oeuvre_id']]
-                    
-                    # Recalculer l'ordre des œuvres
-                    for idx, artwork in enumerate(artworks):
-                        artwork['order'] = idx + 1
-                
-                # Mise à jour finale des durées
-                total_narration = sum(a.get('narration_duration', 0) for a in parcours_json['artworks']) / 60
-                breakdown = parcours_json['metadata']['duration_breakdown']
-                breakdown['narration_minutes'] = total_narration
-                breakdown['observation_minutes'] = len(parcours_json['artworks']) * 2.0
-                breakdown['total_minutes'] = total_narration + breakdown['walking_minutes'] + breakdown['observation_minutes']
-                parcours_json['estimated_duration_min'] = breakdown['total_minutes']
-                parcours_json['duration_estimated'] = breakdown['total_minutes']
-                
-                audio_result = {
-                    'generated': True,
-                    'count': len(audio_results),
-                    'paths': {k: v['path'] for k, v in audio_results.items()},
-                    'durations': {k: v['duration_seconds'] for k, v in audio_results.items()},
-                    'adjustments_made': iteration  # Nombre de réajustements effectués
-                }
-                print(f"✅ [PARCOURS] Audio généré: {len(audio_results)} fichiers, durée finale: {breakdown['total_minutes']:.1f}min")
-            except Exception as audio_error:
-                print(f"⚠️ [PARCOURS] Erreur audio (parcours retourné sans audio): {audio_error}")
-                audio_result['error'] = str(audio_error)
-                # On retourne quand même le parcours sans audio
-        
-        return jsonify({'success': True, 'parcours': parcours_json, 'audio': audio_result})
+                version = museum_version()
+            except Exception as version_error:
+                print(f"⚠️ [PARCOURS] Cache ignoré (version indisponible): {version_error}")
+
+        # Sans seed, l'affluence oriente la sélection: la fenêtre de l'instantané
+        # entre dans la clé de cache, et la réserve (construite sans affluence) est évitée
+        crowd_epoch = None
+        if variation_seed is None:
+            try:
+                crowd_epoch = get_occupancy_model().crowd_epoch()
+            except Exception as crowd_error:
+                print(f"⚠️ [PARCOURS] Affluence indisponible: {crowd_error}")
+
+        # Réserve: parcours complet déjà prêt (uniquement sans seed imposé ni affluence)
+        if pool.enabled and variation_seed is None and crowd_epoch is None and generate_audio:
+            pooled = pool.pop(criteria_dict, target_duration)
+            if pooled is not None:
+                print(f"⚡ [PARCOURS] Servi depuis la réserve")
+                pool.record_request(criteria_dict, target_duration, 'pool')
+                _record_parcours_timeline(pooled['parcours'])
+                return jsonify(_shape_parcours_body({**pooled, 'cache': 'pool'}, route_format))
+
+        if async_audio:
+            # Phase 1 seulement: les visiteurs coalescés ou servis depuis le cache
+            # partagent le même parcours_id, donc un seul manifeste et une seule file Piper
+            def compute():
+                return _start_parcours_async(criteria_dict, target_duration, variation_seed)
+        else:
+            def compute():
+                return _generate_parcours_response(criteria_dict, target_duration, variation_seed, generate_audio)
+
+        def usable(payload):
+            # Audio synchrone demandé: une réponse de phase 1 en cache ne suffit pas
+            return async_audio or payload['audio'].get('mode') != 'async'
+
+        if version is None or not cache.enabled:
+            body, status = compute()
+            cache_status = 'bypass'
+        else:
+            cache_key = parcours_cache_key(
+                criteria_dict, target_duration, variation_seed, generate_audio, version, crowd_epoch
+            )
+            # Pas de mise en cache si l'audio a échoué (le client réessaiera)
+            body, status, cache_status = cache.get_or_compute(
+                cache_key, compute,
+                cacheable=lambda payload: not payload['audio'].get('error'),
+                usable=usable
+            )
+            if cache_status != 'miss':
+                print(f"⚡ [PARCOURS] Servi depuis le cache ({cache_status})")
+
+        if status != 200:
+            return jsonify(body), status
+        pool.record_request(criteria_dict, target_duration, 'async' if async_audio and cache_status == 'miss' else cache_status)
+        _record_parcours_timeline(body['parcours'])
+        return jsonify(_shape_parcours_body({**body, 'cache': cache_status}, route_format))
     except ValueError as e:
         return jsonify({'success': False, 'error': str(e)}), 404
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+PARCOURS_BATCH_MAX = int(os.getenv('PARCOURS_BATCH_MAX', '60'))
+
+
+@app.route('/api/parcours/generate/batch', methods=['POST'])
+def generate_parcours_batch():
+    """
+    Parcours d'un groupe en une requête
+    Body: {profiles: [{criteria, target_duration_minutes?, variation_seed?}, ...]}
+       ou {criteria, count} (un profil, N parcours de seeds différentes)
+    Options: target_duration_minutes (défaut 60), balance_crowding (répartir
+    le groupe sur des œuvres différentes), accessible_only, generate_audio
+    (audio toujours asynchrone, suivi via audio.status_url de chaque parcours),
+    route_format ('compact' comme /api/parcours/generate)
+    Un parcours orienté par l'affluence ou l'équilibrage porte
+    metadata.replayable = False: son variation_seed ne le rejoue pas à l'identique
+    """
+    try:
+        import json
+        from .core.parcours_cache import bucket_duration
+        from .parcours.intelligent_parcours_v3 import generate_parcours_batch_v3
+
+        data = request.get_json() or {}
+        default_duration = data.get('target_duration_minutes', 60)
+
+        entries = data.get('profiles')
+        if entries is None:
+            count = data.get('count')
+            if not isinstance(count, int) or count < 1:
+                return jsonify({'success': False, 'error': 'profiles ou criteria + count requis'}), 400
+            entries = [{'criteria': data.get('criteria')}] * count
+        if not isinstance(entries, list) or not entries:
+            return jsonify({'success': False, 'error': 'profiles doit être une liste non vide'}), 400
+        if len(entries) > PARCOURS_BATCH_MAX:
+            return jsonify({'success': False, 'error': f'Maximum {PARCOURS_BATCH_MAX} parcours par lot'}), 400
+
+        # Noms de critères résolus une fois par profil distinct
+        resolved = {}
+        batch_requests = []
+        for entry in entries:
+            names_key = json.dumps(entry.get('criteria'), sort_keys=True)
+            if names_key not in resolved:
+                resolved[names_key] = _resolve_criteria(entry.get('criteria'))
+            criteria_dict, criteria_error = resolved[names_key]
+            if criteria_error:
+                return jsonify({'success': False, 'error': criteria_error}), 400
+            batch_requests.append({
+                'profile': criteria_dict,
+                'target_duration_min': bucket_duration(entry.get('target_duration_minutes', default_duration)),
+                'seed': entry.get('variation_seed')
+            })
+
+        generate_audio = data.get('generate_audio', True)
+        balance_crowding = bool(data.get('balance_crowding', False))
+        print(f"🎯 [PARCOURS] Lot de {len(batch_requests)} parcours ({len(resolved)} profils, équilibrage: {balance_crowding})")
+
+        results = generate_parcours_batch_v3(
+            batch_requests,
+            accessible_only=bool(data.get('accessible_only', False)),
+            balance_crowding=balance_crowding
+        )
+
+        items = []
+        for parcours_json in results:
+            if not parcours_json.get('artworks'):
+                items.append({'success': False, 'error': _NO_ARTWORK_ERROR})
+                continue
+            audio_result = {'generated': False, 'count': 0, 'paths': {}}
+            if generate_audio:
+                try:
+                    audio_result = _submit_parcours_audio(parcours_json)
+                except Exception as audio_error:
+                    print(f"⚠️ [PARCOURS] Erreur audio (parcours retourné sans audio): {audio_error}")
+                    audio_result['error'] = str(audio_error)
+            _record_parcours_timeline(parcours_json)
+            items.append(_shape_parcours_body(
+                {'success': True, 'parcours': parcours_json, 'audio': audio_result}, data.get('route_format')
+            ))
+
+        generated = sum(1 for item in items if item['success'])
+        print(f"✅ [PARCOURS] Lot: {generated}/{len(items)} parcours générés")
+        return jsonify({
+            'success': generated > 0,
+            'count': len(items),
+            'generated': generated,
+            'balance_crowding': balance_crowding,
+            'parcours': items
+        }), 200 if generated else 404
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/parcours/cache/stats', methods=['GET'])
+def parcours_cache_stats():
+    """Statistiques du cache de parcours"""
+    from .core.parcours_cache import get_parcours_cache
+    try:
+        return jsonify({'success': True, 'cache': get_parcours_cache().get_stats()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/parcours/cache/clear', methods=['POST'])
+def parcours_cache_clear():
+    """Vide le cache de parcours (mémoire du worker + stockage partagé)"""
+    from .core.parcours_cache import get_parcours_cache, invalidate_museum_version
+    try:
+        deleted = get_parcours_cache().clear()
+        invalidate_museum_version()
+        return jsonify({'success': True, 'deleted': deleted})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/parcours/<int:parcours_id>/audio', methods=['GET'])
+def get_parcours_audio_status(parcours_id):
+    """État audio par œuvre d'un parcours généré en mode asynchrone (polling)"""
+    from .tts import get_parcours_audio_jobs
+    manifest = get_parcours_audio_jobs().read_manifest(parcours_id)
+    if manifest is None:
+        return jsonify({'success': False, 'error': 'Audio de parcours inconnu ou expiré'}), 404
+    return jsonify({'success': True, 'audio': manifest})
+
+
+# Flux SSE: chaque écouteur garde un thread gthread de Gunicorn, donc flux courts et
+# plafonnés par worker. Le client (MesChoix/Resume) suit l'audio par polling de
+# /api/parcours/<id>/audio; ce flux reste pour les outils qui le demandent.
+_AUDIO_EVENTS_MAX_SECONDS = int(os.getenv('PARCOURS_AUDIO_EVENTS_MAX_SECONDS', '60'))
+_AUDIO_EVENTS_MAX_LISTENERS = int(os.getenv('PARCOURS_AUDIO_EVENTS_MAX_LISTENERS', '2'))
+_AUDIO_EVENTS_POLL_SECONDS = 0.5
+_audio_events_slots = threading.BoundedSemaphore(_AUDIO_EVENTS_MAX_LISTENERS)
+
+
+@app.route('/api/parcours/<int:parcours_id>/audio/events', methods=['GET'])
+def stream_parcours_audio_events(parcours_id):
+    """Flux SSE: un événement 'artwork' par audio prêt, puis 'done' (503 si plus de place)"""
+    from .tts import get_parcours_audio_jobs
+    import json
+    import time
+
+    jobs = get_parcours_audio_jobs()
+    if jobs.read_manifest(parcours_id) is None:
+        return jsonify({'success': False, 'error': 'Audio de parcours inconnu ou expiré'}), 404
+    if not _audio_events_slots.acquire(blocking=False):
+        # Tous les écouteurs pris: repasser en polling plutôt que bloquer un thread de plus
+        response = jsonify({
+            'success': False,
+            'error': 'Trop de flux audio ouverts, utiliser le polling',
+            'status_url': f"/api/parcours/{parcours_id}/audio"
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = '2'
+        return response
+
+    def events():
+        sent = set()
+        deadline = time.time() + _AUDIO_EVENTS_MAX_SECONDS
+        while time.time() < deadline:
+            manifest = jobs.read_manifest(parcours_id)
+            if manifest is None:
+                yield "event: error\ndata: {\"error\": \"expired\"}\n\n"
+                return
+            for artwork in manifest['artworks']:
+                if artwork['status'] != 'pending' and artwork['oeuvre_id'] not in sent:
+                    sent.add(artwork['oeuvre_id'])
+                    yield f"event: artwork\ndata: {json.dumps(artwork)}\n\n"
+            if manifest['status'] not in ('pending', 'running'):
+                yield f"event: done\ndata: {json.dumps({'status': manifest['status'], 'ready': manifest['ready']})}\n\n"
+                return
+            time.sleep(_AUDIO_EVENTS_POLL_SECONDS)
+        yield "event: timeout\ndata: {}\n\n"
+
+    response = Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Place rendue quand le serveur ferme la réponse (fin du flux ou client déconnecté)
+    response.call_on_close(_audio_events_slots.release)
+    return response
+
+
+@app.route('/api/parcours/pool/stats', methods=['GET'])
+def parcours_pool_stats():
+    """Contenu et métriques de la réserve de parcours pré-construits"""
+    from .core.parcours_pool import get_parcours_pool
+    try:
+        return jsonify({'success': True, 'pool': get_parcours_pool().get_stats()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/parcours/occupancy', methods=['GET'])
+def parcours_occupancy():
+    """
+    Affluence prévue par salle (visiteurs des sessions actives)
+    Query: horizon (minutes, défaut 60), step (minutes, défaut 15)
+    """
+    from .core.occupancy import get_occupancy_model
+    try:
+        horizon = min(max(request.args.get('horizon', 60, type=float), 1.0), 480.0)
+        step = min(max(request.args.get('step', 15, type=float), 1.0), horizon)
+        model = get_occupancy_model()
+        forecast = model.forecast()
+        return jsonify({
+            'success': True,
+            'active_visitors': forecast.visitors,
+            'horizon_minutes': horizon,
+            'step_minutes': step,
+            'rooms': forecast.room_forecast(horizon, step),
+            'stats': model.get_stats()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+# ===== RÉSERVE DE PARCOURS =====
+# Chaque worker peut remplir la réserve; le verrou consultatif garantit
+# qu'un seul le fait à un instant donné.
+try:
+    from .core.parcours_pool import get_parcours_pool as _get_startup_pool
+    _startup_pool = _get_startup_pool()
+    _startup_pool.register_builder(_generate_parcours_response)
+    _startup_pool.start()
+except Exception as e:
+    print(f"⚠️ Réserve de parcours indisponible: {e}")
+
+
 @app.route('/api/parcours/map', methods=['POST'])
 def get_parcours_map():
     try:
@@ -1349,63 +1625,84 @@ def get_parcours_map():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/parcours/placements/refresh', methods=['POST'])
+def refresh_artwork_placements():
+    """Recalcule les placements œuvre → salle (appelé après sauvegarde du plan)"""
+    try:
+        from .parcours.models import MuseumGraphV2
+        from .parcours.services import ArtworkPlacementStore
+
+        conn = _connect_postgres()
+        try:
+            graph = MuseumGraphV2(conn)
+            result = ArtworkPlacementStore(conn).refresh(graph)
+        finally:
+            conn.close()
+        return jsonify({'success': True, **result})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 # ===== API MUSEUM FLOOR PLAN =====
 
 @app.route('/api/museum/floor-plan', methods=['GET'])
 def get_floor_plan():
     try:
-        conn = _connect_postgres()
-        cur = conn.cursor()
-        
         floor_filter = request.args.get('floor')
         
-        cur.execute("SELECT plan_id, nom FROM plans ORDER BY plan_id")
-        plan_to_floor = {row['plan_id']: idx for idx, row in enumerate(cur.fetchall())}
-        
-        cur.execute("""
-            SELECT e.entity_id, e.name, e.plan_id,
-                   array_agg(p.x ORDER BY p.ordre) as xs,
-                   array_agg(p.y ORDER BY p.ordre) as ys
-            FROM entities e
-            LEFT JOIN points p ON e.entity_id = p.entity_id
-            WHERE e.entity_type = 'ROOM'
-            GROUP BY e.entity_id, e.name, e.plan_id
-        """)
-        
-        rooms = []
-        for row in cur.fetchall():
-            floor_num = plan_to_floor.get(row['plan_id'], 0)
-            if floor_filter and floor_num != int(floor_filter):
-                continue
-            rooms.append({
-                'entity_id': row['entity_id'],
-                'name': row['name'],
-                'floor': floor_num,
-                'polygon_points': [{'x': x, 'y': y} for x, y in zip(row['xs'] or [], row['ys'] or [])]
-            })
-        
-        cur.execute("""
-            SELECT entrance_id, plan_id, name, x, y, icon
-            FROM museum_entrances WHERE is_active = true
-        """)
-        
-        entrances = []
-        for row in cur.fetchall():
-            floor_num = plan_to_floor.get(row['plan_id'], 0)
-            if floor_filter and floor_num != int(floor_filter):
-                continue
-            entrances.append({
-                'entrance_id': row['entrance_id'],
-                'name': row['name'],
-                'x': float(row['x']),
-                'y': float(row['y']),
-                'icon': row['icon'],
-                'floor': floor_num
-            })
-        
-        cur.close()
-        conn.close()
-        return jsonify({'success': True, 'rooms': rooms, 'entrances': entrances})
+        def build():
+            conn = _connect_postgres()
+            cur = conn.cursor()
+            
+            cur.execute("SELECT plan_id, nom FROM plans ORDER BY plan_id")
+            plan_to_floor = {row['plan_id']: idx for idx, row in enumerate(cur.fetchall())}
+            
+            cur.execute("""
+                SELECT e.entity_id, e.name, e.plan_id,
+                       array_agg(p.x ORDER BY p.ordre) as xs,
+                       array_agg(p.y ORDER BY p.ordre) as ys
+                FROM entities e
+                LEFT JOIN points p ON e.entity_id = p.entity_id
+                WHERE e.entity_type = 'ROOM'
+                GROUP BY e.entity_id, e.name, e.plan_id
+            """)
+            
+            rooms = []
+            for row in cur.fetchall():
+                floor_num = plan_to_floor.get(row['plan_id'], 0)
+                if floor_filter and floor_num != int(floor_filter):
+                    continue
+                rooms.append({
+                    'entity_id': row['entity_id'],
+                    'name': row['name'],
+                    'floor': floor_num,
+                    'polygon_points': [{'x': x, 'y': y} for x, y in zip(row['xs'] or [], row['ys'] or [])]
+                })
+            
+            cur.execute("""
+                SELECT entrance_id, plan_id, name, x, y, icon
+                FROM museum_entrances WHERE is_active = true
+            """)
+            
+            entrances = []
+            for row in cur.fetchall():
+                floor_num = plan_to_floor.get(row['plan_id'], 0)
+                if floor_filter and floor_num != int(floor_filter):
+                    continue
+                entrances.append({
+                    'entrance_id': row['entrance_id'],
+                    'name': row['name'],
+                    'x': float(row['x']),
+                    'y': float(row['y']),
+                    'icon': row['icon'],
+                    'floor': floor_num
+                })
+            
+            cur.close()
+            conn.close()
+            return {'success': True, 'rooms': rooms, 'entrances': entrances}
+            
+        return _floor_plan_response.respond(build, variant=floor_filter or '')
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -1478,13 +1775,21 @@ def admin_generate_narration_precise():
             conn.close()
             return jsonify({'success': False, 'error': result.get('error')}), 500
         
+        # Empreintes des contenus du prompt, comme le runner de jobs (stale_only)
         cur.execute("""
-            INSERT INTO pregenerations (oeuvre_id, criteria_combination, pregeneration_text, created_at, updated_at)
-            VALUES (%s, %s, %s, NOW(), NOW())
+            INSERT INTO pregenerations (
+                oeuvre_id, criteria_combination, pregeneration_text,
+                artwork_hash, criteria_hashes, created_at, updated_at
+            )
+            VALUES (%s, %s, %s, %s, %s::jsonb, NOW(), NOW())
             ON CONFLICT (oeuvre_id, criteria_combination) 
-            DO UPDATE SET pregeneration_text = EXCLUDED.pregeneration_text, updated_at = NOW()
+            DO UPDATE SET pregeneration_text = EXCLUDED.pregeneration_text,
+                          artwork_hash = EXCLUDED.artwork_hash,
+                          criteria_hashes = EXCLUDED.criteria_hashes,
+                          updated_at = NOW()
             RETURNING pregeneration_id
-        """, (oeuvre_id, json_module.dumps(criteria_combination), result['text']))
+        """, (oeuvre_id, json_module.dumps(criteria_combination), result['text'],
+              artwork_content_hash(dict(artwork)), json_module.dumps(criteria_content_hashes(combinaison_enrichie))))
         
         pregen_id = cur.fetchone()['pregeneration_id']
         conn.commit()
@@ -6,10 +6,10 @@ Orchestration des services pour génération intelligente de parcours
 
 import psycopg2
 import psycopg2.extras
-from typing import Dict, List
+from typing import Dict, List, Optional
 import sys
 import os
-import time
+import random
 
 # Support exécution directe et import module
 if __name__ == "__main__":
@@ -20,8 +20,11 @@ if __name__ == "__main__":
         ConnectivityChecker,
         PathOptimizer,
         WaypointCalculator,
-        SegmentBuilder
+        SegmentBuilder,
+        ArtworkPlacementStore
     )
+    get_audio_duration_model = None
+    get_occupancy_model = None
 else:
     from .models import MuseumGraphV2
     from .services import (
@@ -29,99 +32,77 @@ else:
         ConnectivityChecker,
         PathOptimizer,
         WaypointCalculator,
-        SegmentBuilder
+        SegmentBuilder,
+        ArtworkPlacementStore
     )
+    from ..core.audio_durations import get_audio_duration_model
+    from ..core.occupancy import get_occupancy_model
 
 
-def generate_parcours_v3(
-    profile: Dict, 
-    target_duration_min: int = 30, 
-    seed: int = None,
-    accessible_only: bool = False  # Si True, n'utilise que les ascenseurs (PMR)
-) -> Dict:
-    """
-    Génère un parcours personnalisé avec architecture modulaire
-    
-    Args:
-        profile: Critères utilisateur {age, thematique, style_texte}
-        target_duration_min: Durée cible en minutes
-        seed: Seed pour reproductibilité (optionnel)
-    
-    Returns:
-        Parcours complet avec artworks, waypoints, segments
-    """
-    
-    # Connexion DB (support Docker et local)
-    db_config = {
+def _db_config() -> Dict:
+    """Connexion DB (support Docker et local)"""
+    return {
         'host': os.getenv('DB_HOST', 'localhost'),
         'port': int(os.getenv('DB_PORT', 5432)),
         'database': os.getenv('DB_NAME', 'museumvoice'),
         'user': os.getenv('DB_USER', 'museum_admin'),
         'password': os.getenv('DB_PASSWORD', 'museum_password')
     }
-    
-    conn = psycopg2.connect(**db_config)
-    
-    try:
+
+
+class ParcoursContext:
+    """
+    Instantané du musée pour une génération: graphe, services et données fixes
+    (entrée, noms d'étages). Partagé par tous les parcours d'un lot: le graphe,
+    le planificateur et le cache d'itinéraires ne sont construits qu'une fois.
+    """
+
+    def __init__(self, conn, accessible_only: bool = False):
+        self.conn = conn
+
         # 1. Charger graphe du musée
         print("📐 Chargement structure du musée...")
-        graph = MuseumGraphV2(conn)
-        
+        self.graph = MuseumGraphV2(conn)
+
         # Stats détaillées
-        escaliers_count = sum(1 for s in graph.stairways if s.vertical_type == 'stairs')
-        ascenseurs_count = sum(1 for s in graph.stairways if s.vertical_type == 'elevator')
-        
-        print(f"   ✓ {len(graph.rooms)} salles, {len(graph.doors)} portes")
+        escaliers_count = sum(1 for s in self.graph.stairways if s.vertical_type == 'stairs')
+        ascenseurs_count = sum(1 for s in self.graph.stairways if s.vertical_type == 'elevator')
+
+        print(f"   ✓ {len(self.graph.rooms)} salles, {len(self.graph.doors)} portes")
         print(f"   ✓ {escaliers_count} escaliers, {ascenseurs_count} ascenseurs")
-        
+
+        # Placements des œuvres (recalculés seulement si le plan a été réenregistré)
+        placements_ready = ArtworkPlacementStore(conn).ensure_fresh(self.graph)
+
         # 2. Initialiser services
-        connectivity_checker = ConnectivityChecker(graph, accessible_only=accessible_only)
-        artwork_selector = ArtworkSelector(conn, graph, connectivity_checker)
-        path_optimizer = PathOptimizer(connectivity_checker)
-        waypoint_calculator = WaypointCalculator(connectivity_checker)
-        segment_builder = SegmentBuilder(connectivity_checker)
-        
-        # 3. Sélection œuvres selon profil et durée
-        print(f"🎨 Sélection œuvres (durée: {target_duration_min} min)...")
-        artworks = artwork_selector.select_artworks(profile, target_duration_min, seed)
-        print(f"   ✓ {len(artworks)} œuvres sélectionnées")
-        
-        if not artworks:
-            return {
-                'success': False,
-                'error': 'Aucune œuvre trouvée pour ce profil'
-            }
-        
-        # 4. Vérification accessibilité
-        print("🔍 Vérification accessibilité...")
-        inaccessible = connectivity_checker.check_accessibility(artworks)
-        if inaccessible:
-            print(f"   ⚠️ Œuvres inaccessibles: {[a.title for a in inaccessible]}")
-            artworks = [a for a in artworks if a not in inaccessible]
-        
-        # 5. Optimisation parcours (TSP avec variété)
-        print("🔀 Optimisation parcours...")
-        optimized_artworks = path_optimizer.optimize_path(artworks, strategy='variety_tsp')
-        print(f"   ✓ Parcours optimisé")
-        
-        # Affichage debug
-        print("\n📋 PARCOURS FINAL:")
-        for i, art in enumerate(optimized_artworks):
-            print(f"   {i+1}. {art.title} - Salle {art.position.room} (Étage {art.position.floor})")
-        
-        # 6. Calcul waypoints
-        print("\n🗺️ Calcul waypoints...")
-        waypoints = waypoint_calculator.calculate_waypoints(optimized_artworks)
-        print(f"   ✓ {len(waypoints)} waypoints générés")
-        
-        # 6.5 Récupérer l'entrée du musée
+        self.connectivity_checker = ConnectivityChecker(self.graph, accessible_only=accessible_only)
+        duration_model = get_audio_duration_model() if get_audio_duration_model else None
+        self.artwork_selector = ArtworkSelector(
+            conn, self.graph, self.connectivity_checker,
+            use_placements=placements_ready, duration_model=duration_model
+        )
+        self.path_optimizer = PathOptimizer(self.connectivity_checker)
+        self.waypoint_calculator = WaypointCalculator(self.connectivity_checker)
+        self.segment_builder = SegmentBuilder(self.connectivity_checker)
+
+        self.entrance = self._load_entrance()
+        self.floor_names = self._load_floor_names()
+
+        # Affluence des visiteurs actifs (instantané partagé par le lot)
+        occupancy_model = get_occupancy_model() if get_occupancy_model else None
+        self.occupancy = occupancy_model.forecast() if occupancy_model and occupancy_model.enabled else None
+        if self.occupancy:
+            print(f"   👥 Affluence: {self.occupancy.visitors} visiteurs actifs")
+
+    def _load_entrance(self) -> Optional[Dict]:
+        """Entrée active du musée (départ des segments)"""
         entrance = None
-        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur = self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
         cur.execute("""
             SELECT entrance_id, plan_id as floor, name, x, y
-            FROM museum_entrances 
-            WHERE is_active = true 
-            ORDER BY entrance_id 
+            FROM museum_entrances
+            WHERE is_active = true
+            ORDER BY entrance_id
             LIMIT 1
         """)
         entrance_row = cur.fetchone()
@@ -137,130 +118,342 @@ def generate_parcours_v3(
         else:
             print("   ⚠️ Aucune entrée définie dans le musée")
         cur.close()
-        
-        # 7. Construction segments (avec entrée)
-        print("📏 Construction segments...")
-        segments = segment_builder.build_segments(optimized_artworks, entrance=entrance)
-        print(f"   ✓ {len(segments)} segments créés")
-        
-        # 8. Calcul métriques finales
-        total_distance = path_optimizer.calculate_total_distance(optimized_artworks)
-        estimated_duration = path_optimizer.estimate_duration(optimized_artworks)
-        
-        # Décomposition des temps (pour metadata.duration_breakdown)
-        walk_time = path_optimizer.estimate_walk_time(optimized_artworks)
-        narration_time_seconds = sum(a.narration_duration for a in optimized_artworks)
-        narration_time_min = narration_time_seconds / 60
-        observation_time = len(optimized_artworks) * 2.0  # 2 minutes par œuvre
-        
-        floors_visited = sorted(set(a.position.floor for a in optimized_artworks))
-        
-        print(f"\n✅ PARCOURS GÉNÉRÉ:")
-        print(f"   Œuvres: {len(optimized_artworks)}")
-        print(f"   Distance totale: {total_distance:.1f}m")
-        print(f"   Étages: {floors_visited}")
-        
-        print(f"\n📊 DURÉE ESTIMÉE (avant génération audio):")
-        print(f"   🎤 Narration (estimation WPM): {narration_time_min:.2f} min ({narration_time_seconds:.1f}s)")
-        print(f"   🚶 Marche (0.8 m/s): {walk_time:.2f} min")
-        print(f"   👁️ Observation (2 min/œuvre): {observation_time:.2f} min")
-        print(f"   ⏱️ TOTAL: {estimated_duration:.2f} min ({estimated_duration/60:.1f}h)")
-        
-        # Charger les noms d'étages depuis plans
+        return entrance
+
+    def _load_floor_names(self) -> Dict[int, str]:
+        """Noms d'étages depuis plans (index d'étage → nom)"""
         floor_names = {}
-        cur = conn.cursor()
+        cur = self.conn.cursor()
         cur.execute("SELECT plan_id, nom FROM plans ORDER BY plan_id")
         for idx, row in enumerate(cur.fetchall()):
             floor_names[idx] = row[1] or f"Étage {idx}"
         cur.close()
-        
-        # 9. Construire résultat (format compatible V2)
-        # Les temps sont déjà calculés ci-dessus (walk_time, narration_time_min, observation_time)
-        
-        # Comptage
-        rooms_visited = len(set(a.position.room for a in optimized_artworks))
-        floor_changes = sum(1 for i in range(len(optimized_artworks) - 1) 
-                           if optimized_artworks[i].position.floor != optimized_artworks[i+1].position.floor)
-        
-        # Format artworks avec distances
-        artworks_with_distances = []
-        for idx, a in enumerate(optimized_artworks):
-            distance_to_next = 0
-            if idx < len(optimized_artworks) - 1:
-                next_artwork = optimized_artworks[idx + 1]
-                # Utiliser le chemin réel via BFS (inclut les coûts des escaliers/ascenseurs)
-                distance_to_next, _ = connectivity_checker.calculate_path_between_points(
-                    a.position, next_artwork.position
-                )
-            
-            # Construire l'URL de l'image (chemin relatif → URL complète)
-            image_path = getattr(a, 'image_link', '') or ''
-            if image_path and not image_path.startswith('http'):
-                # Chemin relatif: préfixer avec /uploads/ si nécessaire
-                if not image_path.startswith('/uploads'):
-                    image_path = f'/uploads/{image_path.lstrip("/")}'
-            if not image_path:
-                image_path = '/placeholder.svg'
-            
-            artworks_with_distances.append({
-                'order': idx + 1,
-                'oeuvre_id': a.oeuvre_id,
-                'title': a.title,
-                'artist': a.artist,
-                'date': getattr(a, 'date_oeuvre', ''),
-                'materiaux_technique': getattr(a, 'materiaux_technique', ''),
-                'artwork_type': a.artwork_type,
-                'narration': a.narration,
-                'narration_word_count': int(a.narration_duration / 0.5),
-                'narration_duration': a.narration_duration,
-                'distance_to_next': distance_to_next / 0.8 / 60,  # mètres → minutes (vitesse 0.8 m/s)
-                'image_url': image_path,  # Pour compatibilité
-                'image_link': image_path,  # Pour client React (Resume.jsx utilise image_link)
-                'position': {
-                    'x': a.position.x,
-                    'y': a.position.y,
-                    'room': a.position.room,
-                    'floor': a.position.floor,
-                    'floor_name': floor_names.get(a.position.floor, f'Étage {a.position.floor}')
-                }
-            })
-        
-        result = {
-            'parcours_id': f"{seed}_{profile.get('age', 0)}_{profile.get('thematique', 0)}_{profile.get('style_texte', 0)}",
-            'profile': profile,
-            'duration_target': target_duration_min,
-            'duration_estimated': estimated_duration,
-            'artworks': artworks_with_distances,
-            'entrance': entrance,  # Point d'entrée du musée
-            'waypoints': waypoints,
-            'path_segments': segments,
+        return floor_names
+
+
+def _assemble_parcours(
+    ctx: ParcoursContext,
+    profile: Dict,
+    target_duration_min: int,
+    seed: Optional[int],
+    variation_seed: int,
+    rng: random.Random,
+    artworks: List,
+    occupancy=None,
+    balanced: bool = False
+) -> Dict:
+    """
+    Ordonne les œuvres sélectionnées et construit le parcours complet
+    (balanced: sélection pénalisée par les autres parcours d'un lot)
+    """
+    connectivity_checker = ctx.connectivity_checker
+    path_optimizer = ctx.path_optimizer
+    # Compteurs cumulés du contexte (partagé par un lot): on rapporte l'écart de ce parcours
+    route_cache_before = connectivity_checker.get_route_cache_stats()
+
+    # 4. Vérification accessibilité
+    print("🔍 Vérification accessibilité...")
+    inaccessible = connectivity_checker.check_accessibility(artworks)
+    if inaccessible:
+        print(f"   ⚠️ Œuvres inaccessibles: {[a.title for a in inaccessible]}")
+        artworks = [a for a in artworks if a not in inaccessible]
+
+    # 5. Optimisation parcours (TSP avec variété)
+    print("🔀 Optimisation parcours...")
+    optimized_artworks = path_optimizer.optimize_path(artworks, strategy='variety_tsp', rng=rng, occupancy=occupancy)
+    optimized_artworks, search_report = path_optimizer.improve_path(optimized_artworks, rng=rng)
+    print(f"   ✓ Parcours optimisé (2-opt/Or-opt: {search_report['distance_before']:.1f}m → "
+          f"{search_report['distance_after']:.1f}m, {search_report['moves']} mouvements, "
+          f"{search_report['elapsed_ms']:.0f}ms)")
+
+    # Affichage debug
+    print("\n📋 PARCOURS FINAL:")
+    for i, art in enumerate(optimized_artworks):
+        print(f"   {i+1}. {art.title} - Salle {art.position.room} (Étage {art.position.floor})")
+
+    # 6. Calcul waypoints
+    print("\n🗺️ Calcul waypoints...")
+    waypoints = ctx.waypoint_calculator.calculate_waypoints(optimized_artworks)
+    print(f"   ✓ {len(waypoints)} waypoints générés")
+
+    # 7. Construction segments (avec entrée)
+    entrance = ctx.entrance
+    print("📏 Construction segments...")
+    segments = ctx.segment_builder.build_segments(optimized_artworks, entrance=entrance)
+    print(f"   ✓ {len(segments)} segments créés")
+
+    # 8. Calcul métriques finales
+    total_distance = path_optimizer.calculate_total_distance(optimized_artworks)
+    estimated_duration = path_optimizer.estimate_duration(optimized_artworks)
+
+    # Décomposition des temps (pour metadata.duration_breakdown)
+    walk_time = path_optimizer.estimate_walk_time(optimized_artworks)
+    narration_time_seconds = sum(a.narration_duration for a in optimized_artworks)
+    narration_time_min = narration_time_seconds / 60
+    observation_time = len(optimized_artworks) * 2.0  # 2 minutes par œuvre
+
+    floors_visited = sorted(set(a.position.floor for a in optimized_artworks))
+
+    print(f"\n✅ PARCOURS GÉNÉRÉ:")
+    print(f"   Œuvres: {len(optimized_artworks)}")
+    print(f"   Distance totale: {total_distance:.1f}m")
+    print(f"   Étages: {floors_visited}")
+
+    print(f"\n📊 DURÉE ESTIMÉE (avant génération audio):")
+    print(f"   🎤 Narration (mesurée/prédite): {narration_time_min:.2f} min ({narration_time_seconds:.1f}s)")
+    print(f"   🚶 Marche (0.8 m/s): {walk_time:.2f} min")
+    print(f"   👁️ Observation (2 min/œuvre): {observation_time:.2f} min")
+    print(f"   ⏱️ TOTAL: {estimated_duration:.2f} min ({estimated_duration/60:.1f}h)")
+
+    floor_names = ctx.floor_names
+
+    # 9. Construire résultat (format compatible V2)
+    # Les temps sont déjà calculés ci-dessus (walk_time, narration_time_min, observation_time)
+
+    # Comptage
+    rooms_visited = len(set(a.position.room for a in optimized_artworks))
+    floor_changes = sum(1 for i in range(len(optimized_artworks) - 1)
+                       if optimized_artworks[i].position.floor != optimized_artworks[i+1].position.floor)
+
+    # Format artworks avec distances
+    artworks_with_distances = []
+    for idx, a in enumerate(optimized_artworks):
+        distance_to_next = 0
+        if idx < len(optimized_artworks) - 1:
+            next_artwork = optimized_artworks[idx + 1]
+            # Utiliser le chemin réel via BFS (inclut les coûts des escaliers/ascenseurs)
+            distance_to_next, _ = connectivity_checker.calculate_path_between_points(
+                a.position, next_artwork.position
+            )
+
+        # Construire l'URL de l'image (chemin relatif → URL complète)
+        image_path = getattr(a, 'image_link', '') or ''
+        if image_path and not image_path.startswith('http'):
+            # Chemin relatif: préfixer avec /uploads/ si nécessaire
+            if not image_path.startswith('/uploads'):
+                image_path = f'/uploads/{image_path.lstrip("/")}'
+        if not image_path:
+            image_path = '/placeholder.svg'
+
+        artworks_with_distances.append({
+            'order': idx + 1,
+            'oeuvre_id': a.oeuvre_id,
+            'title': a.title,
+            'artist': a.artist,
+            'date': getattr(a, 'date_oeuvre', ''),
+            'materiaux_technique': getattr(a, 'materiaux_technique', ''),
+            'artwork_type': a.artwork_type,
+            'narration': a.narration,
+            'narration_word_count': int(a.narration_duration / 0.5),
+            'narration_duration': a.narration_duration,
+            'distance_to_next': distance_to_next / 0.8 / 60,  # mètres → minutes (vitesse 0.8 m/s)
+            'image_url': image_path,  # Pour compatibilité
+            'image_link': image_path,  # Pour client React (Resume.jsx utilise image_link)
+            'position': {
+                'x': a.position.x,
+                'y': a.position.y,
+                'room': a.position.room,
+                'floor': a.position.floor,
+                'floor_name': floor_names.get(a.position.floor, f'Étage {a.position.floor}')
+            }
+        })
+
+    route_cache_after = connectivity_checker.get_route_cache_stats()
+    hits = route_cache_after['hits'] - route_cache_before['hits']
+    misses = route_cache_after['misses'] - route_cache_before['misses']
+    route_cache_stats = {
+        'hits': hits,
+        'misses': misses,
+        'entries': route_cache_after['entries'],
+        'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None
+    }
+    print(f"   🧭 Cache itinéraires: {route_cache_stats['hits']} hits / {route_cache_stats['misses']} calculs")
+
+    return {
+        'parcours_id': f"{variation_seed}_{profile.get('age', 0)}_{profile.get('thematique', 0)}_{profile.get('style_texte', 0)}",
+        'profile': profile,
+        'duration_target': target_duration_min,
+        'duration_estimated': estimated_duration,
+        'artworks': artworks_with_distances,
+        'entrance': entrance,  # Point d'entrée du musée
+        'waypoints': waypoints,
+        'path_segments': segments,
+        'total_distance': total_distance,
+        'walk_time': walk_time,
+        'narration_time': narration_time_min,
+        'observation_time': observation_time,
+        'floors_visited': floors_visited,
+        'rooms_visited': rooms_visited,
+        'floor_changes': floor_changes,
+        'metadata': {
+            'total_artworks': len(optimized_artworks),
             'total_distance': total_distance,
-            'walk_time': walk_time,
-            'narration_time': narration_time_min,
-            'observation_time': observation_time,
-            'floors_visited': floors_visited,
+            'floors_visited': len(floors_visited),
             'rooms_visited': rooms_visited,
             'floor_changes': floor_changes,
-            'metadata': {
-                'total_artworks': len(optimized_artworks),
-                'total_distance': total_distance,
-                'floors_visited': len(floors_visited),
-                'rooms_visited': rooms_visited,
-                'floor_changes': floor_changes,
-                'floor_distribution': dict((f, sum(1 for a in optimized_artworks if a.position.floor == f)) for f in floors_visited),
-                'floors_list': floors_visited,
-                'duration_breakdown': {
-                    'total_minutes': estimated_duration,
-                    'walking_minutes': walk_time,
-                    'narration_minutes': narration_time_min,
-                    'observation_minutes': observation_time
-                },
-                'unique_parcours_id': seed if seed else int(time.time() * 1000)  # ID unique pour stockage audio
+            'floor_distribution': dict((f, sum(1 for a in optimized_artworks if a.position.floor == f)) for f in floors_visited),
+            'floors_list': floors_visited,
+            'duration_breakdown': {
+                'total_minutes': estimated_duration,
+                'walking_minutes': walk_time,
+                'narration_minutes': narration_time_min,
+                'observation_minutes': observation_time
+            },
+            # ID du dossier audio: aléatoire sans seed imposé (un horodatage ms collisionne entre
+            # workers), < 2**53 pour rester exact côté JavaScript (link-session)
+            'unique_parcours_id': seed if seed is not None else random.SystemRandom().randrange(1, 2 ** 53),
+            'variation_seed': variation_seed,
+            # Le seed seul ne rejoue le parcours à l'identique que si ni l'affluence
+            # ni l'équilibrage d'un lot n'ont orienté la sélection (entrées non rejouées)
+            'replayable': not (occupancy or balanced),
+            'route_cache': route_cache_stats,
+            'path_optimization': search_report,
+            'crowding': {
+                'applied': bool(occupancy),
+                'active_visitors': occupancy.visitors if occupancy is not None else 0,
+                'batch_balanced': balanced
             }
         }
-        
-        return result
-        
+    }
+
+
+def generate_parcours_v3(
+    profile: Dict,
+    target_duration_min: int = 30,
+    seed: int = None,
+    accessible_only: bool = False  # Si True, n'utilise que les ascenseurs (PMR)
+) -> Dict:
+    """
+    Génère un parcours personnalisé avec architecture modulaire
+
+    Args:
+        profile: Critères utilisateur {age, thematique, style_texte}
+        target_duration_min: Durée cible en minutes
+        seed: Seed pour reproductibilité (optionnel, tiré et renvoyé si absent)
+
+    Returns:
+        Parcours complet avec artworks, waypoints, segments
+    """
+
+    # Générateur aléatoire propre à la requête: le parcours ne dépend que de
+    # (profil, durée, seed, version du graphe) et n'interfère pas avec les requêtes concurrentes
+    variation_seed = seed if seed is not None else random.SystemRandom().randrange(2 ** 31)
+    rng = random.Random(variation_seed)
+
+    conn = psycopg2.connect(**_db_config())
+
+    try:
+        ctx = ParcoursContext(conn, accessible_only=accessible_only)
+
+        # Affluence appliquée seulement sans seed imposé (un seed rejoue le parcours à l'identique)
+        occupancy = ctx.occupancy if seed is None else None
+
+        # 3. Sélection œuvres selon profil et durée
+        print(f"🎨 Sélection œuvres (durée: {target_duration_min} min)...")
+        candidates = ctx.artwork_selector.load_candidates(profile)
+        crowding = occupancy.artwork_loads(candidates, target_duration_min) if occupancy else None
+        artworks = ctx.artwork_selector.select_artworks(
+            profile, target_duration_min, variation_seed, rng=rng,
+            candidates=candidates, crowding=crowding
+        )
+        print(f"   ✓ {len(artworks)} œuvres sélectionnées")
+
+        if not artworks:
+            return {
+                'success': False,
+                'error': 'Aucune œuvre trouvée pour ce profil'
+            }
+
+        return _assemble_parcours(ctx, profile, target_duration_min, seed, variation_seed, rng, artworks, occupancy)
+
+    finally:
+        conn.close()
+
+
+def generate_parcours_batch_v3(
+    requests: List[Dict],
+    accessible_only: bool = False,
+    balance_crowding: bool = False
+) -> List[Dict]:
+    """
+    Génère les parcours d'un groupe en une fois
+
+    Le graphe, les candidats par profil et le cache d'itinéraires sont chargés
+    une seule fois pour tout le lot. Sélection puis assemblage sont
+    séquentiels: la sélection tient compte des parcours déjà choisis, et
+    l'assemblage (calcul Python, lié au GIL) réutilise sans verrou le cache
+    d'itinéraires rempli par les parcours précédents. L'affluence des
+    visiteurs actifs s'applique aux requêtes sans seed.
+
+    Args:
+        requests: [{profile, target_duration_min, seed?}, ...]
+        accessible_only: Ascenseurs uniquement (PMR) pour tout le groupe
+        balance_crowding: Pénalise les œuvres déjà retenues par les parcours précédents du lot
+
+    Returns:
+        Un résultat par requête, dans l'ordre (parcours ou {'success': False, 'error'})
+    """
+    # Seeds distinctes pour les requêtes sans seed: chaque parcours du lot a
+    # son propre dossier audio (unique_parcours_id = seed)
+    system_random = random.SystemRandom()
+    used_seeds = {r['seed'] for r in requests if r.get('seed') is not None}
+    seeds = []
+    for r in requests:
+        seed = r.get('seed')
+        while seed is None or (r.get('seed') is None and seed in used_seeds):
+            seed = system_random.randrange(1, 2 ** 31)
+        used_seeds.add(seed)
+        seeds.append(seed)
+
+    conn = psycopg2.connect(**_db_config())
+
+    try:
+        ctx = ParcoursContext(conn, accessible_only=accessible_only)
+
+        # Candidats chargés une fois par profil distinct
+        candidates_by_profile = {}
+        crowding: Dict[int, float] = {}
+        jobs = []
+        print(f"🎨 Sélection œuvres pour un lot de {len(requests)} parcours...")
+        for r, seed in zip(requests, seeds):
+            profile = r['profile']
+            profile_key = tuple(sorted(profile.items()))
+            if profile_key not in candidates_by_profile:
+                candidates_by_profile[profile_key] = ctx.artwork_selector.load_candidates(profile)
+            candidates = candidates_by_profile[profile_key]
+
+            occupancy = ctx.occupancy if r.get('seed') is None else None
+            request_crowding = dict(crowding) if balance_crowding else {}
+            if occupancy:
+                for oeuvre_id, load in occupancy.artwork_loads(candidates, r['target_duration_min']).items():
+                    request_crowding[oeuvre_id] = request_crowding.get(oeuvre_id, 0.0) + load
+
+            rng = random.Random(seed)
+            artworks = ctx.artwork_selector.select_artworks(
+                profile, r['target_duration_min'], seed, rng=rng,
+                candidates=candidates, crowding=request_crowding or None
+            )
+            balanced = balance_crowding and bool(crowding)
+            if balance_crowding:
+                for a in artworks:
+                    crowding[a.oeuvre_id] = crowding.get(a.oeuvre_id, 0.0) + 1.0
+            jobs.append((profile, r['target_duration_min'], seed, rng, artworks, occupancy, balanced))
+        print(f"   ✓ {len(candidates_by_profile)} profils distincts, "
+              f"{sum(len(job[4]) for job in jobs)} œuvres sélectionnées")
+
+        def assemble(job):
+            profile, target_duration_min, seed, rng, artworks, occupancy, balanced = job
+            if not artworks:
+                return {
+                    'success': False,
+                    'error': 'Aucune œuvre trouvée pour ce profil'
+                }
+            return _assemble_parcours(ctx, profile, target_duration_min, seed, seed, rng, artworks, occupancy, balanced)
+
+        # Les services partagent le cache d'itinéraires: chaque paire de salles
+        # n'est calculée qu'une fois pour tout le groupe
+        return [assemble(job) for job in jobs]
+
     finally:
         conn.close()
 
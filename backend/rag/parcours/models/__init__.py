@@ -4,6 +4,8 @@ Models pour le système de génération de parcours
 
 from .artwork import Artwork, Position
 from .museum_graph import MuseumGraphV2, Door, Stairway
+from .spatial_index import RoomSpatialIndex
+from .wall_index import SharedWallIndex
 from .path import PathSegment, Waypoint
 
 __all__ = [
@@ -12,6 +14,8 @@ __all__ = [
     'MuseumGraphV2',
     'Door',
     'Stairway',
+    'RoomSpatialIndex',
+    'SharedWallIndex',
     'PathSegment',
     'Waypoint'
 ]
@@ -7,6 +7,9 @@ from typing import List, Dict, Tuple
 import json
 import psycopg2
 
+from .spatial_index import RoomSpatialIndex
+from .wall_index import SharedWallIndex
+
 
 @dataclass
 class Door:
@@ -43,7 +46,20 @@ class MuseumGraphV2:
         self.rooms: Dict[int, Dict] = {}
         self.doors: List[Door] = []
         self.stairways: List[Stairway] = []
+        self.plan_to_floor: Dict[int, int] = {}
+        self.spatial_index: RoomSpatialIndex = None
+        self.wall_index: SharedWallIndex = None
+        # Index d'adjacence (construits après chargement, parcours en O(degré))
+        self.doors_by_room: Dict[int, List[Door]] = {}
+        self.door_by_pair: Dict[Tuple[int, int, int], Door] = {}
+        self.vertical_links_by_room: Dict[Tuple[int, int], List[Tuple[Stairway, bool]]] = {}
+        self.stairways_by_floor: Dict[int, List[Stairway]] = {}
+        # Planificateurs d'itinéraires par mode d'accessibilité (services.route_planner)
+        self.route_planners: Dict[bool, object] = {}
+        # Composantes connexes des salles par mode (True = ascenseurs uniquement)
+        self._room_components: Dict[bool, Dict[int, int]] = {}
         self._load_museum_structure()
+        self._build_adjacency()
     
     def _load_museum_structure(self):
         """Charge salles, portes et escaliers depuis la DB"""
@@ -54,6 +70,7 @@ class MuseumGraphV2:
         plan_to_floor = {}
         for idx, row in enumerate(cur.fetchall()):
             plan_to_floor[row['plan_id']] = idx
+        self.plan_to_floor = plan_to_floor
         
         # Charger salles et créer mapping UUID→entity_id
         cur.execute("""
@@ -87,6 +104,11 @@ class MuseumGraphV2:
                 except Exception:
                     pass
         
+        # Index spatial des salles (localisation portes, liens verticaux, œuvres)
+        self.spatial_index = RoomSpatialIndex(self.rooms)
+        # Murs partagés entre salles (validation des portes par recherche)
+        self.wall_index = SharedWallIndex(self.rooms)
+        
         # Charger portes depuis les entités DOOR (positions réelles dessinées sur le plan)
         cur.execute("""
             SELECT e.entity_id, e.plan_id, e.description,
@@ -150,10 +172,7 @@ class MuseumGraphV2:
 
             # Fallback: si pas d'ID de salles dans la description, tenter de déduire via la position
             if (room_a is None or room_b is None) and center_x is not None and center_y is not None:
-                candidate_rooms = [
-                    room_id for room_id, room in self.rooms.items()
-                    if room['floor'] == floor and self._point_in_polygon(center_x, center_y, room['polygon'])
-                ]
+                candidate_rooms = self.spatial_index.locate_all(center_x, center_y, floor)
                 if len(candidate_rooms) >= 2:
                     room_a, room_b = candidate_rooms[0], candidate_rooms[1]
                     print(f"  ℹ️  Porte {row['entity_id']}: salles déduites par position → {room_a}, {room_b}")
@@ -302,10 +321,14 @@ class MuseumGraphV2:
     
     def _find_room_containing_point(self, x: float, y: float, floor: int) -> int:
         """Trouve la salle contenant un point. Retourne None si aucune salle ne contient le point."""
-        for room_id, room in self.rooms.items():
-            if room['floor'] == floor and self._point_in_polygon(x, y, room['polygon']):
-                return room_id
-        return None
+        return self.spatial_index.locate(x, y, floor)
+    
+    def locate_points(self, points: List[Tuple[float, float, int]]) -> List[int]:
+        """Localise un lot de points (x, y, étage) → salle ou None (vectorisé)"""
+        if not points:
+            return []
+        xs, ys, floors = zip(*points)
+        return self.spatial_index.locate_batch(xs, ys, floors)
     
     def _point_in_polygon(self, x: float, y: float, polygon: List[Tuple[float, float]]) -> bool:
         """Test si un point est dans un polygone (ray casting)"""
@@ -328,85 +351,86 @@ class MuseumGraphV2:
 
     def _rooms_are_adjacent(self, room_a: int, room_b: int, tol: float = 2.0, min_overlap: float = 20.0) -> bool:
         """Vérifie si deux salles partagent un bord (adjacentes) avec une tolérance."""
-        poly_a = self.rooms.get(room_a, {}).get('polygon') or []
-        poly_b = self.rooms.get(room_b, {}).get('polygon') or []
-        if len(poly_a) < 2 or len(poly_b) < 2:
-            return False
-
-        def edges(poly):
-            return list(zip(poly, poly[1:] + poly[:1]))
-
-        def points_close(p, q, t):
-            return abs(p[0] - q[0]) <= t and abs(p[1] - q[1]) <= t
-
-        # Vérifier si au moins une paire d'arêtes est colinéaire et se chevauche (avec tolérance)
-        for (a1, a2) in edges(poly_a):
-            for (b1, b2) in edges(poly_b):
-                # Cas segments horizontaux
-                if abs(a1[1] - a2[1]) <= tol and abs(b1[1] - b2[1]) <= tol and abs(a1[1] - b1[1]) <= tol:
-                    min_ax, max_ax = sorted([a1[0], a2[0]])
-                    min_bx, max_bx = sorted([b1[0], b2[0]])
-                    overlap = min(max_ax, max_bx) - max(min_ax, min_bx)
-                    if overlap + tol >= min_overlap:
-                        return True
-                # Cas segments verticaux
-                if abs(a1[0] - a2[0]) <= tol and abs(b1[0] - b2[0]) <= tol and abs(a1[0] - b1[0]) <= tol:
-                    min_ay, max_ay = sorted([a1[1], a2[1]])
-                    min_by, max_by = sorted([b1[1], b2[1]])
-                    overlap = min(max_ay, max_by) - max(min_ay, min_by)
-                    if overlap + tol >= min_overlap:
-                        return True
-        return False
+        return self.wall_index.are_adjacent(room_a, room_b, tol=tol, min_overlap=min_overlap)
 
     def _door_on_shared_wall(self, room_a: int, room_b: int, x: float, y: float, tol: float = 10.0, min_overlap: float = 20.0) -> bool:
         """Vérifie que (x,y) est sur une arête partagée des deux salles (au sein d'une tolérance)."""
-        poly_a = self.rooms.get(room_a, {}).get('polygon') or []
-        poly_b = self.rooms.get(room_b, {}).get('polygon') or []
-        if len(poly_a) < 2 or len(poly_b) < 2:
-            return False
-
-        def edges(poly):
-            return list(zip(poly, poly[1] + poly[:1])) if isinstance(poly, list) else []
-
-        # Check horizontals and verticals overlaps and point proximity to the shared segment
-        for (a1, a2) in zip(poly_a, poly_a[1:] + poly_a[:1]):
-            for (b1, b2) in zip(poly_b, poly_b[1:] + poly_b[:1]):
-                # Horizontal shared
-                if abs(a1[1] - a2[1]) <= 2.0 and abs(b1[1] - b2[1]) <= 2.0 and abs(a1[1] - b1[1]) <= 2.0:
-                    y_line = (a1[1] + a2[1] + b1[1] + b2[1]) / 4.0
-                    min_ax, max_ax = sorted([a1[0], a2[0]])
-                    min_bx, max_bx = sorted([b1[0], b2[0]])
-                    overlap_min = max(min_ax, min_bx)
-                    overlap_max = min(max_ax, max_bx)
-                    if overlap_max - overlap_min >= min_overlap:
-                        # Check point proximity to shared segment
-                        if abs(y - y_line) <= tol and (overlap_min - tol) <= x <= (overlap_max + tol):
-                            return True
-                # Vertical shared
-                if abs(a1[0] - a2[0]) <= 2.0 and abs(b1[0] - b2[0]) <= 2.0 and abs(a1[0] - b1[0]) <= 2.0:
-                    x_line = (a1[0] + a2[0] + b1[0] + b2[0]) / 4.0
-                    min_ay, max_ay = sorted([a1[1], a2[1]])
-                    min_by, max_by = sorted([b1[1], b2[1]])
-                    overlap_min = max(min_ay, min_by)
-                    overlap_max = min(max_ay, max_by)
-                    if overlap_max - overlap_min >= min_overlap:
-                        if abs(x - x_line) <= tol and (overlap_min - tol) <= y <= (overlap_max + tol):
-                            return True
-        return False
+        return self.wall_index.point_on_shared_wall(room_a, room_b, x, y, tol=tol, min_overlap=min_overlap)
+    
+    def _build_adjacency(self):
+        """Indexe portes et liens verticaux par salle / paire de salles / étage"""
+        self.doors_by_room = {}
+        self.door_by_pair = {}
+        for door in self.doors:
+            self.doors_by_room.setdefault(door.room_a, []).append(door)
+            if door.room_b != door.room_a:
+                self.doors_by_room.setdefault(door.room_b, []).append(door)
+            pair = (min(door.room_a, door.room_b), max(door.room_a, door.room_b), door.floor)
+            self.door_by_pair.setdefault(pair, door)  # première porte, comme le parcours linéaire
+        
+        # (salle, étage) → [(lien, sens montant)] dans l'ordre des stairways
+        self.vertical_links_by_room = {}
+        self.stairways_by_floor = {}
+        for stair in self.stairways:
+            key_from = (stair.room_id_from, stair.floor_from)
+            key_to = (stair.room_id_to, stair.floor_to)
+            self.vertical_links_by_room.setdefault(key_from, []).append((stair, True))
+            if key_to != key_from:
+                self.vertical_links_by_room.setdefault(key_to, []).append((stair, False))
+            self.stairways_by_floor.setdefault(stair.floor_from, []).append(stair)
+            if stair.floor_to != stair.floor_from:
+                self.stairways_by_floor.setdefault(stair.floor_to, []).append(stair)
+    
+    def room_components(self, accessible_only: bool = False) -> Dict[int, int]:
+        """
+        Étiquette de composante connexe de chaque salle (union-find, calculé une fois par mode)
+        
+        Connexions: portes + liens verticaux (ascenseurs uniquement si accessible_only).
+        Une salle sans porte ni lien forme sa propre composante.
+        """
+        labels = self._room_components.get(accessible_only)
+        if labels is not None:
+            return labels
+        
+        parent = {room_id: room_id for room_id in self.rooms}
+        
+        def find(room_id):
+            while parent[room_id] != room_id:
+                parent[room_id] = parent[parent[room_id]]
+                room_id = parent[room_id]
+            return room_id
+        
+        def union(a, b):
+            if a in parent and b in parent:
+                root_a, root_b = find(a), find(b)
+                if root_a != root_b:
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+        
+        for door in self.doors:
+            union(door.room_a, door.room_b)
+        for stair in self.stairways:
+            if accessible_only and stair.vertical_type != 'elevator':
+                continue
+            union(stair.room_id_from, stair.room_id_to)
+        
+        labels = {room_id: find(room_id) for room_id in self.rooms}
+        self._room_components[accessible_only] = labels
+        return labels
     
     def get_doors_for_room(self, room_id: int) -> List[Door]:
         """Retourne toutes les portes d'une salle"""
-        return [d for d in self.doors if d.room_a == room_id or d.room_b == room_id]
+        return self.doors_by_room.get(room_id, [])
     
     def get_direct_door(self, room_a: int, room_b: int, floor: int) -> Door:
         """Retourne la porte directe entre deux salles (ou None)"""
-        for door in self.doors:
-            if door.floor == floor:
-                if (door.room_a == room_a and door.room_b == room_b) or \
-                   (door.room_a == room_b and door.room_b == room_a):
-                    return door
-        return None
+        if room_a is None or room_b is None:
+            return None
+        return self.door_by_pair.get((min(room_a, room_b), max(room_a, room_b), floor))
+    
+    def get_vertical_links(self, room_id: int, floor: int) -> List[Tuple[Stairway, bool]]:
+        """Liens verticaux partant de (salle, étage): [(lien, True si sens from → to)]"""
+        return self.vertical_links_by_room.get((room_id, floor), [])
     
     def get_stairways_on_floor(self, floor: int) -> List[Stairway]:
         """Retourne les escaliers accessibles depuis un étage"""
-        return [s for s in self.stairways if s.floor_from == floor or s.floor_to == floor]
+        return self.stairways_by_floor.get(floor, [])
@@ -0,0 +1,158 @@
+"""
+Index spatial des salles : localisation d'un point (x, y, étage) → salle
+
+- Grille uniforme par étage : chaque cellule liste les salles dont la bbox la recouvre
+- Arêtes des polygones précalculées (pas de reconstruction à chaque requête)
+- API vectorisée (NumPy) pour localiser un lot de points en une passe
+
+Sémantique identique au parcours linéaire historique : si plusieurs salles
+contiennent le point, la première dans l'ordre de chargement l'emporte.
+"""
+
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class _IndexedRoom:
+    """Salle préparée pour l'index (bbox + arêtes)"""
+
+    __slots__ = ('room_id', 'order', 'bbox', 'edges', 'edge_array')
+
+    def __init__(self, room_id: int, order: int, polygon: List[Tuple[float, float]]):
+        self.room_id = room_id
+        self.order = order
+        xs = [p[0] for p in polygon]
+        ys = [p[1] for p in polygon]
+        self.bbox = (min(xs), min(ys), max(xs), max(ys))
+        # Arête (xi, yi, xj, yj) avec j = i - 1, comme le ray casting d'origine
+        self.edges = [
+            (polygon[i][0], polygon[i][1], polygon[i - 1][0], polygon[i - 1][1])
+            for i in range(len(polygon))
+        ]
+        self.edge_array = np.asarray(self.edges, dtype=np.float64)
+
+    def contains(self, x: float, y: float) -> bool:
+        min_x, min_y, max_x, max_y = self.bbox
+        if x < min_x or x > max_x or y < min_y or y > max_y:
+            return False
+        inside = False
+        for xi, yi, xj, yj in self.edges:
+            if ((yi > y) != (yj > y)) and (x < (xj - xi) * (y - yi) / (yj - yi) + xi):
+                inside = not inside
+        return inside
+
+    def contains_batch(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """Ray casting vectorisé sur un lot de points"""
+        min_x, min_y, max_x, max_y = self.bbox
+        inside = np.zeros(xs.shape, dtype=bool)
+        in_bbox = (xs >= min_x) & (xs <= max_x) & (ys >= min_y) & (ys <= max_y)
+        if not in_bbox.any():
+            return inside
+        px = xs[in_bbox]
+        py = ys[in_bbox]
+        toggles = np.zeros(px.shape, dtype=bool)
+        for xi, yi, xj, yj in self.edge_array:
+            crosses = (yi > py) != (yj > py)
+            if not crosses.any():
+                continue
+            with np.errstate(divide='ignore', invalid='ignore'):
+                x_cross = (xj - xi) * (py - yi) / (yj - yi) + xi
+            toggles ^= crosses & (px < x_cross)
+        inside[in_bbox] = toggles
+        return inside
+
+
+class _FloorGrid:
+    """Grille uniforme des salles d'un étage"""
+
+    def __init__(self, rooms: List[_IndexedRoom]):
+        self.rooms = rooms  # ordre de chargement
+        self.origin_x = min(r.bbox[0] for r in rooms)
+        self.origin_y = min(r.bbox[1] for r in rooms)
+        width = max(r.bbox[2] for r in rooms) - self.origin_x
+        height = max(r.bbox[3] for r in rooms) - self.origin_y
+        # ~1 salle par cellule en moyenne
+        side = math.sqrt(max(width * height, 1.0) / len(rooms))
+        self.cell_size = max(side, 1.0)
+        self.cells: Dict[Tuple[int, int], List[_IndexedRoom]] = {}
+        for room in rooms:
+            min_x, min_y, max_x, max_y = room.bbox
+            cx0, cy0 = self._cell(min_x, min_y)
+            cx1, cy1 = self._cell(max_x, max_y)
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    self.cells.setdefault((cx, cy), []).append(room)
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return (int(math.floor((x - self.origin_x) / self.cell_size)),
+                int(math.floor((y - self.origin_y) / self.cell_size)))
+
+    def candidates(self, x: float, y: float) -> List[_IndexedRoom]:
+        return self.cells.get(self._cell(x, y), [])
+
+
+class RoomSpatialIndex:
+    """Index point → salle, par étage"""
+
+    def __init__(self, rooms: Dict[int, Dict]):
+        by_floor: Dict[int, List[_IndexedRoom]] = {}
+        for order, (room_id, room) in enumerate(rooms.items()):
+            polygon = room.get('polygon') or []
+            if len(polygon) < 3:
+                continue
+            by_floor.setdefault(room['floor'], []).append(_IndexedRoom(room_id, order, polygon))
+        self._floors: Dict[int, _FloorGrid] = {
+            floor: _FloorGrid(floor_rooms) for floor, floor_rooms in by_floor.items()
+        }
+
+    def locate(self, x: Optional[float], y: Optional[float], floor: int) -> Optional[int]:
+        """Première salle (ordre de chargement) contenant le point, sinon None"""
+        grid = self._floors.get(floor)
+        if grid is None or x is None or y is None:
+            return None
+        for room in grid.candidates(x, y):
+            if room.contains(x, y):
+                return room.room_id
+        return None
+
+    def locate_all(self, x: Optional[float], y: Optional[float], floor: int) -> List[int]:
+        """Toutes les salles contenant le point, dans l'ordre de chargement"""
+        grid = self._floors.get(floor)
+        if grid is None or x is None or y is None:
+            return []
+        return [room.room_id for room in grid.candidates(x, y) if room.contains(x, y)]
+
+    def locate_batch(
+        self,
+        xs: Sequence[Optional[float]],
+        ys: Sequence[Optional[float]],
+        floors: Sequence[int]
+    ) -> List[Optional[int]]:
+        """
+        Localise un lot de points en une passe vectorisée par salle
+
+        Returns:
+            Liste alignée sur l'entrée: room_id ou None
+        """
+        count = len(xs)
+        if count == 0:
+            return []
+        px = np.array([np.nan if v is None else v for v in xs], dtype=np.float64)
+        py = np.array([np.nan if v is None else v for v in ys], dtype=np.float64)
+        pf = np.asarray(floors)
+        result = np.full(count, -1, dtype=np.int64)
+        valid = ~(np.isnan(px) | np.isnan(py))
+
+        for floor, grid in self._floors.items():
+            on_floor = np.flatnonzero(valid & (pf == floor))
+            for room in grid.rooms:
+                if on_floor.size == 0:
+                    break
+                hit = room.contains_batch(px[on_floor], py[on_floor])
+                if hit.any():
+                    result[on_floor[hit]] = room.room_id
+                    on_floor = on_floor[~hit]
+
+        return [None if r < 0 else int(r) for r in result]
@@ -0,0 +1,108 @@
+"""
+Index des murs partagés entre salles (détection d'adjacence en une passe)
+
+- Arêtes axis-alignées de toutes les salles d'un étage triées par coordonnée
+- Balayage : seules les arêtes colinéaires (à la tolérance près) dont les
+  intervalles se recouvrent sont comparées (ensemble actif par groupe)
+- Chaque paire de salles garde ses segments de mur communs (ligne, intervalle)
+
+La validation des portes devient une simple recherche par paire de salles,
+avec les mêmes critères que la comparaison arête × arête historique.
+"""
+
+import heapq
+from typing import Dict, List, Tuple
+
+# (orientation 'h'/'v', coordonnée de la ligne, début, fin du recouvrement)
+SharedWall = Tuple[str, float, float, float]
+
+# Tolérance d'alignement (arête horizontale/verticale, colinéarité)
+WALL_ALIGN_TOL = 2.0
+
+
+class SharedWallIndex:
+    """Murs partagés par paire de salles (clé: (min_id, max_id))"""
+
+    def __init__(self, rooms: Dict[int, Dict], align_tol: float = WALL_ALIGN_TOL):
+        self.align_tol = align_tol
+        self._walls: Dict[Tuple[int, int], List[SharedWall]] = {}
+
+        by_floor: Dict[int, List[Tuple[int, List[Tuple[float, float]]]]] = {}
+        for room_id, room in rooms.items():
+            polygon = room.get('polygon') or []
+            if len(polygon) >= 2:
+                by_floor.setdefault(room.get('floor', 0), []).append((room_id, polygon))
+
+        for floor_rooms in by_floor.values():
+            horizontals = []
+            verticals = []
+            for room_id, polygon in floor_rooms:
+                for p1, p2 in zip(polygon, polygon[1:] + polygon[:1]):
+                    if abs(p1[1] - p2[1]) <= align_tol:
+                        horizontals.append((p1[1], p2[1], *sorted((p1[0], p2[0])), room_id))
+                    if abs(p1[0] - p2[0]) <= align_tol:
+                        verticals.append((p1[0], p2[0], *sorted((p1[1], p2[1])), room_id))
+            self._sweep(horizontals, 'h')
+            self._sweep(verticals, 'v')
+
+    def _sweep(self, edges: List[Tuple[float, float, float, float, int]], orientation: str):
+        """
+        Groupes d'arêtes colinéaires (écarts de coordonnée ≤ tolérance), puis
+        balayage des intervalles dans chaque groupe: une arête n'est comparée
+        qu'aux arêtes actives dont l'intervalle la recouvre (à la tolérance près)
+        """
+        edges.sort(key=lambda e: e[0])
+        tol = self.align_tol
+        start = 0
+        for end in range(1, len(edges) + 1):
+            if end == len(edges) or edges[end][0] - edges[end - 1][0] > tol:
+                if end - start > 1:
+                    self._sweep_intervals(edges[start:end], orientation)
+                start = end
+
+    def _sweep_intervals(self, group: List[Tuple[float, float, float, float, int]], orientation: str):
+        tol = self.align_tol
+        group.sort(key=lambda e: (e[2], e[0]))
+        active: Dict[int, Tuple[float, float, float, float, int]] = {}
+        expiry: List[Tuple[float, int]] = []
+        for index, edge in enumerate(group):
+            c1, c2, lo_b, hi_b, room_b = edge
+            # Arêtes terminées avant le début de celle-ci (tolérance comprise)
+            while expiry and expiry[0][0] + tol < lo_b:
+                active.pop(heapq.heappop(expiry)[1], None)
+            for d1, d2, lo_a, hi_a, room_a in active.values():
+                if room_a == room_b or abs(c1 - d1) > tol:
+                    continue
+                overlap_min = max(lo_a, lo_b)
+                overlap_max = min(hi_a, hi_b)
+                line = (c1 + c2 + d1 + d2) / 4.0
+                key = (room_a, room_b) if room_a < room_b else (room_b, room_a)
+                self._walls.setdefault(key, []).append((orientation, line, overlap_min, overlap_max))
+            active[index] = edge
+            heapq.heappush(expiry, (hi_b, index))
+
+    def shared_walls(self, room_a: int, room_b: int) -> List[SharedWall]:
+        key = (room_a, room_b) if room_a < room_b else (room_b, room_a)
+        return self._walls.get(key, [])
+
+    def are_adjacent(self, room_a: int, room_b: int, tol: float = 2.0, min_overlap: float = 20.0) -> bool:
+        """Au moins un mur commun d'au moins min_overlap (à tol près)"""
+        return any(
+            hi - lo + tol >= min_overlap
+            for _, _, lo, hi in self.shared_walls(room_a, room_b)
+        )
+
+    def point_on_shared_wall(
+        self, room_a: int, room_b: int, x: float, y: float,
+        tol: float = 10.0, min_overlap: float = 20.0
+    ) -> bool:
+        """(x, y) à moins de tol d'un mur commun d'au moins min_overlap"""
+        for orientation, line, lo, hi in self.shared_walls(room_a, room_b):
+            if hi - lo < min_overlap:
+                continue
+            if orientation == 'h':
+                if abs(y - line) <= tol and (lo - tol) <= x <= (hi + tol):
+                    return True
+            elif abs(x - line) <= tol and (lo - tol) <= y <= (hi + tol):
+                return True
+        return False
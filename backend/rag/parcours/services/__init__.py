@@ -3,15 +3,22 @@ Services pour la génération de parcours
 """
 
 from .artwork_selector import ArtworkSelector
+from .route_planner import RoutePlanner
 from .connectivity_checker import ConnectivityChecker
 from .path_optimizer import PathOptimizer
 from .waypoint_calculator import WaypointCalculator
 from .segment_builder import SegmentBuilder
+from .artwork_placements import ArtworkPlacementStore
+from .route_codec import compact_parcours, expand_route
 
 __all__ = [
     'ArtworkSelector',
+    'RoutePlanner',
     'ConnectivityChecker',
     'PathOptimizer',
     'WaypointCalculator',
-    'SegmentBuilder'
+    'SegmentBuilder',
+    'ArtworkPlacementStore',
+    'compact_parcours',
+    'expand_route'
 ]
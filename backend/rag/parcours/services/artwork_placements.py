@@ -0,0 +1,145 @@
+"""
+Service de placement des œuvres (table artwork_placements)
+
+Responsabilités:
+- Matérialiser centre (x, y), étage et salle de chaque entité ARTWORK
+- Détecter un placement obsolète (plan réenregistré → TRUNCATE entities CASCADE)
+- Recalculer les placements depuis le graphe (localisation vectorisée)
+
+La sélection des œuvres lit ensuite les placements par simple jointure,
+sans géométrie sur le chemin de la requête.
+"""
+
+import threading
+from typing import Dict
+
+import psycopg2.extras
+
+try:
+    from ..models import MuseumGraphV2
+except ImportError:
+    import sys
+    import os
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+    from models import MuseumGraphV2
+
+
+# Clé du verrou consultatif (un seul recalcul à la fois entre workers)
+_PLACEMENTS_LOCK_KEY = 720031
+
+_table_checked = False
+_table_lock = threading.Lock()
+
+
+class ArtworkPlacementStore:
+    """Lecture/écriture de la table artwork_placements"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def _ensure_table_exists(self):
+        """S'assure que la table existe (migration safe, une fois par process)"""
+        global _table_checked
+        if _table_checked:
+            return
+        with _table_lock:
+            if _table_checked:
+                return
+            cur = self.conn.cursor()
+            try:
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS artwork_placements (
+                        entity_id INTEGER PRIMARY KEY
+                            REFERENCES entities(entity_id) ON DELETE CASCADE,
+                        oeuvre_id INTEGER NOT NULL,
+                        plan_id INTEGER NOT NULL,
+                        floor INTEGER NOT NULL,
+                        x DOUBLE PRECISION NOT NULL,
+                        y DOUBLE PRECISION NOT NULL,
+                        room_entity_id INTEGER,
+                        computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                cur.execute("CREATE INDEX IF NOT EXISTS idx_artwork_placements_oeuvre ON artwork_placements(oeuvre_id)")
+                self.conn.commit()
+                _table_checked = True
+            except Exception:
+                self.conn.rollback()
+                raise
+            finally:
+                cur.close()
+
+    def is_stale(self) -> bool:
+        """True si une entité ARTWORK n'a pas de placement à jour"""
+        self._ensure_table_exists()
+        cur = self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute("""
+            SELECT EXISTS (
+                SELECT 1
+                FROM entities e
+                LEFT JOIN artwork_placements ap ON ap.entity_id = e.entity_id
+                WHERE e.entity_type = 'ARTWORK'
+                  AND e.oeuvre_id IS NOT NULL
+                  AND (ap.entity_id IS NULL OR ap.oeuvre_id <> e.oeuvre_id)
+                  AND EXISTS (SELECT 1 FROM points p WHERE p.entity_id = e.entity_id)
+            ) AS stale
+        """)
+        stale = cur.fetchone()['stale']
+        cur.close()
+        self.conn.commit()
+        return bool(stale)
+
+    def refresh(self, graph: MuseumGraphV2) -> Dict[str, int]:
+        """Recalcule tous les placements depuis le graphe (transaction unique)"""
+        self._ensure_table_exists()
+        cur = self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        try:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (_PLACEMENTS_LOCK_KEY,))
+            cur.execute("""
+                SELECT e.entity_id, e.oeuvre_id, e.plan_id,
+                       AVG(p.x) AS x, AVG(p.y) AS y
+                FROM entities e
+                JOIN points p ON p.entity_id = e.entity_id
+                WHERE e.entity_type = 'ARTWORK'
+                  AND e.oeuvre_id IS NOT NULL
+                GROUP BY e.entity_id, e.oeuvre_id, e.plan_id
+                ORDER BY e.entity_id
+            """)
+            rows = cur.fetchall()
+
+            floors = [graph.plan_to_floor.get(row['plan_id'], 0) for row in rows]
+            room_ids = graph.locate_points([
+                (float(row['x']), float(row['y']), floor)
+                for row, floor in zip(rows, floors)
+            ])
+
+            cur.execute("DELETE FROM artwork_placements")
+            psycopg2.extras.execute_values(cur, """
+                INSERT INTO artwork_placements (entity_id, oeuvre_id, plan_id, floor, x, y, room_entity_id)
+                VALUES %s
+            """, [
+                (row['entity_id'], row['oeuvre_id'], row['plan_id'], floor,
+                 float(row['x']), float(row['y']), room_id)
+                for row, floor, room_id in zip(rows, floors, room_ids)
+            ])
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+        located = sum(1 for r in room_ids if r is not None)
+        print(f"   ✓ Placements œuvres recalculés: {len(rows)} ({len(rows) - located} hors salle)")
+        return {'placements': len(rows), 'located': located}
+
+    def ensure_fresh(self, graph: MuseumGraphV2) -> bool:
+        """Recalcule si nécessaire. Retourne False si les placements sont inutilisables."""
+        try:
+            if self.is_stale():
+                self.refresh(graph)
+            return True
+        except Exception as e:
+            self.conn.rollback()
+            print(f"   ⚠️ Placements œuvres indisponibles ({e}) - calcul géométrique")
+            return False
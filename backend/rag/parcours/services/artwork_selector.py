@@ -10,29 +10,44 @@ Responsabilités:
 
 import random
 import psycopg2.extras
-import math
-from typing import List, Dict
+from typing import List, Dict, Optional
 import sys
 import os
 import json
 
+import numpy as np
+
 # Support imports directs et relatifs
 try:
     from ..models import Artwork, Position, MuseumGraphV2
+    from ..models.artwork import PIXEL_TO_METER
 except ImportError:
     sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
     from models import Artwork, Position, MuseumGraphV2
+    from models.artwork import PIXEL_TO_METER
+
+# Distance retenue (mètres) pour un candidat inaccessible depuis une œuvre sélectionnée
+INACCESSIBLE_PENALTY_METERS = 50
+
+# Pénalité d'affluence: une charge de 1 (un parcours concurrent) divise le poids par 1 + 0.8
+CROWDING_WEIGHT = 0.8
 
 
 class ArtworkSelector:
     """Sélectionne les œuvres pour un parcours selon profil et durée"""
     
-    def __init__(self, conn, graph: MuseumGraphV2, connectivity_checker=None):
+    def __init__(self, conn, graph: MuseumGraphV2, connectivity_checker=None, use_placements: bool = False,
+                 duration_model=None):
         self.conn = conn
         self.graph = graph
         self.connectivity_checker = connectivity_checker  # Pour calculs de distances réelles
+        self.use_placements = use_placements  # Lire artwork_placements (sinon calcul géométrique)
+        self.duration_model = duration_model  # Durées Piper mesurées/prédites (sinon 140 WPM)
     
-    def select_artworks(self, profile: Dict, target_duration_min: int, seed: int) -> List[Artwork]:
+    def select_artworks(
+        self, profile: Dict, target_duration_min: int, seed: int, rng: random.Random = None,
+        candidates: Optional[List[Artwork]] = None, crowding: Optional[Dict[int, float]] = None
+    ) -> List[Artwork]:
         """
         Sélectionne les œuvres optimales pour le parcours
         
@@ -40,18 +55,16 @@ class ArtworkSelector:
             profile: Critères utilisateur (age, thematique, style_texte)
             target_duration_min: Durée cible en minutes
             seed: Seed pour reproductibilité (optionnel)
+            rng: Générateur aléatoire de la requête (sinon random.Random(seed))
+            candidates: Candidats déjà chargés par load_candidates (lot de parcours)
+            crowding: Charge par oeuvre_id (parcours concurrents), pénalise la pondération
         
         Returns:
             Liste d'œuvres sélectionnées
         """
-        # Charger toutes les œuvres candidates
-        candidates = self._load_candidate_artworks(profile)
-        
-        if not candidates:
-            return []
-
-        # Filtrer par connectivité: garder une seule composante connexe cohérente
-        candidates = self._filter_by_connectivity(candidates)
+        rng = rng or random.Random(seed)
+        if candidates is None:
+            candidates = self.load_candidates(profile)
         if not candidates:
             return []
         
@@ -59,9 +72,16 @@ class ArtworkSelector:
         target_count = self._calculate_target_count(candidates, target_duration_min)
         
         # Sélection pondérée pour variété
-        selected = self._weighted_selection(candidates, target_count, seed)
+        selected = self._weighted_selection(candidates, target_count, rng, crowding)
         
         return selected
+    
+    def load_candidates(self, profile: Dict) -> List[Artwork]:
+        """Œuvres candidates du profil, restreintes à une composante connexe cohérente"""
+        candidates = self._load_candidate_artworks(profile)
+        if not candidates:
+            return []
+        return self._filter_by_connectivity(candidates)
 
     def _filter_by_connectivity(self, candidates: List[Artwork]) -> List[Artwork]:
         """Garde uniquement les œuvres appartenant à une composante connexe valide.
@@ -73,52 +93,26 @@ class ArtworkSelector:
         if not candidates:
             return candidates
 
-        # Construire le graphe salle↔salle (portes) + liens verticaux (étages)
-        adj = {}
-        def add_edge(a, b):
-            if a is None or b is None:
-                return
-            adj.setdefault(a, set()).add(b)
-            adj.setdefault(b, set()).add(a)
-
-        # Portes même étage
-        for door in self.graph.doors:
-            add_edge(door.room_a, door.room_b)
-
-        # Liens verticaux (relient les salles à travers étages)
-        for s in self.graph.stairways:
-            add_edge(s.room_id_from, s.room_id_to)
-
+        # Composantes connexes précalculées par le graphe (mêmes étiquettes que le checker)
+        accessible_only = bool(self.connectivity_checker and self.connectivity_checker.accessible_only)
+        labels = self.graph.room_components(accessible_only)
+        
+        components_by_label = {}
+        for room_id, label in labels.items():
+            components_by_label.setdefault(label, set()).add(room_id)
+        components = list(components_by_label.values())
+        
         # Si aucune connexion (pas de portes ni liens), retourner les candidats tels quels (mode minimal)
-        if not adj:
+        if all(len(comp) == 1 for comp in components):
             print("   ⚠️ Aucune porte/connexion définie - mode parcours minimal")
             return candidates
-
-        # Trouver composantes connexes via BFS
-        unvisited = set(self.graph.rooms.keys())
-        components = []
-        while unvisited:
-            start = unvisited.pop()
-            comp = set([start])
-            queue = [start]
-            while queue:
-                r = queue.pop()
-                for n in adj.get(r, []):
-                    if n in unvisited:
-                        unvisited.remove(n)
-                        comp.add(n)
-                        queue.append(n)
-            components.append(comp)
-
-        # Retirer les salles totalement isolées (degré 0) de toute considération
+        
+        # Retirer les salles totalement isolées (composante à une seule salle)
         connected_rooms = set()
         for comp in components:
-            if len(comp) == 1:
-                only = next(iter(comp))
-                if len(adj.get(only, set())) == 0:
-                    continue  # salle isolée, ignorer
-            connected_rooms.update(comp)
-
+            if len(comp) > 1:
+                connected_rooms.update(comp)
+        
         filtered_candidates = [a for a in candidates if a.position.room in connected_rooms]
         
         # Si tous les candidats sont filtrés, on les garde quand même (mode minimal)
@@ -153,44 +147,45 @@ class ArtworkSelector:
         # Profil JSON pour la requête
         profile_json = json.dumps(profile, sort_keys=True)
         
-        # Query avec narrations pregenerées (optimisée, une seule requête)
-        cur.execute("""
-            SELECT DISTINCT
-                o.oeuvre_id,
-                o.title,
-                o.artist,
-                o.date_oeuvre,
-                o.materiaux_technique,
-                o.image_link,
-                p.pregeneration_text as narration,
-                LENGTH(p.pregeneration_text) as narration_length,
-                e_art.entity_id as artwork_entity_id,
-                (SELECT AVG(pts.x) FROM points pts WHERE pts.entity_id = e_art.entity_id) as artwork_x,
-                (SELECT AVG(pts.y) FROM points pts WHERE pts.entity_id = e_art.entity_id) as artwork_y,
-                e_art.plan_id
-            FROM oeuvres o
-            INNER JOIN entities e_art ON o.oeuvre_id = e_art.oeuvre_id
-            INNER JOIN pregenerations p ON o.oeuvre_id = p.oeuvre_id
-            WHERE e_art.entity_type = 'ARTWORK'
-              AND p.criteria_combination @> %(profile)s::jsonb
-            ORDER BY o.oeuvre_id
-        """, {
-            'profile': profile_json
-        })
+        if self.use_placements:
+            # Placements matérialisés: simple jointure, aucune géométrie
+            cur.execute("""
+                SELECT DISTINCT
+                    o.oeuvre_id,
+                    o.title,
+                    o.artist,
+                    o.date_oeuvre,
+                    o.materiaux_technique,
+                    o.image_link,
+                    p.pregeneration_text as narration,
+                    LENGTH(p.pregeneration_text) as narration_length,
+                    ap.entity_id as artwork_entity_id,
+                    ap.x as artwork_x,
+                    ap.y as artwork_y,
+                    ap.floor,
+                    ap.room_entity_id,
+                    p.pregeneration_id,
+                    {measured_column}
+                FROM oeuvres o
+                INNER JOIN artwork_placements ap ON o.oeuvre_id = ap.oeuvre_id
+                INNER JOIN pregenerations p ON o.oeuvre_id = p.oeuvre_id
+                {measured_join}
+                WHERE p.criteria_combination @> %(profile)s::jsonb
+                ORDER BY o.oeuvre_id, artwork_entity_id, p.pregeneration_id
+            """.format(**self._measured_duration_sql()), {
+                'profile': profile_json,
+                'voice': self._voice_model()
+            })
+            rows = cur.fetchall()
+            floors = [row['floor'] for row in rows]
+            room_ids = [row['room_entity_id'] for row in rows]
+        else:
+            rows, floors, room_ids = self._load_candidate_rows_with_geometry(cur, profile_json)
+        
+        narration_durations = self._narration_durations(rows)
         
         artworks = []
-        for row in cur.fetchall():
-            # Déterminer étage depuis plan_id
-            plan_id = row['plan_id']
-            floor = self._get_floor_from_plan(plan_id)
-            
-            # Trouver salle contenant l'œuvre
-            room_id = self.graph._find_room_containing_point(
-                row['artwork_x'],
-                row['artwork_y'],
-                floor
-            )
-            
+        for row, floor, room_id, narration_seconds in zip(rows, floors, room_ids, narration_durations):
             position = Position(
                 x=row['artwork_x'],
                 y=row['artwork_y'],
@@ -200,12 +195,6 @@ class ArtworkSelector:
             
             artwork_type = self._classify_artwork_type(row['materiaux_technique'])
             
-            # Calculer durée narration estimée
-            # Piper TTS parle à environ 140-150 WPM en français pour un ton calme/musée
-            # On utilise 140 WPM (plus lent = plus sûr pour l'estimation)
-            word_count = len(row['narration'].split())
-            narration_seconds = (word_count / 140) * 60  # 140 WPM → secondes
-            
             artworks.append(Artwork(
                 oeuvre_id=row['oeuvre_id'],
                 title=row['title'],
@@ -222,35 +211,98 @@ class ArtworkSelector:
         cur.close()
         return artworks
     
-    def _get_floor_from_plan(self, plan_id: int) -> int:
-        """Convertit plan_id en numéro d'étage"""
-        cur = self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        cur.execute("SELECT plan_id FROM plans ORDER BY plan_id")
-        plans = [row['plan_id'] for row in cur.fetchall()]
-        cur.close()
+    def _voice_model(self):
+        return self.duration_model.default_voice if self.duration_model is not None else None
+    
+    def _measured_duration_sql(self) -> Dict[str, str]:
+        """Colonne + jointure de la durée Piper mesurée (clé: md5 du texte)"""
+        if self.duration_model is None or not self.duration_model.table_ready:
+            return {'measured_column': 'NULL::double precision AS measured_duration', 'measured_join': ''}
+        return {
+            'measured_column': 'ad.duration_seconds AS measured_duration',
+            'measured_join': (
+                'LEFT JOIN audio_durations ad ON ad.voice_model = %(voice)s '
+                'AND ad.text_md5 = md5(p.pregeneration_text)'
+            )
+        }
+    
+    def _narration_durations(self, rows) -> List[float]:
+        """Durée réelle si déjà synthétisée, sinon prédite (modèle ajusté ou 140 WPM)"""
+        if self.duration_model is None:
+            # Piper ~140 WPM en français (plus lent = plus sûr pour l'estimation)
+            return [(len(row['narration'].split()) / 140) * 60 for row in rows]
         
-        try:
-            return plans.index(plan_id)
-        except ValueError:
-            return 0
+        durations = [row['measured_duration'] for row in rows]
+        missing = [i for i, d in enumerate(durations) if d is None]
+        predicted = self.duration_model.predict_many(
+            [rows[i]['narration'] for i in missing], self._voice_model()
+        )
+        for i, seconds in zip(missing, predicted):
+            durations[i] = seconds
+        print(f"   🎤 Durées narration: {len(rows) - len(missing)} mesurées, {len(missing)} prédites")
+        return durations
+    
+    def _load_candidate_rows_with_geometry(self, cur, profile_json: str):
+        """Chargement sans placements: centres calculés en SQL, salles via l'index spatial"""
+        cur.execute("""
+            SELECT DISTINCT
+                o.oeuvre_id,
+                o.title,
+                o.artist,
+                o.date_oeuvre,
+                o.materiaux_technique,
+                o.image_link,
+                p.pregeneration_text as narration,
+                LENGTH(p.pregeneration_text) as narration_length,
+                e_art.entity_id as artwork_entity_id,
+                (SELECT AVG(pts.x) FROM points pts WHERE pts.entity_id = e_art.entity_id) as artwork_x,
+                (SELECT AVG(pts.y) FROM points pts WHERE pts.entity_id = e_art.entity_id) as artwork_y,
+                e_art.plan_id,
+                p.pregeneration_id,
+                {measured_column}
+            FROM oeuvres o
+            INNER JOIN entities e_art ON o.oeuvre_id = e_art.oeuvre_id
+            INNER JOIN pregenerations p ON o.oeuvre_id = p.oeuvre_id
+            {measured_join}
+            WHERE e_art.entity_type = 'ARTWORK'
+              AND p.criteria_combination @> %(profile)s::jsonb
+            ORDER BY o.oeuvre_id, artwork_entity_id, p.pregeneration_id
+        """.format(**self._measured_duration_sql()), {
+            'profile': profile_json,
+            'voice': self._voice_model()
+        })
+        
+        rows = cur.fetchall()
+        
+        # Localiser toutes les œuvres en une passe (index spatial vectorisé)
+        floors = [self._get_floor_from_plan(row['plan_id']) for row in rows]
+        room_ids = self.graph.locate_points([
+            (row['artwork_x'], row['artwork_y'], floor)
+            for row, floor in zip(rows, floors)
+        ])
+        return rows, floors, room_ids
+    
+    def _get_floor_from_plan(self, plan_id: int) -> int:
+        """Convertit plan_id en numéro d'étage (mapping chargé avec le graphe)"""
+        return self.graph.plan_to_floor.get(plan_id, 0)
     
     def _calculate_target_count(self, candidates: List[Artwork], target_duration_min: int) -> int:
         """Calcule nombre optimal d'œuvres selon durée cible
         
         Temps par œuvre:
-        - Narration audio: ~1.5-2.5 min (variable selon le texte, Piper ~140 WPM)
+        - Narration audio: durée Piper mesurée, ou prédite pour un texte jamais synthétisé
         - Observation: ~2 min (temps pour regarder l'œuvre en écoutant)
         - Déplacement: ~0.5-1 min (marche entre œuvres)
         Total moyen: ~4-5 min par œuvre
         
         On vise légèrement en-dessous de la cible car:
-        - L'audio réel peut être plus long que l'estimation WPM
+        - L'audio réel peut dépasser la prédiction (texte jamais synthétisé)
         - Le réajustement après génération audio retirera des œuvres si nécessaire
         """
         if not candidates:
             return 0
         
-        # Utiliser la durée moyenne estimée des narrations (basée sur WPM)
+        # Durée moyenne des narrations (mesurée ou prédite)
         avg_narration_sec = sum(c.narration_duration for c in candidates) / len(candidates)
         avg_narration_min = avg_narration_sec / 60
         
@@ -273,7 +325,24 @@ class ArtworkSelector:
         
         return target_count
     
-    def _weighted_selection(self, candidates: List[Artwork], count: int, seed: int) -> List[Artwork]:
+    def _distance_row(self, origin: Artwork, candidates: List[Artwork], xs, ys, floors) -> np.ndarray:
+        """Distances (float32) d'une œuvre sélectionnée vers tous les candidats"""
+        if self.connectivity_checker:
+            # Vraie distance via les portes/escaliers, pénalité 50 si inaccessible
+            dists = self.connectivity_checker.distances_from(
+                origin.position, [c.position for c in candidates]
+            )
+            dists = np.where(np.isinf(dists), INACCESSIBLE_PENALTY_METERS, dists)
+        else:
+            # Fallback: distance euclidienne (+20 m par étage, comme Position.distance_to)
+            dists = np.hypot(xs - origin.position.x, ys - origin.position.y) * PIXEL_TO_METER
+            dists = dists + np.abs(floors - origin.position.floor) * 20
+        return dists.astype(np.float32)
+    
+    def _weighted_selection(
+        self, candidates: List[Artwork], count: int, rng: random.Random,
+        crowding: Optional[Dict[int, float]] = None
+    ) -> List[Artwork]:
         """
         Sélection pondérée favorisant variété
         
@@ -282,79 +351,73 @@ class ArtworkSelector:
         - Étages différents (bonus x2)
         - Types variés (bonus x1.5)
         - Distance moyenne optimale
+        - Affluence (crowding): poids divisé par 1 + CROWDING_WEIGHT × charge
+        
+        Calcul vectorisé: une ligne de distances (float32) par œuvre sélectionnée,
+        somme courante des distances à la sélection, bonus en opérations sur tableaux.
         """
         if len(candidates) <= count:
             return candidates
         
-        selected = []
-        selected_ids = set()
-        visited_rooms = set()
-        visited_floors = set()
-        type_counts = {}
+        n = len(candidates)
+        xs = np.array([c.position.x for c in candidates], dtype=np.float64)
+        ys = np.array([c.position.y for c in candidates], dtype=np.float64)
+        floors = np.array([c.position.floor for c in candidates], dtype=np.int64)
+        oeuvre_ids = np.array([c.oeuvre_id for c in candidates], dtype=np.int64)
+        # Codes entiers pour salles (None inclus) et types
+        room_codes = {}
+        rooms = np.array([room_codes.setdefault(c.position.room, len(room_codes)) for c in candidates])
+        type_index = {}
+        types = np.array([type_index.setdefault(c.artwork_type, len(type_index)) for c in candidates])
         
-        available = [c for c in candidates]
+        available = np.ones(n, dtype=bool)
+        visited_room = np.zeros(len(room_codes), dtype=bool)
+        visited_floor = np.zeros(n, dtype=bool)  # par candidat: étage déjà visité
+        type_counts = np.zeros(len(type_index), dtype=np.float64)
+        # Somme des distances aux œuvres déjà retenues (seule la moyenne sert aux poids)
+        distance_sum = np.zeros(n, dtype=np.float64)
+        crowd_factor = None
+        if crowding:
+            load = np.array([crowding.get(c.oeuvre_id, 0.0) for c in candidates], dtype=np.float64)
+            crowd_factor = 1.0 / (1.0 + CROWDING_WEIGHT * load)
+        selected = []
         
-        while len(selected) < count and available:
+        while len(selected) < count and available.any():
             if not selected:
-                # Premier choix: vraiment aléatoire pour variété
-                import time, os
-                entropy = int(time.time() * 1000000) ^ os.getpid() ^ hash(time.time())
-                temp_random = random.Random(entropy)
-                
-                # Favoriser RDC si disponible
-                ground_floor = [a for a in available if a.position.floor == 0]
-                pool = ground_floor if ground_floor else available
-                choice = temp_random.choice(pool)
-                
-                # Seed global pour reproductibilité des autres choix
-                if seed is not None:
-                    random.seed(seed)
+                # Premier choix: favoriser RDC si disponible
+                ground_floor = np.flatnonzero(available & (floors == 0))
+                pool = ground_floor if ground_floor.size else np.flatnonzero(available)
+                if crowd_factor is None:
+                    choice = int(pool[rng.randrange(pool.size)])
+                else:
+                    choice = int(rng.choices(pool.tolist(), weights=crowd_factor[pool].tolist())[0])
             else:
-                # Calcul poids pour chaque candidat
-                weights = []
-                for candidate in available:
-                    # Bonus salle non visitée
-                    room_bonus = 3.0 if candidate.position.room not in visited_rooms else 0.5
-                    
-                    # Bonus étage non visité
-                    floor_bonus = 2.0 if candidate.position.floor not in visited_floors else 0.7
-                    
-                    # Bonus type peu représenté
-                    type_count = type_counts.get(candidate.artwork_type, 0)
-                    type_bonus = 1.5 if type_count == 0 else (1.0 / (type_count + 1))
-                    
-                    # Distance moyenne aux déjà sélectionnés (utiliser BFS si disponible)
-                    if self.connectivity_checker:
-                        # Vraie distance via BFS (inclut coûts escaliers)
-                        total_dist = 0
-                        for s in selected:
-                            dist, _ = self.connectivity_checker.calculate_path_between_points(
-                                candidate.position, s.position
-                            )
-                            total_dist += dist if not math.isinf(dist) else 50  # Pénalité si inaccessible
-                        avg_dist = total_dist / len(selected)
-                    else:
-                        # Fallback: distance euclidienne
-                        avg_dist = sum(candidate.position.distance_to(s.position) for s in selected) / len(selected)
-                    
-                    distance_weight = min(2.0, avg_dist / 15.0)
-                    
-                    weights.append(room_bonus * floor_bonus * type_bonus * distance_weight)
+                room_bonus = np.where(visited_room[rooms], 0.5, 3.0)
+                floor_bonus = np.where(visited_floor, 0.7, 2.0)
+                type_count = type_counts[types]
+                type_bonus = np.where(type_count == 0, 1.5, 1.0 / (type_count + 1))
+                distance_weight = np.minimum(2.0, (distance_sum / len(selected)) / 15.0)
                 
-                if sum(weights) == 0:
+                weights = room_bonus * floor_bonus * type_bonus * distance_weight
+                if crowd_factor is not None:
+                    weights = weights * crowd_factor
+                candidates_idx = np.flatnonzero(available)
+                candidate_weights = weights[candidates_idx]
+                if candidate_weights.sum() == 0:
                     break
                 
-                choice = random.choices(available, weights=weights)[0]
+                choice = int(rng.choices(candidates_idx.tolist(), weights=candidate_weights.tolist())[0])
             
             # Ajouter au parcours
-            selected.append(choice)
-            selected_ids.add(choice.oeuvre_id)
-            visited_rooms.add(choice.position.room)
-            visited_floors.add(choice.position.floor)
-            type_counts[choice.artwork_type] = type_counts.get(choice.artwork_type, 0) + 1
+            chosen = candidates[choice]
+            distance_sum += self._distance_row(chosen, candidates, xs, ys, floors)
+            selected.append(chosen)
+            visited_room[rooms[choice]] = True
+            visited_floor |= floors == floors[choice]
+            type_counts[types[choice]] += 1
             
             # Retirer des disponibles
-            available = [a for a in available if a.oeuvre_id != choice.oeuvre_id]
+            available &= oeuvre_ids != oeuvre_ids[choice]
         
         return selected
     
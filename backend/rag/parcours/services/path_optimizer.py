@@ -10,17 +10,66 @@ Responsabilités:
 
 import math
 import random
-from typing import List, Tuple
+import time
+from typing import Dict, List, Tuple
 import sys
 import os
 
+import numpy as np
+
 try:
     from ..models import Artwork, Position
     from .connectivity_checker import ConnectivityChecker
+    from .artwork_selector import CROWDING_WEIGHT
 except ImportError:
     sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
     from models import Artwork, Position
     from services.connectivity_checker import ConnectivityChecker
+    from services.artwork_selector import CROWDING_WEIGHT
+
+# Budget de l'amélioration locale (2-opt / Or-opt) en mouvements évalués:
+# borne déterministe, le même tirage donne le même ordre quelle que soit la charge CPU
+LOCAL_SEARCH_MAX_EVALUATIONS = int(os.getenv('PARCOURS_LOCAL_SEARCH_EVALUATIONS', '60000'))
+# Garde-fou en temps (ms), bien au-delà du coût normal du budget ci-dessus
+LOCAL_SEARCH_BUDGET_MS = float(os.getenv('PARCOURS_LOCAL_SEARCH_MS', '2000'))
+# Gain minimal (mètres) pour accepter un mouvement
+_MIN_GAIN_METERS = 0.01
+# Coût d'une liaison inaccessible dans la matrice (évite inf - inf)
+_UNREACHABLE_METERS = 1e6
+# Vitesse de marche en musée (m/s)
+_WALK_SPEED = 0.8
+
+
+class _SearchLimits:
+    """Budget de la recherche locale: mouvements évalués, garde-fou en temps"""
+    
+    # Lecture de l'horloge une évaluation sur N seulement
+    _CLOCK_EVERY = 256
+    
+    def __init__(self, max_evaluations: int, budget_ms: float):
+        self.max_evaluations = max_evaluations
+        self.budget_ms = budget_ms
+        self.evaluations = 0
+        self.timed_out = False
+        self.start = time.perf_counter()
+        self._deadline = self.start + budget_ms / 1000.0
+    
+    @property
+    def evaluations_left(self) -> int:
+        return self.max_evaluations - self.evaluations
+    
+    @property
+    def exhausted(self) -> bool:
+        return self.timed_out or self.evaluations >= self.max_evaluations
+    
+    def spend(self) -> bool:
+        """Consomme une évaluation; False si le budget est épuisé"""
+        if self.exhausted:
+            return False
+        self.evaluations += 1
+        if self.evaluations % self._CLOCK_EVERY == 0 and time.perf_counter() >= self._deadline:
+            self.timed_out = True
+        return True
 
 
 class PathOptimizer:
@@ -29,13 +78,22 @@ class PathOptimizer:
     def __init__(self, connectivity_checker: ConnectivityChecker):
         self.checker = connectivity_checker
     
-    def optimize_path(self, artworks: List[Artwork], strategy: str = 'variety_tsp') -> List[Artwork]:
+    def optimize_path(
+        self,
+        artworks: List[Artwork],
+        strategy: str = 'variety_tsp',
+        rng: random.Random = None,
+        occupancy=None
+    ) -> List[Artwork]:
         """
         Optimise l'ordre de visite des œuvres
         
         Args:
             artworks: Œuvres à ordonner
             strategy: 'variety_tsp', 'nearest_neighbor', 'floor_grouping'
+            rng: Générateur aléatoire de la requête (reproductibilité)
+            occupancy: Affluence prévue (OccupancyForecast), évite d'arriver
+                devant une œuvre en même temps que les visiteurs actifs
         
         Returns:
             Œuvres ordonnées pour parcours optimal
@@ -43,32 +101,40 @@ class PathOptimizer:
         if len(artworks) <= 1:
             return artworks
         
+        rng = rng or random.Random()
         if strategy == 'variety_tsp':
-            return self._variety_tsp_optimization(artworks)
+            return self._variety_tsp_optimization(artworks, rng, occupancy)
         elif strategy == 'nearest_neighbor':
-            return self._nearest_neighbor_classic(artworks)
+            return self._nearest_neighbor_classic(artworks, rng)
         elif strategy == 'floor_grouping':
-            return self._floor_then_optimize(artworks)
+            return self._floor_then_optimize(artworks, rng)
         else:
             return artworks
     
-    def _variety_tsp_optimization(self, artworks: List[Artwork]) -> List[Artwork]:
+    def _variety_tsp_optimization(self, artworks: List[Artwork], rng: random.Random, occupancy=None) -> List[Artwork]:
         """
         TSP avec variété : choisit parmi les 2-3 plus proches à chaque étape
         
-        Évite parcours déterministes tout en restant cohérent
+        Évite parcours déterministes tout en restant cohérent.
+        Avec occupancy: chaque choix est pondéré par l'affluence prévue
+        à l'heure d'arrivée estimée devant l'œuvre.
         """
         if len(artworks) <= 1:
             return artworks
         
-        # Point de départ aléatoire pour variété
-        import time, os
-        entropy = int(time.time() * 1000000) ^ os.getpid()
-        start_random = random.Random(entropy)
-        start_idx = start_random.randint(0, len(artworks) - 1)
+        if occupancy:
+            # Départ pondéré par l'affluence actuelle
+            start_idx = rng.choices(
+                range(len(artworks)),
+                weights=[self._crowd_factor(occupancy, a, 0.0) for a in artworks]
+            )[0]
+        else:
+            # Point de départ aléatoire pour variété
+            start_idx = rng.randint(0, len(artworks) - 1)
         
         unvisited = [a for i, a in enumerate(artworks) if i != start_idx]
         path = [artworks[start_idx]]
+        elapsed_min = self._dwell_minutes(path[0])
         
         while unvisited:
             current_pos = path[-1].position
@@ -96,28 +162,46 @@ class PathOptimizer:
             else:
                 # Probabilités: 50% plus proche, 30% 2e, 20% 3e
                 weights = [0.5, 0.3, 0.2][:pool_size]
+                if occupancy:
+                    weights = [
+                        w * self._crowd_factor(occupancy, c[0], elapsed_min + c[1] / _WALK_SPEED / 60)
+                        for w, c in zip(weights, candidates[:pool_size])
+                    ]
                 weights = [w / sum(weights) for w in weights]
                 
-                chosen = random.choices(
+                chosen = rng.choices(
                     [c[0] for c in candidates[:pool_size]],
                     weights=weights
                 )[0]
             
+            if occupancy:
+                walk_min = next(d for a, d in candidates if a is chosen) / _WALK_SPEED / 60
+                elapsed_min += walk_min + self._dwell_minutes(chosen)
             path.append(chosen)
             unvisited.remove(chosen)
         
         return path
     
-    def _nearest_neighbor_classic(self, artworks: List[Artwork]) -> List[Artwork]:
+    @staticmethod
+    def _dwell_minutes(artwork: Artwork) -> float:
+        """Temps passé devant une œuvre: narration + 2 min d'observation"""
+        return artwork.narration_duration / 60 + 2.0
+    
+    def _crowd_factor(self, occupancy, artwork: Artwork, arrival_min: float) -> float:
+        """Pondération 1 / (1 + CROWDING_WEIGHT × affluence prévue pendant l'arrêt)"""
+        load = occupancy.load(
+            artwork.oeuvre_id, artwork.position.floor, artwork.position.room,
+            arrival_min, arrival_min + self._dwell_minutes(artwork)
+        )
+        return 1.0 / (1.0 + CROWDING_WEIGHT * load)
+    
+    def _nearest_neighbor_classic(self, artworks: List[Artwork], rng: random.Random) -> List[Artwork]:
         """Nearest-neighbor classique : toujours le plus proche"""
         if len(artworks) <= 1:
             return artworks
         
         # Point de départ aléatoire
-        import time, os
-        entropy = int(time.time() * 1000000) ^ os.getpid()
-        start_random = random.Random(entropy)
-        start_idx = start_random.randint(0, len(artworks) - 1)
+        start_idx = rng.randint(0, len(artworks) - 1)
         
         unvisited = [a for i, a in enumerate(artworks) if i != start_idx]
         path = [artworks[start_idx]]
@@ -146,7 +230,7 @@ class PathOptimizer:
         
         return path
     
-    def _floor_then_optimize(self, artworks: List[Artwork]) -> List[Artwork]:
+    def _floor_then_optimize(self, artworks: List[Artwork], rng: random.Random) -> List[Artwork]:
         """Groupe par étage puis optimise chaque groupe"""
         # Grouper par étage
         by_floor = {}
@@ -167,11 +251,147 @@ class PathOptimizer:
                 optimized_path.extend(floor_artworks)
             else:
                 # Optimiser ce groupe
-                optimized_group = self._variety_tsp_optimization(floor_artworks)
+                optimized_group = self._variety_tsp_optimization(floor_artworks, rng)
                 optimized_path.extend(optimized_group)
         
         return optimized_path
     
+    def distance_matrix(self, artworks: List[Artwork]) -> np.ndarray:
+        """Matrice des distances réelles entre œuvres (inaccessible → grande valeur)"""
+        positions = [a.position for a in artworks]
+        matrix = np.vstack([self.checker.distances_from(pos, positions) for pos in positions])
+        matrix[np.isinf(matrix)] = _UNREACHABLE_METERS
+        return matrix
+    
+    def improve_path(
+        self,
+        artworks: List[Artwork],
+        time_budget_ms: float = None,
+        rng: random.Random = None,
+        max_evaluations: int = None
+    ) -> Tuple[List[Artwork], Dict]:
+        """
+        Amélioration locale de l'ordre (2-opt puis Or-opt) sur matrice de distances
+        
+        - La première œuvre reste en tête (point de départ choisi pour la variété)
+        - Mouvements évalués dans un ordre aléatoire, premier gain accepté:
+          deux tirages différents convergent vers des optimums locaux différents
+        - Arrêt à l'optimum local ou après max_evaluations mouvements évalués
+          (déterministe); time_budget_ms n'est qu'un garde-fou signalé dans le rapport
+        
+        Returns:
+            (œuvres réordonnées, rapport avant/après)
+        """
+        budget_ms = LOCAL_SEARCH_BUDGET_MS if time_budget_ms is None else time_budget_ms
+        limits = _SearchLimits(
+            LOCAL_SEARCH_MAX_EVALUATIONS if max_evaluations is None else max_evaluations,
+            budget_ms
+        )
+        rng = rng or random.Random()
+        n = len(artworks)
+        
+        if n < 4 or budget_ms <= 0 or limits.evaluations_left <= 0:
+            distance = self.calculate_total_distance(artworks)
+            return artworks, self._search_report(distance, distance, 0, limits)
+        
+        # Listes Python: indexation scalaire bien plus rapide que sur ndarray
+        dist = self.distance_matrix(artworks).tolist()
+        order = list(range(n))
+        
+        def path_length(o):
+            return float(sum(dist[o[k]][o[k + 1]] for k in range(len(o) - 1)))
+        
+        before = path_length(order)
+        moves = 0
+        improved = True
+        
+        while improved and not limits.exhausted:
+            improved = self._two_opt_move(order, dist, rng, limits) or \
+                self._or_opt_move(order, dist, rng, limits)
+            if improved:
+                moves += 1
+        
+        if limits.timed_out:
+            print(f"   ⚠️ Recherche locale interrompue par le garde-fou ({budget_ms:.0f}ms): ordre non reproductible")
+        after = path_length(order)
+        return [artworks[i] for i in order], self._search_report(before, after, moves, limits)
+    
+    @staticmethod
+    def _two_opt_move(order: List[int], dist: List[List[float]], rng: random.Random,
+                      limits: '_SearchLimits') -> bool:
+        """Inverse un tronçon order[i..j] si cela raccourcit le chemin (chemin ouvert)"""
+        n = len(order)
+        pairs = [(i, j) for i in range(1, n - 1) for j in range(i + 1, n)]
+        rng.shuffle(pairs)
+        for i, j in pairs:
+            if not limits.spend():
+                return False
+            a, b, c = order[i - 1], order[i], order[j]
+            delta = dist[a][c] - dist[a][b]
+            if j + 1 < n:
+                d = order[j + 1]
+                delta += dist[b][d] - dist[c][d]
+            if delta < -_MIN_GAIN_METERS:
+                order[i:j + 1] = order[i:j + 1][::-1]
+                return True
+        return False
+    
+    @staticmethod
+    def _or_opt_move(order: List[int], dist: List[List[float]], rng: random.Random,
+                     limits: '_SearchLimits') -> bool:
+        """Déplace un tronçon de 1 à 3 œuvres à une autre position si cela raccourcit le chemin"""
+        n = len(order)
+        moves = [
+            (i, length, q)
+            for length in (1, 2, 3)
+            for i in range(1, n - length + 1)
+            for q in range(n - length)
+            if q != i - 1
+        ]
+        rng.shuffle(moves)
+        for i, length, q in moves:
+            if not limits.spend():
+                return False
+            first, last = order[i], order[i + length - 1]
+            prev = order[i - 1]
+            nxt = order[i + length] if i + length < n else None
+            
+            removal_gain = dist[prev][first]
+            if nxt is not None:
+                removal_gain += dist[last][nxt] - dist[prev][nxt]
+            
+            # Voisins d'insertion dans l'ordre privé du tronçon (rest[q], rest[q + 1])
+            after_node = order[q] if q < i else order[q + length]
+            q_next = q + 1
+            before_node = None
+            if q_next < n - length:
+                before_node = order[q_next] if q_next < i else order[q_next + length]
+            insertion_cost = dist[after_node][first]
+            if before_node is not None:
+                insertion_cost += dist[last][before_node] - dist[after_node][before_node]
+            
+            if insertion_cost - removal_gain < -_MIN_GAIN_METERS:
+                segment = order[i:i + length]
+                rest = order[:i] + order[i + length:]
+                order[:] = rest[:q + 1] + segment + rest[q + 1:]
+                return True
+        return False
+    
+    @staticmethod
+    def _search_report(before: float, after: float, moves: int, limits: '_SearchLimits') -> Dict:
+        return {
+            'distance_before': round(before, 2),
+            'distance_after': round(after, 2),
+            'walk_minutes_before': round(before / _WALK_SPEED / 60, 2),
+            'walk_minutes_after': round(after / _WALK_SPEED / 60, 2),
+            'moves': moves,
+            'evaluations': limits.evaluations,
+            'max_evaluations': limits.max_evaluations,
+            'elapsed_ms': round((time.perf_counter() - limits.start) * 1000, 1),
+            'budget_ms': limits.budget_ms,
+            'timed_out': limits.timed_out
+        }
+    
     def calculate_total_distance(self, artworks: List[Artwork]) -> float:
         """Calcule distance totale du parcours"""
         if len(artworks) <= 1:
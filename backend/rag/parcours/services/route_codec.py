@@ -0,0 +1,205 @@
+"""
+Format compact des chemins d'un parcours (path_segments + waypoints)
+
+Responsabilités:
+- Table de points dédoublonnée, regroupée par étage
+- Coordonnées par étage en polyline (deltas entiers, précision 0.1 px)
+- Segments en chaînes d'indices de points, waypoints en indices
+- Distances non transmises: recalculées à partir des points (× 0.0125 m/px)
+
+Format 'compact-v1' (clé 'route' du parcours):
+    types:     table des types de points ['artwork', 'door', ...]
+    floors:    [{floor, coords, rooms, types}] ; les points sont numérotés
+               dans l'ordre des étages, puis dans l'ordre de coords
+    chains:    [[segment_index, p0, p1, ...]] ; un segment par paire consécutive
+    waypoints: [[p, entity_id]] + [room_a, room_b] (porte)
+               ou [floor_from, floor_to] (stairway / stairway_exit)
+"""
+
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+ROUTE_FORMAT = 'compact-v1'
+# Coordonnées stockées au dixième de pixel
+COORD_PRECISION = 10
+# Échelle des plans: 0.5m = 40px → 1px = 0.0125m
+PIXEL_TO_METER = 0.0125
+
+_PAIRED_FIELDS = {
+    'door': ('room_a', 'room_b'),
+    'stairway': ('floor_from', 'floor_to'),
+    'stairway_exit': ('floor_from', 'floor_to')
+}
+
+
+# ===== POLYLINE =====
+
+def _encode_value(value: int, out: List[str]):
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        out.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    out.append(chr(value + 63))
+
+
+def encode_polyline(coords: List[Tuple[int, int]]) -> str:
+    """Encode des couples entiers (x, y) en deltas successifs (algorithme polyline)"""
+    out: List[str] = []
+    prev_x = prev_y = 0
+    for x, y in coords:
+        _encode_value(x - prev_x, out)
+        _encode_value(y - prev_y, out)
+        prev_x, prev_y = x, y
+    return ''.join(out)
+
+
+def decode_polyline(encoded: str) -> List[Tuple[int, int]]:
+    """Inverse de encode_polyline"""
+    values = []
+    value = shift = 0
+    for char in encoded:
+        chunk = ord(char) - 63
+        value |= (chunk & 0x1f) << shift
+        shift += 5
+        if chunk < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+    coords = []
+    x = y = 0
+    for i in range(0, len(values) - 1, 2):
+        x += values[i]
+        y += values[i + 1]
+        coords.append((x, y))
+    return coords
+
+
+# ===== ENCODAGE =====
+
+def compact_route(segments: List[Dict], waypoints: List[Dict]) -> Dict[str, Any]:
+    """Encode path_segments + waypoints au format compact-v1"""
+    # Points distincts: (étage, x, y quantifiés, salle, type)
+    keys: Dict[Tuple, int] = {}
+    ordered: List[Tuple] = []
+
+    def point_key(point: Dict) -> Tuple:
+        key = (
+            point['floor'],
+            round(point['x'] * COORD_PRECISION),
+            round(point['y'] * COORD_PRECISION),
+            point.get('room'),
+            point.get('type')
+        )
+        if key not in keys:
+            keys[key] = len(ordered)
+            ordered.append(key)
+        return key
+
+    segment_keys = [(s['segment_index'], point_key(s['from']), point_key(s['to'])) for s in segments]
+    waypoint_keys = [point_key({**w['position'], 'type': w['type']}) for w in waypoints]
+
+    # Numérotation par étage (ordre de première apparition conservé dans l'étage)
+    types: List[str] = []
+    type_index: Dict[str, int] = {}
+    floors: List[Dict[str, Any]] = []
+    index_of: Dict[Tuple, int] = {}
+    for floor in sorted({k[0] for k in ordered}, key=lambda f: (f is None, f)):
+        floor_keys = [k for k in ordered if k[0] == floor]
+        point_types = []
+        for k in floor_keys:
+            index_of[k] = len(index_of)
+            if k[4] not in type_index:
+                type_index[k[4]] = len(types)
+                types.append(k[4])
+            point_types.append(type_index[k[4]])
+        floors.append({
+            'floor': floor,
+            'coords': encode_polyline([(k[1], k[2]) for k in floor_keys]),
+            'rooms': [k[3] for k in floor_keys],
+            'types': point_types
+        })
+
+    # Chaînes: segments consécutifs d'une même transition qui se suivent
+    chains: List[List[int]] = []
+    for segment_index, from_key, to_key in segment_keys:
+        chain = chains[-1] if chains else None
+        if chain and chain[0] == segment_index and chain[-1] == index_of[from_key]:
+            chain.append(index_of[to_key])
+        else:
+            chains.append([segment_index, index_of[from_key], index_of[to_key]])
+
+    compact_waypoints = []
+    for waypoint, key in zip(waypoints, waypoint_keys):
+        entry = [index_of[key], waypoint.get('entity_id')]
+        fields = _PAIRED_FIELDS.get(waypoint['type'])
+        if fields:
+            entry.extend(waypoint.get(f) for f in fields)
+        compact_waypoints.append(entry)
+
+    return {
+        'format': ROUTE_FORMAT,
+        'precision': COORD_PRECISION,
+        'types': types,
+        'floors': floors,
+        'chains': chains,
+        'waypoints': compact_waypoints
+    }
+
+
+# ===== DÉCODAGE =====
+
+def _expand_points(route: Dict[str, Any]) -> List[Dict[str, Any]]:
+    precision = route['precision']
+    points = []
+    for floor in route['floors']:
+        coords = decode_polyline(floor['coords'])
+        for (x, y), room, type_idx in zip(coords, floor['rooms'], floor['types']):
+            points.append({
+                'type': route['types'][type_idx],
+                'x': x / precision,
+                'y': y / precision,
+                'floor': floor['floor'],
+                'room': room
+            })
+    return points
+
+
+def expand_route(route: Dict[str, Any], entrance: Optional[Dict] = None) -> Tuple[List[Dict], List[Dict]]:
+    """Reconstruit (path_segments, waypoints) au format détaillé depuis compact-v1"""
+    points = _expand_points(route)
+
+    segments = []
+    for chain in route['chains']:
+        segment_index, indices = chain[0], chain[1:]
+        for a, b in zip(indices, indices[1:]):
+            from_pt, to_pt = dict(points[a]), dict(points[b])
+            if from_pt['type'] == 'entrance':
+                from_pt['name'] = (entrance or {}).get('name', 'Entrée')
+            segments.append({
+                'from': from_pt,
+                'to': to_pt,
+                'distance': math.hypot(to_pt['x'] - from_pt['x'], to_pt['y'] - from_pt['y']) * PIXEL_TO_METER,
+                'floor': from_pt['floor'],
+                'segment_index': segment_index
+            })
+
+    waypoints = []
+    for entry in route['waypoints']:
+        point = points[entry[0]]
+        waypoint = {
+            'type': point['type'],
+            'position': {k: point[k] for k in ('x', 'y', 'floor', 'room')},
+            'entity_id': entry[1]
+        }
+        fields = _PAIRED_FIELDS.get(point['type'])
+        if fields:
+            waypoint.update(zip(fields, entry[2:4]))
+        waypoints.append(waypoint)
+
+    return segments, waypoints
+
+
+def compact_parcours(parcours: Dict[str, Any]) -> Dict[str, Any]:
+    """Copie du parcours avec 'route' compacte à la place de path_segments / waypoints"""
+    compact = {k: v for k, v in parcours.items() if k not in ('path_segments', 'waypoints')}
+    compact['route'] = compact_route(parcours.get('path_segments') or [], parcours.get('waypoints') or [])
+    return compact
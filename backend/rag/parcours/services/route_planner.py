@@ -0,0 +1,292 @@
+"""
+Service de calcul d'itinéraires pondérés
+
+Responsabilités:
+- Graphe de portails: portes et extrémités de liens verticaux (escaliers/ascenseurs)
+- Coûts réels: distance euclidienne (mètres) entre portails d'une même salle,
+  10 m par étage pour un lien vertical
+- A* avec heuristique admissible tenant compte des étages
+- Mémoïsation par paire de salles (un planificateur par mode d'accessibilité)
+"""
+
+import heapq
+import itertools
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+import sys
+import os
+
+import numpy as np
+
+try:
+    from ..models import Position, MuseumGraphV2, Waypoint
+    from ..models.artwork import PIXEL_TO_METER
+except ImportError:
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+    from models import Position, MuseumGraphV2, Waypoint
+    from models.artwork import PIXEL_TO_METER
+
+
+# Coût symbolique d'un changement d'étage (plans différents: pas de distance géométrique)
+FLOOR_CHANGE_METERS = 10.0
+
+# Identifiant de nœud: ('door', entity_id) ou ('vl', entity_id)
+NodeKey = Tuple[str, int]
+
+
+class RoutePlanner:
+    """Plus courts chemins entre positions du musée (A* sur les portails)"""
+
+    def __init__(self, graph: MuseumGraphV2, accessible_only: bool = False):
+        self.graph = graph
+        self.accessible_only = accessible_only  # Si True, ascenseurs uniquement
+
+        self._positions: Dict[NodeKey, Tuple[float, float, int]] = {}
+        self._doors: Dict[NodeKey, object] = {}
+        self._room_portals: Dict[Tuple[int, int], List[NodeKey]] = {}
+        # nœud → [(voisin, coût, info)] ; info = ('room', salle) ou ('vertical', lien, montant)
+        self._edges: Dict[NodeKey, List[Tuple[NodeKey, float, tuple]]] = {}
+        self._vertical_by_floor: Dict[int, List[Tuple[float, float]]] = {}
+        self._nearest_vertical: Dict[NodeKey, float] = {}
+
+        self._portal_routes: Dict[Tuple[NodeKey, NodeKey], Tuple[float, Optional[list]]] = {}
+        self._pair_routes: Dict[Tuple[int, int, int, int], List[Tuple[NodeKey, NodeKey, float, list]]] = {}
+
+        self._build_portal_graph()
+
+    @classmethod
+    def for_graph(cls, graph: MuseumGraphV2, accessible_only: bool = False) -> 'RoutePlanner':
+        """Planificateur partagé par graphe et par mode (mémo commun aux services)"""
+        planner = graph.route_planners.get(accessible_only)
+        if planner is None:
+            planner = cls(graph, accessible_only)
+            graph.route_planners[accessible_only] = planner
+        return planner
+
+    # ===== CONSTRUCTION =====
+
+    def _add_portal(self, node: NodeKey, x: float, y: float, floor: int, room: int):
+        self._positions[node] = (x, y, floor)
+        portals = self._room_portals.setdefault((room, floor), [])
+        if node not in portals:
+            portals.append(node)
+
+    def _build_portal_graph(self):
+        for door in self.graph.doors:
+            node = ('door', door.entity_id)
+            self._doors[node] = door
+            self._add_portal(node, door.center_x, door.center_y, door.floor, door.room_a)
+            self._add_portal(node, door.center_x, door.center_y, door.floor, door.room_b)
+
+        for stair in self.graph.stairways:
+            if self.accessible_only and stair.vertical_type != 'elevator':
+                continue
+            low = ('vl', stair.entity_id_from)
+            high = ('vl', stair.entity_id_to)
+            self._add_portal(low, stair.center_x_from, stair.center_y_from, stair.floor_from, stair.room_id_from)
+            self._add_portal(high, stair.center_x_to, stair.center_y_to, stair.floor_to, stair.room_id_to)
+            cost = abs(stair.floor_to - stair.floor_from) * FLOOR_CHANGE_METERS
+            self._edges.setdefault(low, []).append((high, cost, ('vertical', stair, True)))
+            self._edges.setdefault(high, []).append((low, cost, ('vertical', stair, False)))
+            self._vertical_by_floor.setdefault(stair.floor_from, []).append((stair.center_x_from, stair.center_y_from))
+            self._vertical_by_floor.setdefault(stair.floor_to, []).append((stair.center_x_to, stair.center_y_to))
+
+        # Traversée d'une salle: chaque paire de portails de la salle
+        for (room, _floor), portals in self._room_portals.items():
+            for u, v in itertools.permutations(portals, 2):
+                self._edges.setdefault(u, []).append((v, self._meters(self._positions[u], self._positions[v]), ('room', room)))
+
+        for node, (x, y, floor) in self._positions.items():
+            self._nearest_vertical[node] = self._distance_to_vertical(x, y, floor)
+
+    @staticmethod
+    def _meters(a: Tuple[float, ...], b: Tuple[float, ...]) -> float:
+        return math.hypot(a[0] - b[0], a[1] - b[1]) * PIXEL_TO_METER
+
+    def _distance_to_vertical(self, x: float, y: float, floor: int) -> float:
+        """Distance au lien vertical le plus proche de l'étage (inf si aucun)"""
+        links = self._vertical_by_floor.get(floor)
+        if not links:
+            return float('inf')
+        return min(math.hypot(x - lx, y - ly) for lx, ly in links) * PIXEL_TO_METER
+
+    # ===== A* =====
+
+    def _heuristic(self, node: NodeKey, goal: NodeKey) -> float:
+        """
+        Minorant du coût restant:
+        - même étage: min(euclidien, détour par un autre étage ≥ 2 liens verticaux)
+        - autre étage: rejoindre un lien + 10 m/étage + rejoindre le but depuis un lien
+        """
+        x, y, floor = self._positions[node]
+        gx, gy, goal_floor = self._positions[goal]
+        to_link = self._nearest_vertical[node]
+        from_link = self._nearest_vertical[goal]
+        if floor == goal_floor:
+            direct = math.hypot(x - gx, y - gy) * PIXEL_TO_METER
+            return min(direct, to_link + 2 * FLOOR_CHANGE_METERS + from_link)
+        return to_link + abs(floor - goal_floor) * FLOOR_CHANGE_METERS + from_link
+
+    def _astar(self, source: NodeKey, goal: NodeKey) -> Tuple[float, Optional[list]]:
+        """Plus court chemin portail → portail: (coût, [(nœud, info)]) ou (inf, None)"""
+        key = (source, goal)
+        if key in self._portal_routes:
+            return self._portal_routes[key]
+
+        best = {source: 0.0}
+        parent: Dict[NodeKey, Tuple[NodeKey, tuple]] = {}
+        counter = itertools.count()
+        # (f, nombre de portails, ordre d'insertion, nœud): à coût égal, le moins de portails
+        heap = [(self._heuristic(source, goal), 0, next(counter), source)]
+        closed = set()
+        result: Tuple[float, Optional[list]] = (float('inf'), None)
+
+        while heap:
+            _, hops, _, node = heapq.heappop(heap)
+            if node in closed:
+                continue
+            if node == goal:
+                steps = []
+                while node != source:
+                    prev, info = parent[node]
+                    steps.append((node, info))
+                    node = prev
+                steps.reverse()
+                result = (best[goal], steps)
+                break
+            closed.add(node)
+            for neighbour, cost, info in self._edges.get(node, []):
+                if neighbour in closed:
+                    continue
+                g = best[node] + cost
+                if g < best.get(neighbour, float('inf')):
+                    h = self._heuristic(neighbour, goal)
+                    if math.isinf(h):
+                        continue
+                    best[neighbour] = g
+                    parent[neighbour] = (node, info)
+                    heapq.heappush(heap, (g + h, hops + 1, next(counter), neighbour))
+
+        self._portal_routes[key] = result
+        return result
+
+    def _routes_between_rooms(self, room_a: int, floor_a: int, room_b: int, floor_b: int):
+        """Chemins portail de sortie → portail d'arrivée pour une paire de salles (mémoïsé)"""
+        key = (room_a, floor_a, room_b, floor_b)
+        routes = self._pair_routes.get(key)
+        if routes is None:
+            routes = []
+            for source in self._room_portals.get((room_a, floor_a), []):
+                for goal in self._room_portals.get((room_b, floor_b), []):
+                    cost, steps = self._astar(source, goal)
+                    if steps is not None:
+                        routes.append((source, goal, cost, steps))
+            self._pair_routes[key] = routes
+        return routes
+
+    # ===== API =====
+
+    def route(self, from_pos: Position, to_pos: Position) -> Tuple[float, List[Waypoint]]:
+        """
+        Plus court chemin entre deux positions
+
+        Returns:
+            (distance en mètres, waypoints) - distance=inf si aucun chemin
+        """
+        same_place = from_pos.room == to_pos.room and from_pos.floor == to_pos.floor
+        if same_place:
+            return self._meters((from_pos.x, from_pos.y), (to_pos.x, to_pos.y)), []
+        if from_pos.room is None or to_pos.room is None:
+            return float('inf'), []
+
+        best = None
+        best_total = float('inf')
+        for source, goal, cost, steps in self._routes_between_rooms(
+            from_pos.room, from_pos.floor, to_pos.room, to_pos.floor
+        ):
+            total = (
+                self._meters((from_pos.x, from_pos.y), self._positions[source])
+                + cost
+                + self._meters(self._positions[goal], (to_pos.x, to_pos.y))
+            )
+            if total < best_total:
+                best_total = total
+                best = (source, steps)
+
+        if best is None:
+            return float('inf'), []
+        return best_total, self._to_waypoints(best[0], best[1], from_pos.room)
+
+    def distances_from(self, from_pos: Position, targets: Sequence[Position]) -> np.ndarray:
+        """
+        Distances (mètres) d'une position vers un lot de positions, vectorisé par salle cible
+        
+        Même résultat que route() pour chaque cible, sans construire les waypoints.
+        """
+        result = np.full(len(targets), np.inf, dtype=np.float64)
+        by_room: Dict[Tuple[Optional[int], int], List[int]] = {}
+        for idx, pos in enumerate(targets):
+            by_room.setdefault((pos.room, pos.floor), []).append(idx)
+        
+        for (room, floor), indices in by_room.items():
+            idx = np.asarray(indices)
+            xs = np.array([targets[i].x for i in indices], dtype=np.float64)
+            ys = np.array([targets[i].y for i in indices], dtype=np.float64)
+            
+            if room == from_pos.room and floor == from_pos.floor:
+                result[idx] = np.hypot(xs - from_pos.x, ys - from_pos.y) * PIXEL_TO_METER
+                continue
+            if room is None or from_pos.room is None:
+                continue
+            
+            # Coût minimal jusqu'à chaque portail d'arrivée, puis portail → cible
+            to_goal: Dict[NodeKey, float] = {}
+            for source, goal, cost, _ in self._routes_between_rooms(from_pos.room, from_pos.floor, room, floor):
+                total = self._meters((from_pos.x, from_pos.y), self._positions[source]) + cost
+                if total < to_goal.get(goal, float('inf')):
+                    to_goal[goal] = total
+            for goal, base in to_goal.items():
+                gx, gy, _ = self._positions[goal]
+                result[idx] = np.minimum(result[idx], base + np.hypot(xs - gx, ys - gy) * PIXEL_TO_METER)
+        
+        return result
+    
+    def _door_waypoint(self, node: NodeKey, room: int) -> Waypoint:
+        door = self._doors[node]
+        return Waypoint(
+            type='door',
+            position={'x': door.center_x, 'y': door.center_y,
+                      'floor': door.floor, 'room': room},
+            entity_id=door.entity_id,
+            room_a=door.room_a,
+            room_b=door.room_b
+        )
+
+    def _to_waypoints(self, source: NodeKey, steps: list, start_room: int) -> List[Waypoint]:
+        """Convertit un chemin de portails au format Waypoint historique"""
+        waypoints = []
+        if source[0] == 'door':
+            waypoints.append(self._door_waypoint(source, start_room))
+
+        for node, info in steps:
+            if info[0] == 'room':
+                if node[0] == 'door':
+                    waypoints.append(self._door_waypoint(node, info[1]))
+                continue
+
+            _, stair, going_up = info
+            if going_up:
+                start = (stair.center_x_from, stair.center_y_from, stair.floor_from, stair.room_id_from, stair.entity_id_from)
+                exit_ = (stair.center_x_to, stair.center_y_to, stair.floor_to, stair.room_id_to, stair.entity_id_to)
+            else:
+                start = (stair.center_x_to, stair.center_y_to, stair.floor_to, stair.room_id_to, stair.entity_id_to)
+                exit_ = (stair.center_x_from, stair.center_y_from, stair.floor_from, stair.room_id_from, stair.entity_id_from)
+            for x, y, floor, room, entity_id in (start, exit_):
+                waypoints.append(Waypoint(
+                    type=stair.vertical_type,  # 'stairs' ou 'elevator'
+                    position={'x': x, 'y': y, 'floor': floor, 'room': room},
+                    entity_id=entity_id,
+                    floor_from=start[2],
+                    floor_to=exit_[2]
+                ))
+        return waypoints
@@ -4,5 +4,6 @@ Génération de narrations audio pour les parcours
 """
 
 from .piper_service import PiperTTSService, get_piper_service
+from .parcours_audio_jobs import ParcoursAudioJobs, get_parcours_audio_jobs
 
-__all__ = ['PiperTTSService', 'get_piper_service']
+__all__ = ['PiperTTSService', 'get_piper_service', 'ParcoursAudioJobs', 'get_parcours_audio_jobs']
@@ -0,0 +1,177 @@
+"""
+Synthèse audio asynchrone des parcours (génération en deux temps)
+- Le plan est renvoyé tout de suite, l'audio est produit en arrière-plan
+- File à priorité: la 1re œuvre de chaque parcours passe avant les suivantes
+  de tous les parcours en attente (le visiteur commence à écouter au plus vite)
+- État par œuvre dans manifest.json du dossier audio du parcours, écrit de
+  façon atomique: lisible depuis n'importe quel worker Gunicorn
+"""
+
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .piper_service import get_piper_service
+
+logger = logging.getLogger(__name__)
+
+PARCOURS_AUDIO_WORKERS = int(os.getenv('PARCOURS_AUDIO_WORKERS', '1'))
+
+_MANIFEST_NAME = 'manifest.json'
+
+
+class ParcoursAudioJobs:
+    """File de synthèse audio des parcours (singleton via get_parcours_audio_jobs)"""
+
+    def __init__(self, audio_output_dir: str = "/app/uploads/audio"):
+        self.audio_output_dir = audio_output_dir
+        self._queue: 'queue.PriorityQueue' = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._manifest_locks: Dict[int, threading.Lock] = {}
+        self._threads: List[threading.Thread] = []
+
+    # ===== MANIFESTE =====
+
+    def _manifest_path(self, parcours_id: int) -> str:
+        return os.path.join(self.audio_output_dir, f"parcours_{parcours_id}", _MANIFEST_NAME)
+
+    def read_manifest(self, parcours_id: int) -> Optional[Dict[str, Any]]:
+        """État audio d'un parcours (None si inconnu ou nettoyé)"""
+        try:
+            with open(self._manifest_path(parcours_id), encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_manifest(self, parcours_id: int, manifest: Dict[str, Any]):
+        path = self._manifest_path(parcours_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _manifest_lock(self, parcours_id: int) -> threading.Lock:
+        with self._lock:
+            return self._manifest_locks.setdefault(parcours_id, threading.Lock())
+
+    # ===== SOUMISSION =====
+
+    def submit(self, parcours_id: int, narrations: List[Dict[str, Any]], language: str = 'fr_FR') -> Dict[str, Any]:
+        """
+        Met en file la synthèse des narrations [{oeuvre_id, narration_text}, ...]
+        dans l'ordre de visite. Retourne le manifeste initial.
+        """
+        existing = self.read_manifest(parcours_id)
+        if existing and existing['status'] != 'error' and \
+                [a['oeuvre_id'] for a in existing['artworks']] == [n['oeuvre_id'] for n in narrations]:
+            # Même parcours déjà demandé (seed identique): rien à relancer
+            return existing
+
+        manifest = {
+            'parcours_id': parcours_id,
+            'status': 'pending',
+            'language': language,
+            'total': len(narrations),
+            'ready': 0,
+            'created_at': time.time(),
+            'artworks': [
+                {'oeuvre_id': n['oeuvre_id'], 'order': idx + 1, 'status': 'pending',
+                 'path': None, 'duration_seconds': None}
+                for idx, n in enumerate(narrations)
+            ]
+        }
+        with self._manifest_lock(parcours_id):
+            self._write_manifest(parcours_id, manifest)
+
+        for idx, narration in enumerate(narrations):
+            self._queue.put((
+                idx, next(self._seq), parcours_id,
+                narration['oeuvre_id'], narration.get('narration_text') or '', language
+            ))
+        self._ensure_workers()
+        logger.info(f"🎵 Audio parcours {parcours_id}: {len(narrations)} narrations en file ({self._queue.qsize()} en attente)")
+        return manifest
+
+    def _ensure_workers(self):
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            for i in range(len(self._threads), PARCOURS_AUDIO_WORKERS):
+                thread = threading.Thread(target=self._worker_loop, name=f"parcours-audio-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _worker_loop(self):
+        while True:
+            _, _, parcours_id, oeuvre_id, text, language = self._queue.get()
+            try:
+                result = get_piper_service(language).generate_audio(
+                    text=text,
+                    output_filename=f"oeuvre_{oeuvre_id}",
+                    parcours_id=parcours_id,
+                    language=language
+                )
+            except Exception as e:
+                logger.error(f"❌ Audio parcours {parcours_id}, œuvre {oeuvre_id}: {e}")
+                result = None
+            try:
+                self._mark(parcours_id, oeuvre_id, result)
+            except Exception as e:
+                logger.error(f"❌ Manifeste audio parcours {parcours_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _mark(self, parcours_id: int, oeuvre_id: int, result: Optional[Dict[str, Any]]):
+        """Enregistre le résultat d'une œuvre et recalcule l'état du parcours"""
+        with self._manifest_lock(parcours_id):
+            manifest = self.read_manifest(parcours_id)
+            if manifest is None:
+                # Dossier nettoyé entre-temps: plus personne n'attend cet audio
+                return
+            for artwork in manifest['artworks']:
+                if artwork['oeuvre_id'] == oeuvre_id:
+                    if result:
+                        artwork.update(status='ready', path=result['path'],
+                                       duration_seconds=result['duration_seconds'])
+                    else:
+                        artwork['status'] = 'error'
+            statuses = [a['status'] for a in manifest['artworks']]
+            manifest['ready'] = statuses.count('ready')
+            if 'pending' in statuses:
+                manifest['status'] = 'running'
+            elif 'error' in statuses:
+                manifest['status'] = 'partial' if manifest['ready'] else 'error'
+            else:
+                manifest['status'] = 'done'
+            self._write_manifest(parcours_id, manifest)
+
+        if manifest['status'] != 'running':
+            with self._lock:
+                self._manifest_locks.pop(parcours_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'workers': PARCOURS_AUDIO_WORKERS,
+            'queued': self._queue.qsize()
+        }
+
+
+# Instance singleton
+_parcours_audio_jobs: Optional[ParcoursAudioJobs] = None
+_parcours_audio_jobs_lock = threading.Lock()
+
+
+def get_parcours_audio_jobs() -> ParcoursAudioJobs:
+    """Récupère l'instance singleton de la file audio des parcours"""
+    global _parcours_audio_jobs
+    if _parcours_audio_jobs is None:
+        with _parcours_audio_jobs_lock:
+            if _parcours_audio_jobs is None:
+                _parcours_audio_jobs = ParcoursAudioJobs()
+    return _parcours_audio_jobs
@@ -162,6 +162,7 @@ class PiperTTSService:
             
             # Calculer la durée réelle du fichier audio (en secondes)
             audio_duration_seconds = len(audio) / self.voice.config.sample_rate
+            self._record_duration(text, audio_duration_seconds, language)
             
             # Retourner le chemin relatif ET la durée réelle
             relative_path = f"/uploads/audio/parcours_{parcours_id}/{output_filename}.wav"
@@ -177,6 +178,15 @@ class PiperTTSService:
             logger.error(f"❌ Erreur lors de la génération audio pour {output_filename}: {e}")
             return None
     
+    def _record_duration(self, text: str, duration_seconds: float, language: str = None) -> None:
+        """Mémorise la durée réelle (alimente le prédicteur de durée des parcours)"""
+        try:
+            from ..core.audio_durations import get_audio_duration_model
+            voice_model = self.MODELS[language or self.default_language]['name']
+            get_audio_duration_model().record(text, duration_seconds, voice_model)
+        except Exception as e:
+            logger.warning(f"⚠️ Durée audio non enregistrée: {e}")
+    
     def generate_parcours_audio(
         self, 
         parcours_id: int,
@@ -5,6 +5,7 @@ import CriteriaSelector from '../../components/criteria_selector/CriteriaSelecto
 import { useNavigate } from 'react-router-dom';
 import { checkSession } from '../../utils/session';
 import { saveParcours, cacheParcoursMedia } from '../../utils/offlineStorage';
+import { expandParcoursRoute } from '../../utils/routeCodec';
 import './MesChoix.css';
 
 // Icons
@@ -219,14 +220,15 @@ const MesChoix = () => {
       criteria[type] = name;  // {age: "adulte", thematique: "technique_picturale", ...}
     }
 
-    // Générer un seed unique pour ce parcours (timestamp + random)
-    const uniqueSeed = Date.now() + Math.floor(Math.random() * 10000);
-
+    // Pas de variation_seed: le serveur en tire un (renvoyé dans metadata.variation_seed).
+    // Les visiteurs au même profil partagent ainsi le cache, la réserve et l'affluence.
     const apiPayload = {
       criteria: criteria,  // Format dict flexible pour N critères
       target_duration_minutes: timeValue * 60,
-      variation_seed: uniqueSeed,  // Seed unique pour éviter les collisions
-      generate_audio: true
+      generate_audio: true,
+      // Plan renvoyé tout de suite, audio suivi par polling du manifeste (utils/parcoursAudio.js)
+      audio_mode: 'async',
+      route_format: 'compact'  // Chemins encodés (réponse plus légère), décodés ci-dessous
     };
 
     console.log("📤 Payload envoyé:", apiPayload);
@@ -260,6 +262,16 @@ const MesChoix = () => {
       }
 
       const data = await response.json();
+      if (data.parcours) {
+        data.parcours = expandParcoursRoute(data.parcours);
+        if (data.audio?.mode === 'async') {
+          // Synthèse en cours: Resume suit le manifeste (réserve ou cache: audio déjà prêt)
+          data.parcours.audio_job = {
+            status: data.audio.status,
+            status_url: data.audio.status_url
+          };
+        }
+      }
       console.log("✅ Parcours generated:", data);
       
       if (data.success && data.parcours) {
@@ -4,6 +4,7 @@ import MapModal from "../../components/map_modal/MapModal";
 import ThemeToggle from "../../components/theme_toggle/ThemeToggle";
 import { checkSession } from "../../utils/session";
 import { getParcours, isOnline, onOnlineStatusChange, isParcoursOfflineReady } from "../../utils/offlineStorage";
+import { isParcoursAudioPending, pollParcoursAudio } from "../../utils/parcoursAudio";
 import "./Resume.css";
 
 // Icons
@@ -158,6 +159,14 @@ const Resume = () => {
     loadParcours();
   }, [navigate]);
 
+  // Audio asynchrone: les chemins arrivent au fil de la synthèse (polling du manifeste)
+  const audioPending = isParcoursAudioPending(parcours);
+  useEffect(() => {
+    if (!audioPending) return;
+    return pollParcoursAudio(parcours, setParcours);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [audioPending]);
+
   // Sauvegarder la progression (pour reprise après refresh/offline)
   useEffect(() => {
     if (parcours && parcours.artworks) {
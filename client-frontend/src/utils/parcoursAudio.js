@@ -0,0 +1,101 @@
+/**
+ * Suivi de l'audio d'un parcours généré avec audio_mode: 'async'
+ * Polling de GET /api/parcours/<id>/audio (manifeste par œuvre) : une requête
+ * courte toutes les quelques secondes, aucun thread serveur tenu ouvert
+ */
+
+import { saveParcours, cacheParcoursMedia } from './offlineStorage';
+
+const POLL_INTERVAL_MS = 2000;
+const POLL_MAX_MS = 10 * 60 * 1000;
+const PENDING_STATUSES = ['pending', 'running'];
+
+/**
+ * Vrai si l'audio du parcours est encore en cours de synthèse
+ * @param {object} parcours
+ * @returns {boolean}
+ */
+export function isParcoursAudioPending(parcours) {
+  const job = parcours?.audio_job;
+  return Boolean(job?.status_url) && PENDING_STATUSES.includes(job.status);
+}
+
+/**
+ * Reporte les chemins audio prêts du manifeste sur les œuvres du parcours
+ * @param {object} parcours
+ * @param {object} manifest - {status, ready, artworks: [{oeuvre_id, status, path, duration_seconds}]}
+ * @returns {object} nouveau parcours (inchangé si rien de neuf)
+ */
+export function applyAudioManifest(parcours, manifest) {
+  const ready = new Map(
+    (manifest.artworks || [])
+      .filter(a => a.status === 'ready' && a.path)
+      .map(a => [a.oeuvre_id, a])
+  );
+  let changed = parcours.audio_job?.status !== manifest.status;
+  const artworks = parcours.artworks.map(artwork => {
+    const entry = ready.get(artwork.oeuvre_id);
+    if (!entry || artwork.audio_path === entry.path) return artwork;
+    changed = true;
+    return { ...artwork, audio_path: entry.path, narration_duration: entry.duration_seconds };
+  });
+  if (!changed) return parcours;
+  return {
+    ...parcours,
+    artworks,
+    audio_job: { ...parcours.audio_job, status: manifest.status, ready: manifest.ready }
+  };
+}
+
+/**
+ * Interroge le manifeste jusqu'à la fin de la synthèse. Chaque nouvel audio
+ * est sauvegardé (IndexedDB) puis transmis à onUpdate; les médias sont mis
+ * en cache offline une fois la synthèse terminée.
+ * @param {object} parcours
+ * @param {(parcours: object) => void} onUpdate
+ * @returns {() => void} fonction d'arrêt
+ */
+export function pollParcoursAudio(parcours, onUpdate) {
+  let current = parcours;
+  let stopped = false;
+  let timer = null;
+  const deadline = Date.now() + POLL_MAX_MS;
+
+  const tick = async () => {
+    if (stopped) return;
+    try {
+      const response = await fetch(current.audio_job.status_url, { cache: 'no-store' });
+      if (response.status === 404) {
+        // Manifeste expiré: plus rien à attendre
+        console.warn('[ParcoursAudio] Manifeste audio introuvable');
+        return;
+      }
+      if (response.ok) {
+        const data = await response.json();
+        const next = applyAudioManifest(current, data.audio);
+        if (next !== current && !stopped) {
+          current = next;
+          await saveParcours(current);
+          onUpdate(current);
+        }
+        if (!PENDING_STATUSES.includes(data.audio.status)) {
+          console.log(`🎵 Audio parcours: ${data.audio.status} (${data.audio.ready}/${data.audio.total})`);
+          cacheParcoursMedia(current).catch(err => console.warn('⚠️ Erreur cache médias:', err));
+          return;
+        }
+      }
+    } catch (error) {
+      // Réseau coupé: on retente au prochain tour
+      console.warn('[ParcoursAudio] Polling:', error);
+    }
+    if (!stopped && Date.now() < deadline) {
+      timer = setTimeout(tick, POLL_INTERVAL_MS);
+    }
+  };
+
+  tick();
+  return () => {
+    stopped = true;
+    clearTimeout(timer);
+  };
+}
@@ -0,0 +1,111 @@
+/**
+ * Décodage du format compact des chemins de parcours (route_format: 'compact')
+ * Miroir de backend/rag/parcours/services/route_codec.py
+ */
+
+const PIXEL_TO_METER = 0.0125;
+
+const PAIRED_FIELDS = {
+  door: ['room_a', 'room_b'],
+  stairway: ['floor_from', 'floor_to'],
+  stairway_exit: ['floor_from', 'floor_to'],
+};
+
+/**
+ * Décode une polyline (deltas entiers successifs) en couples [x, y]
+ * @param {string} encoded
+ * @returns {Array<[number, number]>}
+ */
+export function decodePolyline(encoded) {
+  const values = [];
+  let value = 0;
+  let shift = 0;
+  for (let i = 0; i < encoded.length; i++) {
+    const chunk = encoded.charCodeAt(i) - 63;
+    value |= (chunk & 0x1f) << shift;
+    shift += 5;
+    if (chunk < 0x20) {
+      values.push(value & 1 ? ~(value >> 1) : value >> 1);
+      value = 0;
+      shift = 0;
+    }
+  }
+  const coords = [];
+  let x = 0;
+  let y = 0;
+  for (let i = 0; i + 1 < values.length; i += 2) {
+    x += values[i];
+    y += values[i + 1];
+    coords.push([x, y]);
+  }
+  return coords;
+}
+
+function expandPoints(route) {
+  const points = [];
+  route.floors.forEach((floor) => {
+    decodePolyline(floor.coords).forEach(([x, y], idx) => {
+      points.push({
+        type: route.types[floor.types[idx]],
+        x: x / route.precision,
+        y: y / route.precision,
+        floor: floor.floor,
+        room: floor.rooms[idx],
+      });
+    });
+  });
+  return points;
+}
+
+/**
+ * Restaure path_segments et waypoints détaillés d'un parcours compact
+ * (parcours renvoyé tel quel s'il n'est pas compact)
+ * @param {object} parcours
+ * @returns {object}
+ */
+export function expandParcoursRoute(parcours) {
+  const route = parcours && parcours.route;
+  if (!route || route.format !== 'compact-v1') {
+    return parcours;
+  }
+
+  const points = expandPoints(route);
+  const entranceName = (parcours.entrance && parcours.entrance.name) || 'Entrée';
+
+  const pathSegments = [];
+  route.chains.forEach(([segmentIndex, ...indices]) => {
+    for (let i = 0; i + 1 < indices.length; i++) {
+      const from = { ...points[indices[i]] };
+      const to = { ...points[indices[i + 1]] };
+      if (from.type === 'entrance') {
+        from.name = entranceName;
+      }
+      pathSegments.push({
+        from,
+        to,
+        distance: Math.hypot(to.x - from.x, to.y - from.y) * PIXEL_TO_METER,
+        floor: from.floor,
+        segment_index: segmentIndex,
+      });
+    }
+  });
+
+  const waypoints = route.waypoints.map(([pointIdx, entityId, a, b]) => {
+    const point = points[pointIdx];
+    const waypoint = {
+      type: point.type,
+      position: { x: point.x, y: point.y, floor: point.floor, room: point.room },
+      entity_id: entityId,
+    };
+    const fields = PAIRED_FIELDS[point.type];
+    if (fields) {
+      waypoint[fields[0]] = a;
+      waypoint[fields[1]] = b;
+    }
+    return waypoint;
+  });
+
+  const expanded = { ...parcours, path_segments: pathSegments, waypoints };
+  delete expanded.route;
+  return expanded;
+}
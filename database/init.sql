@@ -24,11 +24,13 @@ CREATE TABLE IF NOT EXISTS qr_code (
     parcours_id BIGINT,
     expires_at TIMESTAMP,
     used_at TIMESTAMP,
+    linked_at TIMESTAMP,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 -- Index pour nettoyage rapide des sessions expirées
 CREATE INDEX IF NOT EXISTS idx_qr_code_expires_at ON qr_code(expires_at);
+CREATE INDEX IF NOT EXISTS idx_qr_code_parcours_id ON qr_code(parcours_id);
 
 -- ===============================
 -- TABLE : Plans
@@ -191,6 +193,8 @@ CREATE TABLE IF NOT EXISTS pregenerations (
     criteria_combination JSONB NOT NULL,  -- {"age": 1, "thematique": 4, "style_texte": 7} - FLEXIBLE !
     pregeneration_text TEXT NOT NULL,
     voice_link TEXT,
+    artwork_hash VARCHAR(16),   -- Empreinte des champs œuvre du prompt (NULL = obsolète)
+    criteria_hashes JSONB,      -- {"age": "...", ...} empreintes des critères du prompt
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     UNIQUE(oeuvre_id, criteria_combination)  -- Combinaison unique par œuvre
@@ -351,12 +355,114 @@ CREATE TABLE IF NOT EXISTS generation_jobs (
     skipped INTEGER DEFAULT 0,
     errors INTEGER DEFAULT 0,
     params JSONB DEFAULT '{}',
-    error_message TEXT
+    error_message TEXT,
+    -- Reprise après redémarrage (bail renouvelé par heartbeat + items terminés)
+    lease_owner VARCHAR(128),
+    lease_expires_at TIMESTAMP,
+    checkpoint JSONB
 );
 
 -- Index pour récupération rapide des jobs actifs
 CREATE INDEX IF NOT EXISTS idx_generation_jobs_status ON generation_jobs(status);
 CREATE INDEX IF NOT EXISTS idx_generation_jobs_created ON generation_jobs(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_generation_jobs_lease ON generation_jobs(status, lease_expires_at);
+
+-- ===============================
+-- TABLE : Cache des générations (empreinte de prompt)
+-- ===============================
+CREATE TABLE IF NOT EXISTS generation_cache (
+    fingerprint CHAR(64) PRIMARY KEY,
+    model VARCHAR(100) NOT NULL,
+    response_text TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_hit_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_generation_cache_lru ON generation_cache(last_hit_at);
+
+-- ===============================
+-- TABLE : Placements des œuvres (centre, étage, salle)
+-- ===============================
+CREATE TABLE IF NOT EXISTS artwork_placements (
+    entity_id INTEGER PRIMARY KEY REFERENCES entities(entity_id) ON DELETE CASCADE,
+    oeuvre_id INTEGER NOT NULL,
+    plan_id INTEGER NOT NULL,
+    floor INTEGER NOT NULL,
+    x DOUBLE PRECISION NOT NULL,
+    y DOUBLE PRECISION NOT NULL,
+    room_entity_id INTEGER,
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_artwork_placements_oeuvre ON artwork_placements(oeuvre_id);
+
+-- ===============================
+-- TABLE : Cache des parcours générés
+-- ===============================
+CREATE TABLE IF NOT EXISTS parcours_cache (
+    cache_key CHAR(64) PRIMARY KEY,
+    payload JSONB NOT NULL,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_hit_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_parcours_cache_lru ON parcours_cache(last_hit_at);
+
+-- ===============================
+-- TABLE : Réserve de parcours pré-construits
+-- ===============================
+CREATE TABLE IF NOT EXISTS parcours_pool (
+    pool_id SERIAL PRIMARY KEY,
+    profile_key TEXT NOT NULL,
+    duration_min INTEGER NOT NULL,
+    museum_version CHAR(32) NOT NULL,
+    parcours_id BIGINT,
+    payload JSONB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_parcours_pool_lookup ON parcours_pool(profile_key, duration_min, museum_version);
+
+-- ===============================
+-- TABLE : Historique des demandes de parcours
+-- ===============================
+CREATE TABLE IF NOT EXISTS parcours_requests (
+    request_id SERIAL PRIMARY KEY,
+    profile_key TEXT NOT NULL,
+    duration_min INTEGER NOT NULL,
+    served_from VARCHAR(20),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_parcours_requests_created ON parcours_requests(created_at);
+
+-- ===============================
+-- TABLE : Durées audio mesurées (Piper)
+-- ===============================
+CREATE TABLE IF NOT EXISTS audio_durations (
+    voice_model VARCHAR(100) NOT NULL,
+    text_md5 CHAR(32) NOT NULL,
+    char_count INTEGER NOT NULL,
+    word_count INTEGER NOT NULL,
+    punctuation_count INTEGER NOT NULL,
+    duration_seconds DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (voice_model, text_md5)
+);
+
+-- ===============================
+-- TABLE : Déroulé prévu des parcours servis (affluence)
+-- ===============================
+CREATE TABLE IF NOT EXISTS parcours_timelines (
+    parcours_id BIGINT PRIMARY KEY,
+    total_minutes DOUBLE PRECISION NOT NULL,
+    stops JSONB NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
 
 -- ===============================
 -- DONNÉES PAR DÉFAUT
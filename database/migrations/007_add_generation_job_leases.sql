@@ -0,0 +1,24 @@
+-- Migration: 007_add_generation_job_leases.sql
+-- Date: 2026-10-18
+-- Description: Bail (lease) + checkpoint pour reprendre les jobs de génération après redémarrage
+-- Safe: Cette migration utilise IF NOT EXISTS et n'altère pas les données existantes
+
+-- ===============================
+-- COLONNES : Reprise des jobs
+-- ===============================
+-- lease_owner      : process propriétaire du job (hostname:pid)
+-- lease_expires_at : renouvelé par heartbeat; expiré = job orphelin, récupérable
+-- checkpoint       : items terminés {"ranges": [[id_min, id_max], ...], "partial": {"oeuvre_id": [hash, ...]}}
+
+ALTER TABLE generation_jobs ADD COLUMN IF NOT EXISTS lease_owner VARCHAR(128);
+ALTER TABLE generation_jobs ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP;
+ALTER TABLE generation_jobs ADD COLUMN IF NOT EXISTS checkpoint JSONB;
+
+-- Index pour la recherche des baux expirés
+CREATE INDEX IF NOT EXISTS idx_generation_jobs_lease ON generation_jobs(status, lease_expires_at);
+
+-- ===============================
+-- Commentaires
+-- ===============================
+COMMENT ON COLUMN generation_jobs.lease_expires_at IS 'Expiration du bail: au-delà, un autre worker peut reprendre le job';
+COMMENT ON COLUMN generation_jobs.checkpoint IS 'Checkpoint compact des (oeuvre_id, combination_hash) terminés';
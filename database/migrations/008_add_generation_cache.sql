@@ -0,0 +1,24 @@
+-- Migration: 008_add_generation_cache.sql
+-- Date: 2026-10-18
+-- Description: Cache des sorties LLM indexé par empreinte de prompt (modèle + options + messages)
+-- Safe: Cette migration utilise IF NOT EXISTS et n'altère pas les données existantes
+
+-- ===============================
+-- TABLE : Cache des générations
+-- ===============================
+-- fingerprint : sha256 du JSON canonique {model, options, messages}
+-- Éviction: TTL sur created_at + LRU sur last_hit_at (voir rag/core/generation_cache.py)
+
+CREATE TABLE IF NOT EXISTS generation_cache (
+    fingerprint CHAR(64) PRIMARY KEY,
+    model VARCHAR(100) NOT NULL,
+    response_text TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_hit_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_generation_cache_lru ON generation_cache(last_hit_at);
+
+COMMENT ON TABLE generation_cache IS 'Sorties Ollama réutilisables pour un prompt strictement identique';
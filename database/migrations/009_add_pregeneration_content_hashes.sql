@@ -0,0 +1,17 @@
+-- Migration: 009_add_pregeneration_content_hashes.sql
+-- Date: 2026-10-18
+-- Description: Empreintes de contenu (œuvre + critères) pour ne régénérer que les narrations obsolètes
+-- Safe: Cette migration utilise IF NOT EXISTS et n'altère pas les données existantes
+
+-- ===============================
+-- COLONNES : Empreintes de contenu des prégénérations
+-- ===============================
+-- artwork_hash    : empreinte des champs de l'œuvre utilisés par le prompt
+-- criteria_hashes : {"type": empreinte(name, description, ai_indication)}
+-- NULL = narration antérieure au suivi, considérée obsolète par le mode "stale only"
+
+ALTER TABLE pregenerations ADD COLUMN IF NOT EXISTS artwork_hash VARCHAR(16);
+ALTER TABLE pregenerations ADD COLUMN IF NOT EXISTS criteria_hashes JSONB;
+
+COMMENT ON COLUMN pregenerations.artwork_hash IS 'Empreinte des champs œuvre du prompt (régénération incrémentale)';
+COMMENT ON COLUMN pregenerations.criteria_hashes IS 'Empreintes par type de critère (name/description/ai_indication)';
@@ -0,0 +1,26 @@
+-- Migration: 010_add_artwork_placements.sql
+-- Date: 2026-10-18
+-- Description: Placements matérialisés des œuvres (centre, étage, salle) pour la sélection de parcours
+-- Safe: Cette migration utilise IF NOT EXISTS et n'altère pas les données existantes
+
+-- ===============================
+-- TABLE : Placements des œuvres (centre, étage, salle)
+-- ===============================
+-- Recalculée par le backend après sauvegarde du plan (ou à la génération
+-- de parcours si obsolète). Le TRUNCATE entities CASCADE de la sauvegarde
+-- vide cette table, ce qui signale l'obsolescence.
+
+CREATE TABLE IF NOT EXISTS artwork_placements (
+    entity_id INTEGER PRIMARY KEY REFERENCES entities(entity_id) ON DELETE CASCADE,
+    oeuvre_id INTEGER NOT NULL,
+    plan_id INTEGER NOT NULL,
+    floor INTEGER NOT NULL,
+    x DOUBLE PRECISION NOT NULL,
+    y DOUBLE PRECISION NOT NULL,
+    room_entity_id INTEGER,
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_artwork_placements_oeuvre ON artwork_placements(oeuvre_id);
+
+COMMENT ON TABLE artwork_placements IS 'Centre, étage (index de plan) et salle de chaque entité ARTWORK';
@@ -0,0 +1,24 @@
+-- Migration: 011_add_parcours_cache.sql
+-- Date: 2026-10-18
+-- Description: Cache partagé des parcours générés (réponse complète + manifeste audio)
+-- Safe: Cette migration utilise IF NOT EXISTS et n'altère pas les données existantes
+
+-- ===============================
+-- TABLE : Cache des parcours générés
+-- ===============================
+-- cache_key : sha256 de {critères, tranche de durée, seed, audio, version du plan/prégénérations}
+-- payload : réponse complète de /api/parcours/generate (parcours + manifeste audio)
+-- Éviction: TTL sur created_at + LRU sur last_hit_at (voir rag/core/parcours_cache.py)
+
+CREATE TABLE IF NOT EXISTS parcours_cache (
+    cache_key CHAR(64) PRIMARY KEY,
+    payload JSONB NOT NULL,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_hit_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_parcours_cache_lru ON parcours_cache(last_hit_at);
+
+COMMENT ON TABLE parcours_cache IS 'Parcours générés réutilisables (même profil, durée, seed et version du musée)';
@@ -0,0 +1,41 @@
+-- Migration: 012_add_parcours_pool.sql
+-- Date: 2026-10-18
+-- Description: Réserve de parcours pré-construits et historique des demandes par profil
+-- Safe: Cette migration utilise IF NOT EXISTS et n'altère pas les données existantes
+
+-- ===============================
+-- TABLE : Réserve de parcours pré-construits
+-- ===============================
+-- profile_key : JSON canonique {type: criteria_id}
+-- payload : réponse complète de /api/parcours/generate (audio compris)
+-- Une entrée est supprimée dès qu'elle est servie (voir rag/core/parcours_pool.py)
+
+CREATE TABLE IF NOT EXISTS parcours_pool (
+    pool_id SERIAL PRIMARY KEY,
+    profile_key TEXT NOT NULL,
+    duration_min INTEGER NOT NULL,
+    museum_version CHAR(32) NOT NULL,
+    parcours_id BIGINT,
+    payload JSONB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_parcours_pool_lookup ON parcours_pool(profile_key, duration_min, museum_version);
+
+-- ===============================
+-- TABLE : Historique des demandes de parcours
+-- ===============================
+-- Popularité des profils pour le remplissage de la réserve
+
+CREATE TABLE IF NOT EXISTS parcours_requests (
+    request_id SERIAL PRIMARY KEY,
+    profile_key TEXT NOT NULL,
+    duration_min INTEGER NOT NULL,
+    served_from VARCHAR(20),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_parcours_requests_created ON parcours_requests(created_at);
+
+COMMENT ON TABLE parcours_pool IS 'Parcours complets prêts à servir par profil et durée';
+COMMENT ON TABLE parcours_requests IS 'Demandes de parcours (profil, durée, origine de la réponse)';
@@ -0,0 +1,24 @@
+-- Migration: 013_add_audio_durations.sql
+-- Date: 2026-10-18
+-- Description: Durées audio réelles par texte et par voix pour prédire la durée des parcours
+-- Safe: Cette migration utilise IF NOT EXISTS et n'altère pas les données existantes
+
+-- ===============================
+-- TABLE : Durées audio mesurées (Piper)
+-- ===============================
+-- text_md5 : md5(pregeneration_text), joint directement côté sélection des œuvres
+-- Les compteurs (caractères, mots, ponctuation) alimentent le modèle de
+-- prédiction des textes jamais synthétisés (voir rag/core/audio_durations.py)
+
+CREATE TABLE IF NOT EXISTS audio_durations (
+    voice_model VARCHAR(100) NOT NULL,
+    text_md5 CHAR(32) NOT NULL,
+    char_count INTEGER NOT NULL,
+    word_count INTEGER NOT NULL,
+    punctuation_count INTEGER NOT NULL,
+    duration_seconds DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (voice_model, text_md5)
+);
+
+COMMENT ON TABLE audio_durations IS 'Durée réelle de chaque narration synthétisée, par voix Piper';
@@ -0,0 +1,25 @@
+-- Migration: 014_parcours_timelines.sql
+-- Date: 2026-10-18
+-- Description: Horaires prévus des parcours et heure de liaison des sessions (affluence)
+-- Safe: Cette migration utilise IF NOT EXISTS et n'altère pas les données existantes
+
+-- ===============================
+-- TABLE : Déroulé prévu des parcours servis
+-- ===============================
+-- stops : [{oeuvre_id, room, floor, start_min, end_min}] en minutes depuis le départ
+-- Jointe à qr_code (sessions actives) pour estimer l'affluence par œuvre et
+-- par salle (voir rag/core/occupancy.py)
+
+CREATE TABLE IF NOT EXISTS parcours_timelines (
+    parcours_id BIGINT PRIMARY KEY,
+    total_minutes DOUBLE PRECISION NOT NULL,
+    stops JSONB NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Heure de liaison parcours ↔ session (= départ du visiteur)
+ALTER TABLE qr_code ADD COLUMN IF NOT EXISTS linked_at TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS idx_qr_code_parcours_id ON qr_code(parcours_id);
+
+COMMENT ON TABLE parcours_timelines IS 'Horaires prévus des arrêts de chaque parcours servi (affluence)';
@@ -141,6 +141,183 @@ BEGIN
     END IF;
 END $$;
 
+-- ===============================
+-- MIGRATION 007: generation_jobs lease + checkpoint
+-- ===============================
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM _migrations WHERE filename = '007_add_generation_job_leases.sql') THEN
+        ALTER TABLE generation_jobs ADD COLUMN IF NOT EXISTS lease_owner VARCHAR(128);
+        ALTER TABLE generation_jobs ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP;
+        ALTER TABLE generation_jobs ADD COLUMN IF NOT EXISTS checkpoint JSONB;
+        
+        CREATE INDEX IF NOT EXISTS idx_generation_jobs_lease ON generation_jobs(status, lease_expires_at);
+        
+        INSERT INTO _migrations (filename) VALUES ('007_add_generation_job_leases.sql');
+        RAISE NOTICE 'Migration 007 appliquée';
+    END IF;
+END $$;
+
+-- ===============================
+-- MIGRATION 008: generation_cache
+-- ===============================
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM _migrations WHERE filename = '008_add_generation_cache.sql') THEN
+        CREATE TABLE IF NOT EXISTS generation_cache (
+            fingerprint CHAR(64) PRIMARY KEY,
+            model VARCHAR(100) NOT NULL,
+            response_text TEXT NOT NULL,
+            size_bytes INTEGER NOT NULL DEFAULT 0,
+            hit_count INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_hit_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        
+        CREATE INDEX IF NOT EXISTS idx_generation_cache_lru ON generation_cache(last_hit_at);
+        
+        INSERT INTO _migrations (filename) VALUES ('008_add_generation_cache.sql');
+        RAISE NOTICE 'Migration 008 appliquée';
+    END IF;
+END $$;
+
+-- ===============================
+-- MIGRATION 009: Empreintes contenu des prégénérations
+-- ===============================
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM _migrations WHERE filename = '009_add_pregeneration_content_hashes.sql') THEN
+        ALTER TABLE pregenerations ADD COLUMN IF NOT EXISTS artwork_hash VARCHAR(16);
+        ALTER TABLE pregenerations ADD COLUMN IF NOT EXISTS criteria_hashes JSONB;
+        
+        INSERT INTO _migrations (filename) VALUES ('009_add_pregeneration_content_hashes.sql');
+        RAISE NOTICE 'Migration 009 appliquée';
+    END IF;
+END $$;
+
+-- ===============================
+-- MIGRATION 010: Table placements œuvre → salle
+-- ===============================
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM _migrations WHERE filename = '010_add_artwork_placements.sql') THEN
+        CREATE TABLE IF NOT EXISTS artwork_placements (
+            entity_id INTEGER PRIMARY KEY REFERENCES entities(entity_id) ON DELETE CASCADE,
+            oeuvre_id INTEGER NOT NULL,
+            plan_id INTEGER NOT NULL,
+            floor INTEGER NOT NULL,
+            x DOUBLE PRECISION NOT NULL,
+            y DOUBLE PRECISION NOT NULL,
+            room_entity_id INTEGER,
+            computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        
+        CREATE INDEX IF NOT EXISTS idx_artwork_placements_oeuvre ON artwork_placements(oeuvre_id);
+        
+        INSERT INTO _migrations (filename) VALUES ('010_add_artwork_placements.sql');
+        RAISE NOTICE 'Migration 010 appliquée';
+    END IF;
+END $$;
+
+-- ===============================
+-- MIGRATION 011: Cache des parcours générés
+-- ===============================
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM _migrations WHERE filename = '011_add_parcours_cache.sql') THEN
+        CREATE TABLE IF NOT EXISTS parcours_cache (
+            cache_key CHAR(64) PRIMARY KEY,
+            payload JSONB NOT NULL,
+            size_bytes INTEGER NOT NULL DEFAULT 0,
+            hit_count INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_hit_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        
+        CREATE INDEX IF NOT EXISTS idx_parcours_cache_lru ON parcours_cache(last_hit_at);
+        
+        INSERT INTO _migrations (filename) VALUES ('011_add_parcours_cache.sql');
+        RAISE NOTICE 'Migration 011 appliquée';
+    END IF;
+END $$;
+
+-- ===============================
+-- MIGRATION 012: Réserve de parcours + historique
+-- ===============================
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM _migrations WHERE filename = '012_add_parcours_pool.sql') THEN
+        CREATE TABLE IF NOT EXISTS parcours_pool (
+            pool_id SERIAL PRIMARY KEY,
+            profile_key TEXT NOT NULL,
+            duration_min INTEGER NOT NULL,
+            museum_version CHAR(32) NOT NULL,
+            parcours_id BIGINT,
+            payload JSONB NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        
+        CREATE INDEX IF NOT EXISTS idx_parcours_pool_lookup ON parcours_pool(profile_key, duration_min, museum_version);
+        
+        CREATE TABLE IF NOT EXISTS parcours_requests (
+            request_id SERIAL PRIMARY KEY,
+            profile_key TEXT NOT NULL,
+            duration_min INTEGER NOT NULL,
+            served_from VARCHAR(20),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        
+        CREATE INDEX IF NOT EXISTS idx_parcours_requests_created ON parcours_requests(created_at);
+        
+        INSERT INTO _migrations (filename) VALUES ('012_add_parcours_pool.sql');
+        RAISE NOTICE 'Migration 012 appliquée';
+    END IF;
+END $$;
+
+-- ===============================
+-- MIGRATION 013: Durées audio mesurées (Piper)
+-- ===============================
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM _migrations WHERE filename = '013_add_audio_durations.sql') THEN
+        CREATE TABLE IF NOT EXISTS audio_durations (
+            voice_model VARCHAR(100) NOT NULL,
+            text_md5 CHAR(32) NOT NULL,
+            char_count INTEGER NOT NULL,
+            word_count INTEGER NOT NULL,
+            punctuation_count INTEGER NOT NULL,
+            duration_seconds DOUBLE PRECISION NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (voice_model, text_md5)
+        );
+        
+        INSERT INTO _migrations (filename) VALUES ('013_add_audio_durations.sql');
+        RAISE NOTICE 'Migration 013 appliquée';
+    END IF;
+END $$;
+
+-- ===============================
+-- MIGRATION 014: Déroulé des parcours (affluence)
+-- ===============================
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM _migrations WHERE filename = '014_parcours_timelines.sql') THEN
+        CREATE TABLE IF NOT EXISTS parcours_timelines (
+            parcours_id BIGINT PRIMARY KEY,
+            total_minutes DOUBLE PRECISION NOT NULL,
+            stops JSONB NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        
+        ALTER TABLE qr_code ADD COLUMN IF NOT EXISTS linked_at TIMESTAMP;
+        
+        CREATE INDEX IF NOT EXISTS idx_qr_code_parcours_id ON qr_code(parcours_id);
+        
+        INSERT INTO _migrations (filename) VALUES ('014_parcours_timelines.sql');
+        RAISE NOTICE 'Migration 014 appliquée';
+    END IF;
+END $$;
+
 -- ===============================
 -- FIN DES MIGRATIONS
 -- ===============================